@@ -0,0 +1,346 @@
+# === benchmarks/bench.py ===
+"""
+Benchmarks offline del pipeline: latencia, throughput y RSS pico por función,
+comparados contra una línea base guardada. No usa la red: Sheets es el
+FakeSpreadsheet en memoria y, si Tesseract no está instalado, el OCR se
+simula con el layout de las capturas renderizadas (los benchmarks afectados
+llevan el sufijo [simulado] para no compararse con los de OCR real).
+
+Cada benchmark corre en su propio proceso (así el RSS pico es sólo suyo;
+"+MB" es lo que crece sobre el RSS previo a medir):
+una pasada de calentamiento y `reps` medidas; se informa la mediana y el
+mínimo. Las fixtures se generan una vez en cache/bench/.
+
+Uso:
+    python benchmarks/bench.py                    # todo, comparado con benchmarks/base.json
+    python benchmarks/bench.py -k polar           # sólo los que contienen "polar"
+    python benchmarks/bench.py --guardar-base     # fija la línea base de esta máquina
+    python benchmarks/bench.py --tolerancia 0.25 --estricto   # exit 1 si algo empeoró > 25 %
+    python benchmarks/bench.py --horas 8 --acc-hz 200         # noche Polar más pesada
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.append(str(ROOT / 'scripts'))
+# Stores, journal y logs de los benchmarks (y de sus procesos hijos) fuera de data/ y logs/
+_TMP = tempfile.mkdtemp(prefix="bench_")
+os.environ.setdefault('JCPSALUD_DATA_DIR', str(Path(_TMP) / 'data'))
+os.environ.setdefault('JCPSALUD_LOG_DIR', str(Path(_TMP) / 'logs'))
+from benchmarks import fixtures
+
+BASE_FILE = Path(__file__).resolve().parent / 'base.json'
+TOLERANCIA = 0.20
+
+# ----------------------------------------------------------------------
+# 1) Registro de benchmarks
+# ----------------------------------------------------------------------
+BENCH = {}
+
+def bench(nombre, reps=5):
+    """
+    Registra `setup(ctx) -> (fn, items)`: fn() es lo que se mide y `items`
+    la cantidad de unidades que procesa cada llamada (para el throughput).
+    """
+    def deco(setup):
+        BENCH[nombre] = (setup, reps)
+        return setup
+    return deco
+
+def tesseract_disponible():
+    if os.environ.get('JCPSALUD_BENCH_OCR') == 'simulado':
+        return False
+    return shutil.which('tesseract') is not None
+
+def _ocr(ctx, app):
+    """Backend real o simulado (y sin caché OCR, para medir la extracción)."""
+    os.environ['JCPSALUD_OCR_CACHE'] = '0'
+    import ocr_backend
+    if not ctx['ocr_real']:
+        ocr_backend.set_backend(fixtures.OCRSimulado(ctx['layout'][app]))
+
+def _sufijo():
+    return "" if tesseract_disponible() else "[simulado]"
+
+# --- Polar ------------------------------------------------------------
+@bench("polar_leer_acc", reps=3)
+def _polar_leer_acc(ctx):
+    import polar_hrv_analyzer as a
+    acc = ctx['polar']['ACC']
+    return (lambda: a.leer_acc_ventanas(acc)), ctx['acc_filas']
+
+@bench("polar_analizar_noche", reps=3)
+def _polar_analizar_noche(ctx):
+    import polar_hrv_analyzer as a
+    f = ctx['polar']
+    return (lambda: a.analizar_noche(f['RR'], f['ACC'], f['HR'])), 1
+
+METODOS_ESPECTRO = ("welch", "welch_lineal", "welch_pchip", "lomb")
+
+def _rr_limpio(ctx):
+    import polar_hrv_analyzer as a
+    rr = a.leer_rr(ctx['polar']['RR'])
+    return a, rr[~a.filtrar_artefactos(rr)]
+
+for _m in METODOS_ESPECTRO:
+    @bench(f"calcular_frecuencia[{_m}]", reps=5)
+    def _calcular_frecuencia(ctx, metodo=_m):
+        a, rr = _rr_limpio(ctx)
+        return (lambda: a.calcular_frecuencia(rr, metodo)), len(rr)
+
+    @bench(f"calcular_bandas_7noches[{_m}]", reps=3)
+    def _calcular_bandas(ctx, metodo=_m):
+        a, rr = _rr_limpio(ctx)
+        noches = [rr[i * 500:] for i in range(7)]      # una semana, largos distintos
+        return (lambda: a.calcular_bandas(noches, metodo)), sum(map(len, noches))
+
+for _m in ("welch_lineal", "lomb"):
+    @bench(f"calcular_serie[{_m}]", reps=3)
+    def _calcular_serie(ctx, metodo=_m):
+        a, rr = _rr_limpio(ctx)
+        return (lambda: a.calcular_serie(rr, metodo=metodo)), len(rr)
+
+# --- StarFit / Amazfit --------------------------------------------------
+ETIQUETAS_OCR = ["Peso", "Grasa corporal", "Grasa Corporal (%)", "IMC", "imc", "Grasa visceral",
+                 "Agua corporal", "agua corp0ral", "BMR", "Masa muscular", "Masa musculr",
+                 "Edad corporal", "Grasa subcutanea", "grasa subcutánea", "Masa esqueletica",
+                 "Musculo esqueletico", "Proteina", "Frecuencia muscular", "Peso sin grasa",
+                 "Tasa metabolica basal"]
+
+@bench("map_lbl_starfit[frio]", reps=5)
+def _map_lbl_starfit_frio(ctx):
+    import starfit_ocr
+    etiquetas = [f"{e} {i % 7}" if i % 3 else e for i, e in enumerate(ETIQUETAS_OCR * 25)]
+
+    def fn():
+        starfit_ocr._matcher_cache.clear()          # recompila el matcher: costo de arranque
+        for e in etiquetas:
+            starfit_ocr.map_lbl_starfit(e)
+    return fn, len(etiquetas)
+
+@bench("map_lbl_starfit[memo]", reps=5)
+def _map_lbl_starfit_memo(ctx):
+    import starfit_ocr
+    etiquetas = ETIQUETAS_OCR * 25
+    return (lambda: [starfit_ocr.map_lbl_starfit(e) for e in etiquetas]), len(etiquetas)
+
+@bench("preprocesar_starfit", reps=10)
+def _preprocesar_starfit(ctx):
+    import preproceso
+    img = ctx['capturas']['starfit'][0]
+    return (lambda: preproceso.preprocesar(img, "starfit")), 1
+
+@bench("extraer_starfit", reps=5)
+def _extraer_starfit(ctx):
+    _ocr(ctx, "starfit")
+    import starfit_ocr
+    img = ctx['capturas']['starfit'][0]
+    return (lambda: starfit_ocr.extraer_starfit(img)), 1
+
+@bench("procesar_grupo_starfit", reps=3)
+def _procesar_grupo_starfit(ctx):
+    _ocr(ctx, "starfit")
+    import starfit_ocr
+    imgs = ctx['capturas']['starfit']
+    return (lambda: starfit_ocr.procesar_grupo(imgs)), len(imgs)
+
+@bench("extraer_amazfit", reps=5)
+def _extraer_amazfit(ctx):
+    _ocr(ctx, "amazfit")
+    import amazfit_ocr
+    img = ctx['capturas']['amazfit'][0]
+    return (lambda: amazfit_ocr.extraer_amazfit(img)), 1
+
+# --- Subida -------------------------------------------------------------
+@bench("upload_data", reps=3)
+def _upload_data(ctx):
+    import uploader
+    import sheets_client
+    capturas = [(f"starfit/IMG_202401{d:02d}_0800.jpg",
+                 [(f"Metrica {m}", 50 + d + m / 10) for m in range(20)]) for d in range(1, 29)]
+
+    def fn():
+        tmp = Path(tempfile.mkdtemp(prefix="bench_upload_"))
+        ss = sheets_client.FakeSpreadsheet()
+        ss.worksheet("CAPTURAS").append_row(["Fecha", "Métrica", "Valor", "Archivo"])
+        sheets_client.set_backend(ss)
+        uploader.configurar(tmp)
+        uploader.flusher.max_por_minuto = 10**6
+        for img, datos in capturas:
+            uploader.upload_data(img, datos)
+        assert uploader.vaciar(timeout=60)
+        shutil.rmtree(tmp, ignore_errors=True)
+    return fn, sum(len(d) for _, d in capturas)
+
+# ----------------------------------------------------------------------
+# 2) Medición (dentro del proceso hijo)
+# ----------------------------------------------------------------------
+def _proc_status(campo):
+    """VmRSS / VmHWM de /proc/self/status en MB (Linux), o None."""
+    try:
+        with open("/proc/self/status") as fh:
+            for linea in fh:
+                if linea.startswith(campo + ":"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def reiniciar_pico():
+    """Pone el pico de RSS en el RSS actual (Linux ≥ 4.0); False si no se puede."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+def rss_mb():
+    return _proc_status("VmRSS")
+
+def rss_pico_mb():
+    pico = _proc_status("VmHWM")
+    if pico is not None:
+        return pico
+    try:
+        import resource                              # macOS: bytes
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+    except ImportError:                              # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20
+        except (ImportError, AttributeError):
+            return None
+
+def medir(nombre, ctx):
+    setup, reps = BENCH[nombre]
+    fn, items = setup(ctx)
+    base = rss_mb()
+    reiniciar_pico()
+    fn()                                             # calentamiento (imports, memos, disco)
+    tiempos = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    med = statistics.median(tiempos)
+    pico = rss_pico_mb()
+    return {
+        "reps": reps,
+        "mediana_s": med,
+        "min_s": min(tiempos),
+        "items": items,
+        "items_por_s": items / med if med > 0 else None,
+        "rss_pico_mb": pico,
+        "rss_extra_mb": pico - base if pico is not None and base is not None else None,
+    }
+
+def contexto(horas, acc_hz):
+    """Fixtures (se generan la primera vez) + metadatos que necesitan los benchmarks."""
+    polar = fixtures.noche_polar(horas=horas, acc_hz=acc_hz)
+    params = json.loads((polar['ACC'].parent / 'params.json').read_text(encoding='utf-8'))
+    capturas, layout = {}, {}
+    for app, n in (("starfit", 4), ("amazfit", 1)):
+        rutas = [fixtures.DIR / app / f"IMG_2024010{i + 1}_0800.jpg" for i in range(n)]
+        for r in rutas:
+            layout[app] = fixtures.captura(r, app)
+        capturas[app] = rutas
+    return {"polar": polar, "acc_filas": params['acc_filas'], "capturas": capturas,
+            "layout": layout, "ocr_real": tesseract_disponible()}
+
+def _nombre_reporte(nombre):
+    ocr = nombre.split("[")[0] in ("extraer_starfit", "procesar_grupo_starfit", "extraer_amazfit")
+    return nombre + (_sufijo() if ocr else "")
+
+# ----------------------------------------------------------------------
+# 3) Comparación con la línea base
+# ----------------------------------------------------------------------
+def comparar(resultados, base, tolerancia=TOLERANCIA):
+    """{nombre: (ratio mediana nueva/base, ¿regresión?)} para los presentes en ambos."""
+    out = {}
+    for n, r in resultados.items():
+        b = base.get(n)
+        if not b or not b.get("mediana_s"):
+            continue
+        ratio = r["mediana_s"] / b["mediana_s"]
+        out[n] = (ratio, ratio > 1 + tolerancia)
+    return out
+
+def _tabla(resultados, cmp):
+    print(f"{'benchmark':40} {'mediana':>10} {'mín':>10} {'items/s':>12} {'RSS MB':>8} {'+MB':>6}  vs base")
+    for n, r in resultados.items():
+        ips = f"{r['items_por_s']:,.0f}" if r.get('items_por_s') else "-"
+        rss = f"{r['rss_pico_mb']:.0f}" if r.get('rss_pico_mb') else "-"
+        extra = f"{r['rss_extra_mb']:.0f}" if r.get('rss_extra_mb') is not None else "-"
+        vs = ""
+        if n in cmp:
+            ratio, malo = cmp[n]
+            vs = f"{ratio:5.2f}×" + (" ⚠️ regresión" if malo else "")
+        print(f"{n:40} {1000 * r['mediana_s']:8.1f}ms {1000 * r['min_s']:8.1f}ms {ips:>12} {rss:>8} {extra:>6}  {vs}")
+
+# ----------------------------------------------------------------------
+# 4) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks offline del pipeline")
+    ap.add_argument('-k', dest='filtro', default=None, help="sólo benchmarks que contengan este texto")
+    ap.add_argument('--horas', type=float, default=8.0)
+    ap.add_argument('--acc-hz', type=int, default=50)
+    ap.add_argument('--base', default=str(BASE_FILE))
+    ap.add_argument('--guardar-base', action='store_true')
+    ap.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    ap.add_argument('--estricto', action='store_true', help="exit 1 si hay regresiones")
+    ap.add_argument('--json', default=None, help="guardar los resultados en este archivo")
+    ap.add_argument('--uno', default=None, help=argparse.SUPPRESS)   # uso interno (proceso hijo)
+    args = ap.parse_args(argv)
+
+    if args.uno:
+        r = medir(args.uno, contexto(args.horas, args.acc_hz))
+        print(json.dumps(r))
+        return 0
+
+    print(f"🧪 Preparando fixtures (noche de {args.horas:g} h, ACC {args.acc_hz} Hz)…")
+    ctx = contexto(args.horas, args.acc_hz)
+    if not ctx['ocr_real']:
+        print("⚠️ Tesseract no disponible: OCR simulado")
+
+    resultados = {}
+    for nombre in BENCH:
+        if args.filtro and args.filtro not in nombre:
+            continue
+        cmd = [sys.executable, str(Path(__file__).resolve()), '--uno', nombre,
+               '--horas', str(args.horas), '--acc-hz', str(args.acc_hz)]
+        p = subprocess.run(cmd, capture_output=True, text=True)
+        if p.returncode != 0:
+            print(f"❌ {nombre}: {p.stderr.strip().splitlines()[-1] if p.stderr.strip() else p.returncode}")
+            continue
+        resultados[_nombre_reporte(nombre)] = json.loads(p.stdout.strip().splitlines()[-1])
+
+    base_path = Path(args.base)
+    base = json.loads(base_path.read_text(encoding='utf-8')) if base_path.exists() else {}
+    cmp = comparar(resultados, base, args.tolerancia)
+    _tabla(resultados, cmp)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(resultados, indent=1), encoding='utf-8')
+    if args.guardar_base:
+        base.update(resultados)
+        base_path.write_text(json.dumps(base, indent=1, sort_keys=True), encoding='utf-8')
+        print(f"💾 Línea base guardada en {base_path}")
+    regresiones = [n for n, (_, malo) in cmp.items() if malo]
+    if regresiones:
+        print(f"⚠️ {len(regresiones)} regresiones > {args.tolerancia:.0%}: {', '.join(regresiones)}")
+        return 1 if args.estricto else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# === benchmarks/fixtures.py ===
+"""
+Fixtures sintéticas para los benchmarks: reproducibles (semilla fija) y sin red.
+
+  - noche_polar(): *_RR.txt, *_HR.txt y *_ACC.txt de una noche de `horas`
+    con el formato de Polar Sensor Logger (separador ';'): RR latido a
+    latido con arritmia sinusal respiratoria + onda LF, HR a 1 Hz y ACC a
+    `acc_hz` con algunos tramos de movimiento (y los latidos ruidosos de
+    esos tramos).
+  - captura(): pantalla tipo StarFit / Amazfit renderizada con cv2 y el
+    layout de sus palabras, con el que OCRSimulado contesta image_to_data
+    igual que Tesseract (para medir el pipeline en máquinas sin Tesseract).
+
+Los archivos se generan una sola vez en cache/bench/ (la carpeta depende de
+los parámetros) y se reutilizan en las corridas siguientes.
+"""
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+DIR = ROOT / 'cache' / 'bench'
+INICIO = pd.Timestamp("2024-01-05 23:00:00")
+
+# ----------------------------------------------------------------------
+# 1) Noche Polar H10
+# ----------------------------------------------------------------------
+def _rr(horas, rng):
+    n = int(horas * 3600 * 1.2)                # de sobra: se corta a `horas`
+    t = np.arange(n, dtype=float)
+    rr = (1000 + 40 * np.sin(2 * np.pi * 0.25 * t)       # HF (respiración, por latido)
+          + 30 * np.sin(2 * np.pi * 0.1 * t)                # LF (barorreflejo)
+          + 60 * np.sin(2 * np.pi * t / 5400)              # ciclos de sueño
+          + rng.normal(0, 15, n))
+    rr = rr[np.cumsum(rr) <= horas * 3600e3]
+    return rr
+
+def _movimiento(duracion_s, rng, tramos=6):
+    """[(inicio_s, fin_s), …] de movimiento repartidos en la noche."""
+    inicios = np.sort(rng.uniform(600, duracion_s - 900, tramos))
+    return [(a, a + rng.uniform(60, 300)) for a in inicios]
+
+def noche_polar(dir_=DIR, horas=8.0, acc_hz=50, semilla=0):
+    """Genera (o reutiliza) una noche → {'RR': Path, 'HR': Path, 'ACC': Path}."""
+    carpeta = Path(dir_) / f"polar_{horas:g}h_{acc_hz}hz_{semilla}"
+    base = f"Polar_H10_{INICIO:%Y%m%d_%H%M}"
+    files = {k: carpeta / f"{base}_{k}.txt" for k in ('RR', 'HR', 'ACC')}
+    if all(p.exists() for p in files.values()):
+        return files
+    carpeta.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+
+    rr = _rr(horas, rng)
+    t_rr = np.cumsum(rr) / 1000.0
+    mov = _movimiento(t_rr[-1], rng)
+    for a, b in mov:                                   # latidos ruidosos al moverse
+        sel = (t_rr >= a) & (t_rr < b)
+        rr[sel] += rng.normal(0, 120, sel.sum())
+    rr = np.clip(rr, 250, 2500).round()
+    pd.DataFrame({
+        "Phone timestamp": (INICIO + pd.to_timedelta(t_rr, unit="s")).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "RR-interval [ms]": rr.astype(int),
+    }).to_csv(files['RR'], sep=";", index=False)
+
+    t_hr = np.arange(int(t_rr[-1]))
+    hr = np.interp(t_hr, t_rr, 60000.0 / rr).round()
+    pd.DataFrame({
+        "Phone timestamp": (INICIO + pd.to_timedelta(t_hr, unit="s")).strftime("%Y-%m-%dT%H:%M:%S.%f"),
+        "HR [bpm]": hr.astype(int),
+        "HRV [ms]": 0, "Breathing interval [rpm]": 0,
+    }).to_csv(files['HR'], sep=";", index=False)
+
+    n = int(t_rr[-1] * acc_hz)
+    t_acc = np.arange(n) / acc_hz
+    ruido = np.full(n, 5.0, dtype=np.float32)
+    for a, b in mov:
+        ruido[(t_acc >= a) & (t_acc < b)] = 200.0
+    xyz = rng.normal(0, 1, (n, 3)).astype(np.float32) * ruido[:, None]
+    xyz[:, 2] += 1000.0                                # gravedad en Z (mg)
+    ts_ns = (np.int64(1_700_000_000) * 10**9 + (t_acc * 1e9).astype(np.int64))
+    telefono = np.full(n, "", dtype=object)
+    telefono[0] = f"{INICIO:%Y-%m-%dT%H:%M:%S.%f}"     # sólo la 1ª fila se usa (desfase)
+    pd.DataFrame({
+        "Phone timestamp": telefono, "sensor timestamp [ns]": ts_ns,
+        "X [mg]": xyz[:, 0].round().astype(int), "Y [mg]": xyz[:, 1].round().astype(int),
+        "Z [mg]": xyz[:, 2].round().astype(int),
+    }).to_csv(files['ACC'], sep=";", index=False)
+    (carpeta / "params.json").write_text(json.dumps(
+        {"horas": horas, "acc_hz": acc_hz, "latidos": int(len(rr)), "acc_filas": n}), encoding="utf-8")
+    return files
+
+# ----------------------------------------------------------------------
+# 2) Capturas renderizadas + OCR simulado
+# ----------------------------------------------------------------------
+PANTALLAS = {
+    "starfit": [("81.9 kg", "Peso"), ("22.9%", "Grasa corporal"), ("26.1", "IMC"),
+                ("9", "Grasa visceral"), ("58.3%", "Agua corporal"), ("1712 kcal", "BMR"),
+                ("61.2 kg", "Masa muscular"), ("41", "Edad corporal"), ("18.4%", "Grasa subcutanea"),
+                ("3.1 kg", "Masa esqueletica")],
+    "amazfit": [("1850", "Comido"), ("420", "Ejercicio"), ("1070", "Restante"), ("2500", "Meta")],
+}
+
+def _layout(app, ancho=1080):
+    """Palabras [(texto, x, y, w, h)] de la pantalla: valor grande sobre su etiqueta, 2 columnas."""
+    palabras = []
+    for k, (valor, etiqueta) in enumerate(PANTALLAS[app]):
+        x0 = 80 + (k % 2) * ancho // 2
+        y0 = 260 + (k // 2) * 260
+        for texto, y, h, esc in ((valor, y0, 56, 2.0), (etiqueta, y0 + 90, 34, 1.1)):
+            x = x0
+            for w in texto.split():
+                ancho_w = int(len(w) * 26 * esc)
+                palabras.append((w, x, y, ancho_w, h))
+                x += ancho_w + int(18 * esc)
+    return palabras
+
+def captura(path, app="starfit", ancho=1080, alto=2340):
+    """Renderiza la pantalla de `app` en `path` (si no existe) y devuelve su layout."""
+    path = Path(path)
+    palabras = _layout(app, ancho)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        img = np.full((alto, ancho, 3), 250, np.uint8)
+        cv2.rectangle(img, (0, 0), (ancho, 160), (90, 170, 60), -1)       # barra superior
+        for texto, x, y, w, h in palabras:
+            esc = h / 28
+            cv2.putText(img, texto, (x, y + h), cv2.FONT_HERSHEY_SIMPLEX, esc, (30, 30, 30),
+                        max(2, int(esc * 2)), cv2.LINE_AA)
+        cv2.imwrite(str(path), img, [cv2.IMWRITE_JPEG_QUALITY, 92])
+    return palabras
+
+
+class OCRSimulado:
+    """Backend OCR que devuelve el layout conocido de la captura (sin Tesseract)."""
+
+    def __init__(self, palabras, conf=95.0):
+        self.palabras = palabras
+        self.conf = conf
+
+    def image_to_data(self, img, lang, config):
+        d = {k: [] for k in ("text", "conf", "left", "top", "width", "height",
+                             "block_num", "par_num", "line_num")}
+        for texto, x, y, w, h in self.palabras:
+            d["text"].append(texto); d["conf"].append(self.conf)
+            d["left"].append(x); d["top"].append(y); d["width"].append(w); d["height"].append(h)
+            d["block_num"].append(1); d["par_num"].append(1); d["line_num"].append(y)
+        return d
+
+    def image_to_string(self, img, lang, config):
+        return ""
+
+    def precargar(self, lang):
+        pass
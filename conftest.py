@@ -1,8 +1,42 @@
 # === conftest.py ===
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 # Asegura que el proyecto (y su carpeta scripts/) esté en sys.path
 ROOT = Path(__file__).resolve().parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+# Antes de importar scripts/: stores, journal y logs nunca en data/ ni logs/ del proyecto
+_TMP = Path(tempfile.mkdtemp(prefix="jcpsalud_tests_"))
+os.environ["JCPSALUD_DATA_DIR"] = str(_TMP / "data")
+os.environ["JCPSALUD_LOG_DIR"] = str(_TMP / "logs")
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _ocr_cache_aislada(tmp_path, monkeypatch):
+    # Cada test usa su propia caché OCR, nunca la del proyecto
+    monkeypatch.setenv("JCPSALUD_OCR_CACHE", str(tmp_path / "ocr_cache.sqlite"))
+
+
+@pytest.fixture(autouse=True)
+def _ocr_backend_pytesseract(monkeypatch):
+    # Los tests simulan pytesseract; nunca usar un tesserocr instalado
+    monkeypatch.setenv("JCPSALUD_OCR_BACKEND", "pytesseract")
+    import scripts.ocr_backend as ocr_backend
+    ocr_backend.set_backend(None)
+
+
+@pytest.fixture(autouse=True)
+def _datos_aislados(tmp_path):
+    # Cada test parte de stores/journal vacíos en su tmp_path
+    mods = [sys.modules[n] for n in ("uploader", "scripts.uploader") if n in sys.modules]
+    for mod in mods:
+        mod.configurar(tmp_path / "data")
+    yield
+    for mod in mods:
+        mod.flusher.stop()
@@ -1,16 +1,25 @@
 # === amazfit_ocr.py – versión robusta simplificada (solo kcal) ===
 from pathlib import Path
 from typing import List, Tuple
-import re, cv2, pytesseract, unidecode
-import numpy as np
+import re, bisect, unidecode
+import sys
+import json
+import hashlib
+
+sys.path.append(str(Path(__file__).resolve().parent))
+import ocr_cache
+import roi_ocr
+import preproceso
+import instrumentacion
+
+# Versión del extractor para la caché OCR (subirla al cambiar patrones; preprocesado
+# y plantillas de roi_ocr entran solos)
+EXTRACTOR_VERSION = f"3+{roi_ocr.MODO}+" + "+".join(
+    f"{k}={v}" for k, v in sorted(preproceso.perfil("amazfit").items())) + "+" + hashlib.sha1(
+    json.dumps(roi_ocr.PLANTILLAS.get("amazfit", []), sort_keys=True).encode("utf-8")).hexdigest()[:8]
 
 def _pre(p: Path):
-    g = cv2.cvtColor(cv2.imread(str(p)), cv2.COLOR_BGR2GRAY)
-    g = cv2.bilateralFilter(g, 9, 75, 75)
-    _, th = cv2.threshold(g, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    th = cv2.medianBlur(th, 3)
-    th = cv2.dilate(th, None, iterations=1)
-    return th
+    return preproceso.preprocesar(p, "amazfit")
 
 _fix = lambda s: (
     s.replace("l", "1").replace("I", "1").replace("|", "1")
@@ -18,29 +27,46 @@ _fix = lambda s: (
      .replace(" ", "").replace(".", "").replace(",", "")
 )
 
+@ocr_cache.cacheado("amazfit", EXTRACTOR_VERSION)
 def extraer_amazfit(img: Path | str) -> List[Tuple[str, float]]:
     out = []
-    txt = unidecode.unidecode(
-        pytesseract.image_to_string(_pre(img), lang="spa+eng", config="--oem 3 --psm 6")
-    )
-
-    dig = r"(\d[\d\s]{2,6})"
-
-    patrones = [
-        ("Comido",    "AMAZFIT_KCAL_COMIDO"),
-        ("Ejercicio", "AMAZFIT_KCAL_EJERCICIO"),
-        ("Restante",  "AMAZFIT_KCAL_RESTANTE"),
-        ("Meta",      "AMAZFIT_KCAL_META"),
-    ]
-
-    for lbl, key in patrones:
-        m = re.search(fr"\b{dig}\b[^\d]{{0,10}}{lbl}", txt, re.I) or \
-            re.search(fr"{lbl}[^\d]{{0,10}}\b{dig}\b", txt, re.I)
-        if m and m.groups():
-            val = _fix(m.group(1))
-            try:
-                out.append((key, float(val)))
-            except ValueError:
-                continue
+    # una sola llamada a Tesseract: renglones con su confianza
+    if roi_ocr.MODO == "roi":
+        renglones = roi_ocr.renglones(img, "amazfit")
+    else:
+        renglones = roi_ocr.renglones_pagina(_pre(img), config="--oem 3 --psm 6")
+    with instrumentacion.etapa("parse"):
+        txt, fin, confs = "", [], []
+        for r in renglones:
+            txt += unidecode.unidecode(r.texto) + "\n"
+            fin.append(len(txt))
+            confs.append(r.conf)
+
+        def conf_en(pos):
+            return min(confs[bisect.bisect_right(fin, pos)], 100.0)
+
+        dig = r"(\d[\d\s]{2,6})"
+
+        patrones = [
+            ("Comido",    "AMAZFIT_KCAL_COMIDO"),
+            ("Ejercicio", "AMAZFIT_KCAL_EJERCICIO"),
+            ("Restante",  "AMAZFIT_KCAL_RESTANTE"),
+            ("Meta",      "AMAZFIT_KCAL_META"),
+        ]
+
+        for lbl, key in patrones:
+            for rx in (fr"\b{dig}\b[^\d]{{0,10}}{lbl}", fr"{lbl}[^\d]{{0,10}}\b{dig}\b"):
+                m = re.search(rx, txt, re.I)
+                if not (m and m.groups()):
+                    continue
+                conf = conf_en(m.start(1))
+                if conf < roi_ocr.CONF_MIN:
+                    continue    # lectura dudosa: probar el otro orden número/etiqueta
+                val = _fix(m.group(1))
+                try:
+                    out.append(roi_ocr.Medida(key, float(val), round(conf, 1)))
+                except ValueError:
+                    continue
+                break
 
     return out
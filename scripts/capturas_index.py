@@ -0,0 +1,190 @@
+# === scripts/capturas_index.py ===
+"""
+Índice local de duplicados para CAPTURAS.
+
+Guarda en SQLite las claves (Fecha, Métrica, Valor, Archivo) ya presentes en
+la hoja, la fila de cada (Fecha, Métrica, Archivo) y la última fila conocida.
+En cada subida sólo se leen las filas posteriores a esa marca, así el costo
+es O(filas nuevas) y no O(historial). La fila de cada medida permite corregir
+su valor en el lugar en vez de agregar una segunda fila contradictoria.
+"""
+import os
+import re
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger('uploader')
+
+NCOLS = 4   # Fecha | Métrica | Valor | Archivo (tal como las escribe upload_data)
+ESQUEMA = '2'   # 2: tabla `filas`; un índice anterior se reconstruye en el próximo sync
+
+
+def clave(row):
+    """Fila de la hoja → clave normalizada (valor con 2 decimales si es numérico)."""
+    r = [str(c).strip() for c in list(row)[:NCOLS]]
+    r += [''] * (NCOLS - len(r))
+    try:
+        r[2] = f"{float(r[2].replace(',', '.')):.2f}"
+    except ValueError:
+        pass
+    return tuple(r)
+
+
+def _fila_final(resp):
+    """Extrae la última fila escrita de la respuesta de append_rows, si viene."""
+    try:
+        rango = resp['updates']['updatedRange']
+    except (TypeError, KeyError):
+        return None
+    m = re.search(r":[A-Z]+(\d+)$", rango)
+    return int(m.group(1)) if m else None
+
+
+class CapturasIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS claves ("
+                " fecha TEXT, metrica TEXT, valor TEXT, archivo TEXT,"
+                " PRIMARY KEY (fecha, metrica, valor, archivo)) WITHOUT ROWID"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS filas ("
+                " fecha TEXT, metrica TEXT, archivo TEXT, fila INTEGER,"
+                " PRIMARY KEY (fecha, metrica, archivo)) WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+            row = self._conn.execute("SELECT v FROM meta WHERE k = 'esquema'").fetchone()
+            if row is None or row[0] != ESQUEMA:
+                # sin posiciones de filas: se vuelve a leer la hoja entera
+                self._conn.execute("DELETE FROM meta")
+                self._conn.execute("INSERT INTO meta (k, v) VALUES ('esquema', ?)", (ESQUEMA,))
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    # ------------------------------------------------------------------
+    def _meta(self, k, default=None):
+        row = self._db().execute("SELECT v FROM meta WHERE k = ?", (k,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, k, v):
+        self._db().execute("INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)", (k, str(v)))
+
+    @property
+    def ultima_fila(self):
+        with self._lock:
+            return int(self._meta('ultima_fila', 1))   # fila 1 = cabecera
+
+    # ------------------------------------------------------------------
+    def sync(self, ws):
+        """
+        Lee de la hoja sólo las filas posteriores a la última conocida. Si la
+        fila marca ya no coincide (hoja editada/borrada) reconstruye todo.
+        """
+        with self._lock:
+            db = self._db()
+            ultima = int(self._meta('ultima_fila', 1))
+            marca = self._meta('ultima_clave')
+            if ultima > 1 and marca is not None:
+                filas = ws.get(f"A{ultima}:D")
+                if not filas or '\x1f'.join(clave(filas[0])) != marca:
+                    logger.warning("⚠️ CAPTURAS cambió por fuera, reconstruyendo índice")
+                    ultima, filas = 1, None
+                else:
+                    filas = filas[1:]
+            else:
+                ultima, filas = 1, None
+            if filas is None:
+                db.execute("DELETE FROM claves")
+                db.execute("DELETE FROM filas")
+                filas = ws.get("A2:D")
+            self._agregar(db, filas, ultima + len(filas))
+            db.commit()
+            return len(filas)
+
+    def filtrar_nuevos(self, rows):
+        """Devuelve las filas cuya clave no está en el índice (ni repetida en `rows`)."""
+        with self._lock:
+            db = self._db()
+            nuevos, vistos = [], set()
+            for r in rows:
+                k = clave(r)
+                if k in vistos:
+                    continue
+                vistos.add(k)
+                if db.execute(
+                    "SELECT 1 FROM claves WHERE fecha=? AND metrica=? AND valor=? AND archivo=?", k
+                ).fetchone():
+                    continue
+                nuevos.append(r)
+            return nuevos
+
+    def valores(self, rows):
+        """{(fecha, métrica, archivo): {valores ya subidos}} para las filas dadas."""
+        with self._lock:
+            db = self._db()
+            out = {}
+            for f, m, _, a in {clave(r) for r in rows}:
+                if (f, m, a) in out:
+                    continue
+                out[(f, m, a)] = {v for (v,) in db.execute(
+                    "SELECT valor FROM claves WHERE fecha=? AND metrica=? AND archivo=?", (f, m, a))}
+            return out
+
+    def posiciones(self, rows):
+        """{(fecha, métrica, archivo): fila de la hoja} de las filas dadas que ya están."""
+        with self._lock:
+            db = self._db()
+            out = {}
+            for f, m, _, a in {clave(r) for r in rows}:
+                row = db.execute("SELECT fila FROM filas WHERE fecha=? AND metrica=? AND archivo=?",
+                                 (f, m, a)).fetchone()
+                if row:
+                    out[(f, m, a)] = row[0]
+            return out
+
+    def corregir(self, cambios):
+        """Anota valores reescritos en su fila: [(fila, row), …]. Los valores viejos salen del índice."""
+        with self._lock:
+            db = self._db()
+            ultima = int(self._meta('ultima_fila', 1))
+            for fila, r in cambios:
+                f, m, v, a = clave(r)
+                db.execute("DELETE FROM claves WHERE fecha=? AND metrica=? AND archivo=?", (f, m, a))
+                db.execute("INSERT OR IGNORE INTO claves VALUES (?, ?, ?, ?)", (f, m, v, a))
+                if fila == ultima:
+                    self._set_meta('ultima_clave', '\x1f'.join((f, m, v, a)))
+            db.commit()
+
+    def registrar(self, rows, resp=None):
+        """Agrega al índice filas recién subidas con append_rows."""
+        with self._lock:
+            db = self._db()
+            fin = _fila_final(resp)
+            if fin is None:
+                fin = int(self._meta('ultima_fila', 1)) + len(rows)
+            self._agregar(db, rows, fin)
+            db.commit()
+
+    def _agregar(self, db, filas, ultima):
+        """`filas` ocupan las filas de la hoja que terminan en `ultima`."""
+        db.executemany("INSERT OR IGNORE INTO claves VALUES (?, ?, ?, ?)", [clave(r) for r in filas])
+        primera = ultima - len(filas) + 1
+        # si la hoja ya trae la misma medida repetida, la fila posterior es la vigente
+        db.executemany("INSERT OR REPLACE INTO filas VALUES (?, ?, ?, ?)",
+                       [(k[0], k[1], k[3], primera + i) for i, k in enumerate(map(clave, filas))])
+        self._set_meta('ultima_fila', ultima)
+        if filas:
+            self._set_meta('ultima_clave', '\x1f'.join(clave(filas[-1])))
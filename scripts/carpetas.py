@@ -0,0 +1,82 @@
+# === scripts/carpetas.py ===
+"""
+Hot-folders, carpetas de procesados y agrupado de archivos en trabajos
+(clasificar / completo), compartidos por ocr_watcher, ingesta y reimportar.
+
+Importarlo no tiene efectos: no crea carpetas ni configura logging. Quien
+arranca un servicio llama crear_carpetas().
+"""
+import re
+import json
+from pathlib import Path
+
+# ----------------------------------------------------------------------
+# 1) Configuración
+# ----------------------------------------------------------------------
+BASE_DIR  = Path(__file__).resolve().parent.parent
+cfg       = json.loads((BASE_DIR / 'config.json').read_text(encoding='utf-8'))
+ROOT      = Path(cfg['ROOT'])
+INCOMING  = ROOT / cfg['INCOMING']
+PROCESSED = ROOT / cfg['PROCESSED']
+OCR_WORKERS = cfg.get('OCR_WORKERS')   # None → os.cpu_count()
+DEBOUNCE_S  = cfg.get('DEBOUNCE_S', 2.0)  # segundos sin cambios antes de procesar
+
+# Hot-folders
+POLAR_IN    = INCOMING / 'Polar'
+STARFIT_IN  = INCOMING / 'starfit'
+AMAZFIT_IN  = INCOMING / 'amazfit'
+LAB_IN      = INCOMING / 'laboratorio'
+
+# Procesados
+POLAR_OUT    = PROCESSED / 'Polar'
+STARFIT_OUT  = PROCESSED / 'starfit'
+AMAZFIT_OUT  = PROCESSED / 'amazfit'
+LAB_OUT      = PROCESSED / 'laboratorio'
+
+ENTRADAS = {'POLAR': POLAR_IN, 'STARFIT': STARFIT_IN, 'AMAZFIT': AMAZFIT_IN, 'LABORATORIO': LAB_IN}
+SALIDAS = {'POLAR': POLAR_OUT, 'STARFIT': STARFIT_OUT, 'AMAZFIT': AMAZFIT_OUT, 'LABORATORIO': LAB_OUT}
+
+def crear_carpetas():
+    for d in (INCOMING, PROCESSED, *ENTRADAS.values(), *SALIDAS.values()):
+        d.mkdir(parents=True, exist_ok=True)
+
+# ----------------------------------------------------------------------
+# 2) Agrupado de archivos
+# ----------------------------------------------------------------------
+IMG_EXT = {'.jpg', '.jpeg', '.png'}
+
+def polar_base(name):
+    m = re.search(r"(\d{8}_\d{4})", name)
+    return m.group(1) if m else None
+
+def clasificar(p: Path):
+    """Ruta → (tipo, clave de grupo) o None si no nos interesa."""
+    ext = p.suffix.lower()
+    parent = p.parent.name.lower()
+    if ext == '.txt' and parent == 'polar':
+        base = polar_base(p.name)
+        return ('POLAR', base) if base else None
+    if ext in IMG_EXT and parent == 'starfit':
+        m = re.search(r"(\d{8})", p.name)
+        return ('STARFIT', m.group(1) if m else '<sin_fecha>')
+    if ext in IMG_EXT and parent == 'amazfit':
+        return ('AMAZFIT', p.name)
+    if ext in IMG_EXT | {'.pdf'} and parent == 'laboratorio':
+        return ('LABORATORIO', p.name)
+    return None
+
+def polar_files(paths):
+    g = {}
+    for f in paths:
+        if '_RR.txt' in f.name:  g['RR']  = f
+        if '_ACC.txt' in f.name: g['ACC'] = f
+        if '_HR.txt' in f.name:  g['HR']  = f
+    return g
+
+def completo(kind, key, paths):
+    """El grupo tiene todo lo necesario para procesarse."""
+    if kind == 'POLAR':
+        return {'RR', 'ACC', 'HR'}.issubset(polar_files(paths))
+    if kind == 'STARFIT':
+        return len(paths) >= 2
+    return True
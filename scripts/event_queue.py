@@ -0,0 +1,155 @@
+# === scripts/event_queue.py ===
+"""
+Cola de eventos con debounce y deduplicación para ocr_watcher.
+
+Los eventos de watchdog (CREATED/MODIFIED/MOVED) sólo registran la ruta. Un
+hilo revisa periódicamente tamaño y mtime de cada archivo pendiente; cuando un
+grupo completo lleva `quiet` segundos sin cambios se despacha una sola vez.
+El tiempo entre el primer evento de un grupo y su despacho se registra como
+etapa "detect" (instrumentacion).
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+sys.path.append(str(Path(__file__).resolve().parent))
+import instrumentacion
+
+logger = logging.getLogger('event_queue')
+
+
+class CoalescingQueue:
+    """
+    clasificar(path) -> (kind, key) | None   agrupa archivos (p.ej. ('POLAR', '20240101_2300'))
+    completo(kind, key, paths) -> bool        el grupo está listo para procesarse
+    despachar(kind, key, paths)               se llama una vez por grupo estable
+    """
+
+    def __init__(self, clasificar, despachar, completo=None,
+                 quiet=2.0, poll=0.5, clock=time.monotonic, memoria=1024):
+        self.clasificar = clasificar
+        self.despachar = despachar
+        self.completo = completo or (lambda kind, key, paths: True)
+        self.quiet = quiet
+        self.poll = poll
+        self.clock = clock
+        self.memoria = memoria
+        self._pending = {}                  # Path -> [size, mtime, estable_desde, visto_desde]
+        self._groups = {}                   # (kind, key) -> set(Path)
+        self._dispatched = OrderedDict()    # (kind, key) -> firma ya despachada
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    def notify(self, path):
+        """Registra un evento; no hace I/O más allá de clasificar la ruta."""
+        p = Path(path)
+        tag = self.clasificar(p)
+        if tag is None:
+            return
+        with self._lock:
+            if p not in self._pending:
+                self._pending[p] = [None, None, self.clock(), self.clock()]
+            self._groups.setdefault(tag, set()).add(p)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    # ------------------------------------------------------------------
+    def tick(self):
+        """Una pasada: actualiza estabilidad y despacha los grupos listos."""
+        now = self.clock()
+        listos = []
+        with self._lock:
+            for p, st in list(self._pending.items()):
+                try:
+                    s = os.stat(p)
+                except OSError:
+                    # movido/borrado antes de estabilizarse
+                    self._forget(p)
+                    continue
+                if (s.st_size, s.st_mtime) != (st[0], st[1]):
+                    st[0], st[1], st[2] = s.st_size, s.st_mtime, now
+
+            for tag, paths in list(self._groups.items()):
+                if not paths:
+                    del self._groups[tag]
+                    continue
+                if any(now - self._pending[p][2] < self.quiet for p in paths):
+                    continue
+                firma = frozenset((p, self._pending[p][0], self._pending[p][1]) for p in paths)
+                if self._dispatched.get(tag) == firma:
+                    del self._groups[tag]
+                    for p in paths:
+                        self._pending.pop(p, None)
+                    logger.info(f"⏭ {tag[0]} {tag[1]} sin cambios, ya despachado")
+                    continue
+                # completo() en True implica despacho en esta misma pasada
+                ordenados = sorted(paths)
+                if not self.completo(tag[0], tag[1], ordenados):
+                    continue
+                visto = min(self._pending[p][3] for p in paths)
+                del self._groups[tag]
+                for p in paths:
+                    self._pending.pop(p, None)
+                self._dispatched[tag] = firma
+                self._dispatched.move_to_end(tag)
+                while len(self._dispatched) > self.memoria:
+                    self._dispatched.popitem(last=False)
+                listos.append((tag, ordenados))
+                instrumentacion.registrar("detect", now - visto)
+
+        for (kind, key), paths in listos:
+            try:
+                self.despachar(kind, key, paths)
+            except Exception as e:
+                self.olvidar(kind, key)
+                logger.error(f"❌ Error despachando {kind} {key}: {e}")
+        return len(listos)
+
+    def olvidar(self, kind, key):
+        """Descarta la firma despachada de un grupo (p.ej. si su trabajo falló) para reintentarlo."""
+        with self._lock:
+            self._dispatched.pop((kind, key), None)
+
+    def reintentar(self, kind, key, paths, espera=0.0):
+        """
+        Vuelve a encolar un grupo cuyo trabajo falló: se despacha otra vez tras
+        `espera` + quiet segundos aunque sus archivos no reciban más eventos.
+        """
+        now = self.clock()
+        with self._lock:
+            self._dispatched.pop((kind, key), None)
+            for p in map(Path, paths):
+                try:
+                    s = os.stat(p)
+                except OSError:
+                    continue                # ya no está: nada que reintentar
+                st = self._pending.setdefault(p, [None, None, now, now])
+                st[0], st[1], st[2] = s.st_size, s.st_mtime, max(st[2], now + espera)
+                self._groups.setdefault((kind, key), set()).add(p)
+
+    def _forget(self, p):
+        self._pending.pop(p, None)
+        for tag, paths in self._groups.items():
+            paths.discard(p)
+
+    # ------------------------------------------------------------------
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='event_queue', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.poll):
+            self.tick()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
@@ -0,0 +1,295 @@
+# === scripts/ingesta.py ===
+"""
+Servicio de ingesta sobre asyncio (alternativa a ocr_watcher y su bucle de sleep).
+
+    watchdog (hilo) ──► asyncio.Queue de rutas ──► CoalescingQueue (debounce,
+    tick en un hilo) ──► cola acotada por equipo ──► extracción en el
+    ProcessPool ──► upload_data en un hilo ──► processed/
+
+upload_data sólo escribe en el store/journal local (SQLite, con su propio
+lock); la subida a Sheets la hace el flusher en segundo plano con la cuota
+compartida, así que no hace falta limitar las subidas concurrentes.
+
+Un equipo lento (p.ej. una noche Polar larga o un PDF escaneado) sólo frena
+su propia cola: cuando está llena, completo() devuelve False y sus grupos
+siguen esperando (y coalesciendo) en la CoalescingQueue, sin bloquear a los
+demás. Los trabajos de un mismo (tipo, grupo) nunca corren en paralelo y un
+grupo que falla se vuelve a intentar con el próximo evento de sus archivos.
+
+Con SIGINT/SIGTERM deja de recibir eventos, espera lo encolado y en curso
+(hasta INGESTA_DRENAJE_S), vacía el journal de subidas y cierra el pool; lo
+que no llegó a estabilizarse se retoma con el escaneo inicial del próximo
+arranque.
+
+Uso:
+    python scripts/ingesta.py
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(str(Path(__file__).resolve().parent))
+import carpetas
+import ocr_pool
+import instrumentacion
+from event_queue import CoalescingQueue
+
+logger = logging.getLogger('ingesta')
+
+# ----------------------------------------------------------------------
+# 1) Configuración
+# ----------------------------------------------------------------------
+cfg = carpetas.cfg
+COLA_POR_EQUIPO = cfg.get('INGESTA_COLA_POR_EQUIPO', 4)       # grupos listos en espera por equipo
+EXTRACCIONES_POR_EQUIPO = cfg.get('INGESTA_EXTRACCIONES_POR_EQUIPO', 2)
+DRENAJE_S = cfg.get('INGESTA_DRENAJE_S', 120)
+
+ENTRADAS = carpetas.ENTRADAS
+SALIDAS = carpetas.SALIDAS
+
+# ----------------------------------------------------------------------
+# 2) Pasos por defecto (extracción en worker, subida y movida en el principal)
+# ----------------------------------------------------------------------
+def argumentos(kind, paths):
+    """Grupo de archivos → argumentos de ocr_pool.JOBS[kind]."""
+    if kind == 'POLAR':
+        g = carpetas.polar_files(paths)
+        return str(g['RR']), str(g['ACC']), str(g['HR'])
+    if kind == 'STARFIT':
+        return ([str(p) for p in paths],)
+    return (str(paths[0]),)
+
+def subir(ref, datos):
+    from uploader import upload_data
+    upload_data(ref, datos)
+
+def mover(kind, paths):
+    for f in paths:
+        shutil.move(str(f), str(SALIDAS[kind] / Path(f).name))
+        logger.info(f" → Moved {kind} file {Path(f).name}")
+
+def vaciar_journal():
+    """Sube lo pendiente antes de salir; False si quedó algo en el journal."""
+    import uploader
+    return uploader.vaciar()
+
+# ----------------------------------------------------------------------
+# 3) Servicio
+# ----------------------------------------------------------------------
+class ServicioIngesta:
+    """
+    extraer(kind, *args) -> (datos, segundos, delta de instrumentación)   corre en `executor`
+    subir(ref, datos) / mover(kind, paths) / vaciar()                      corren en hilos
+    """
+
+    def __init__(self, executor=None, extraer=ocr_pool._run_job, subir=subir, mover=mover,
+                 vaciar=vaciar_journal, tipos=tuple(SALIDAS), cola_por_equipo=COLA_POR_EQUIPO,
+                 por_equipo=EXTRACCIONES_POR_EQUIPO, quiet=carpetas.DEBOUNCE_S, poll=0.5,
+                 drenaje=DRENAJE_S):
+        self.executor = executor
+        self.extraer, self.subir, self.mover, self.vaciar = extraer, subir, mover, vaciar
+        self.tipos = tipos
+        self.por_equipo = por_equipo
+        self.poll = poll
+        self.drenaje = drenaje
+        self.coalescer = CoalescingQueue(carpetas.clasificar, self._despachar, self._completo,
+                                         quiet=quiet)
+        self.procesados = 0
+        self._lock = threading.Lock()       # _en_curso/_reservas: tick() corre en un hilo
+        self._en_curso = set()              # (kind, key) encolados o corriendo
+        self._loop = None
+        self.eventos = asyncio.Queue()
+        self.colas = {k: asyncio.Queue(maxsize=cola_por_equipo) for k in tipos}
+        self._reservas = dict.fromkeys(tipos, 0)
+        self._parar = asyncio.Event()
+
+    # --- entrada de eventos -------------------------------------------
+    def notify_threadsafe(self, path):
+        """Para el hilo de watchdog: deja la ruta en la cola del loop."""
+        self._loop.call_soon_threadsafe(self.eventos.put_nowait, Path(path))
+
+    async def _recibir(self):
+        while True:
+            p = await self.eventos.get()
+            instrumentacion.contar("eventos")
+            self.coalescer.notify(p)
+
+    async def _estabilizar(self):
+        while True:
+            await asyncio.sleep(self.poll)
+            await asyncio.to_thread(self.coalescer.tick)     # os.stat de cada pendiente
+
+    # --- backpressure por equipo (llamados desde tick, fuera del loop) --
+    def _completo(self, kind, key, paths):
+        """Listo y con lugar en la cola del equipo; reserva el lugar hasta encolarlo."""
+        cola = self.colas[kind]
+        with self._lock:
+            if (kind, key) in self._en_curso or cola.qsize() + self._reservas[kind] >= cola.maxsize:
+                return False                # sigue esperando en la CoalescingQueue
+            if not carpetas.completo(kind, key, paths):
+                return False
+            self._reservas[kind] += 1       # tick() despacha en la misma pasada
+            return True
+
+    def _despachar(self, kind, key, paths):
+        with self._lock:
+            self._en_curso.add((kind, key))
+        self._loop.call_soon_threadsafe(self._encolar, kind, key, paths)
+        logger.info(f"Procesando {kind} {key} ({len(paths)} archivos)")
+
+    def _encolar(self, kind, key, paths):
+        with self._lock:
+            self._reservas[kind] -= 1       # qsize + reservas nunca supera maxsize
+        self.colas[kind].put_nowait((key, paths))
+
+    # --- trabajo -------------------------------------------------------
+    async def _trabajador(self, kind):
+        cola = self.colas[kind]
+        while True:
+            key, paths = await cola.get()
+            try:
+                await self._procesar(kind, key, paths)
+            except Exception as e:
+                instrumentacion.contar(f"trabajos_{kind.lower()}_errores")
+                logger.error(f"❌ Error {kind} {key}: {e}")
+                self.coalescer.olvidar(kind, key)   # los archivos siguen ahí: se reintentan
+            finally:
+                with self._lock:
+                    self._en_curso.discard((kind, key))
+                cola.task_done()
+
+    async def _procesar(self, kind, key, paths):
+        args = argumentos(kind, paths)
+        t0 = self._loop.time()
+        datos, secs, delta = await self._loop.run_in_executor(self.executor, self.extraer, kind, *args)
+        instrumentacion.fusionar(delta)
+        instrumentacion.registrar(f"trabajo_{kind.lower()}", secs)
+        instrumentacion.registrar("espera_pool", self._loop.time() - t0 - secs)
+        if datos:
+            await asyncio.to_thread(self.subir, ocr_pool.referencia(kind, *args), datos)
+        await asyncio.to_thread(self.mover, kind, paths)
+        self.procesados += 1
+        logger.info(f"✅ {kind} {key} procesado y movido ({len(datos or ())} métricas, {secs:.2f}s)")
+
+    # --- estado ----------------------------------------------------------
+    def niveles(self):
+        instrumentacion.nivel("cola_eventos", len(self.coalescer) + self.eventos.qsize())
+        instrumentacion.nivel("trabajos_en_curso", len(self._en_curso))
+        for kind, cola in self.colas.items():
+            instrumentacion.nivel(f"cola_{kind.lower()}", cola.qsize())
+
+    def detener(self):
+        """Pide un apagado ordenado (seguro desde handlers de señal del loop)."""
+        self._parar.set()
+
+    # --- ciclo de vida ---------------------------------------------------
+    async def run(self, escanear=None, observar=True):
+        """
+        Atiende eventos hasta detener(). Las carpetas de `escanear` se recorren
+        al arrancar (por defecto las hot-folders); observar=False no arranca
+        watchdog.
+        """
+        self._loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self._loop.add_signal_handler(sig, self.detener)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass                        # Windows / fuera del hilo principal: Ctrl-C cancela run()
+
+        obs = None
+        if observar:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+            servicio = self
+
+            class Handler(FileSystemEventHandler):
+                def on_any_event(self, event):
+                    if not event.is_directory and event.event_type in ('created', 'modified', 'moved'):
+                        servicio.notify_threadsafe(getattr(event, 'dest_path', '') or event.src_path)
+
+            obs = Observer()
+            obs.schedule(Handler(), str(carpetas.INCOMING), recursive=True)
+            obs.start()
+
+        entrada = [asyncio.create_task(self._recibir()), asyncio.create_task(self._estabilizar())]
+        trabajadores = [asyncio.create_task(self._trabajador(k))
+                        for k in self.tipos for _ in range(self.por_equipo)]
+        for d in (escanear if escanear is not None else ENTRADAS.values()):
+            for f in Path(d).iterdir():
+                if f.is_file():
+                    self.eventos.put_nowait(f)
+        logger.info(f"🟢 Ingesta iniciada ({len(trabajadores)} trabajadores)")
+        try:
+            await self._parar.wait()
+        finally:
+            await self._cerrar(obs, entrada, trabajadores)
+
+    async def _cerrar(self, obs, entrada, trabajadores):
+        logger.info("🔴 Deteniendo ingesta: drenando trabajos en curso…")
+        if obs:
+            obs.stop()
+            await asyncio.to_thread(obs.join)
+        for t in entrada:
+            t.cancel()
+        pendientes = len(self.coalescer) + self.eventos.qsize()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(c.join() for c in self.colas.values())),
+                                   self.drenaje)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Drenaje incompleto tras {self.drenaje}s: "
+                           f"{len(self._en_curso)} trabajos sin terminar")
+        for t in trabajadores:
+            t.cancel()
+        await asyncio.gather(*entrada, *trabajadores, return_exceptions=True)
+        if pendientes:
+            logger.info(f"⏸ {pendientes} archivos sin estabilizar: se retoman al próximo arranque")
+        if self.vaciar and not await asyncio.to_thread(self.vaciar):
+            logger.warning("⚠️ Quedan filas en el journal; se subirán en la próxima ejecución.")
+        logger.info(f"🔴 Ingesta detenida ({self.procesados} grupos procesados)")
+
+# ----------------------------------------------------------------------
+# 4) Bloque principal
+# ----------------------------------------------------------------------
+async def _main():
+    workers = carpetas.OCR_WORKERS or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=ocr_pool._init_worker) as ex:
+        servicio = ServicioIngesta(ex)
+        stats = instrumentacion.EscritorStats(antes=servicio.niveles)
+        stats.start()
+        if instrumentacion.STATS_PUERTO:
+            instrumentacion.servir(instrumentacion.STATS_PUERTO)
+        try:
+            await servicio.run()
+        finally:
+            stats.stop()
+    logger.info(f"📈 Estadísticas en {instrumentacion.STATS_FILE}")
+
+def _configurar_logging():
+    """Archivo del día + consola, como ocr_watcher (sólo al arrancar el servicio)."""
+    instrumentacion.LOG_DIR.mkdir(parents=True, exist_ok=True)
+    fmt = logging.Formatter('[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s')
+    archivo = logging.FileHandler(instrumentacion.LOG_DIR / f"{time.strftime('%Y-%m-%d')}.log",
+                                  encoding='utf-8')
+    consola = logging.StreamHandler()
+    for h in (archivo, consola):
+        h.setFormatter(fmt)
+    logging.basicConfig(level=logging.INFO, handlers=[archivo, consola])
+
+def main():
+    _configurar_logging()
+    carpetas.crear_carpetas()
+    print(f"[ingesta] 🟢 Vigilando {carpetas.INCOMING} (Ctrl-C para salir)")
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
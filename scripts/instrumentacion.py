@@ -0,0 +1,321 @@
+# === scripts/instrumentacion.py ===
+"""
+Instrumentación liviana del pipeline: tiempos por etapa, contadores y
+niveles (profundidad de colas), sin dependencias externas.
+
+    with instrumentacion.etapa("ocr"):
+        ...
+    @instrumentacion.etapa("hrv")
+    def calcular(...): ...
+    instrumentacion.contar("medidas_nuevas", n)
+    instrumentacion.acierto("ocr", True)          # caché: acierto / fallo
+    instrumentacion.nivel("cola_eventos", len(QUEUE))
+
+Etapas del pipeline: detect, preprocess, ocr, parse, map, hrv, dedup, upload.
+
+Cada proceso acumula en su propio registro. Los workers del OCRPool devuelven
+con cada trabajo lo acumulado desde el anterior (tomar()) y el proceso
+principal lo suma (fusionar()), así ocr_watcher ve todo el pipeline.
+
+Exportación (la arranca ocr_watcher):
+  - STATS_FILE (logs/stats.json): JSON reescrito cada STATS_INTERVALO_S con
+    los totales y la ventana móvil de los últimos STATS_VENTANA_S;
+  - STATS_PUERTO: si se define, http://127.0.0.1:<puerto>/metrics en formato
+    de texto de Prometheus.
+
+cProfile por trabajo: config PERFILAR o JCPSALUD_PERFILAR=STARFIT,POLAR
+("*" = todos) → un .prof por trabajo en logs/perfiles/.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+from contextlib import ContextDecorator
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+cfg = json.loads((BASE_DIR / 'config.json').read_text(encoding='utf-8'))
+
+LOG_DIR = Path(os.environ.get('JCPSALUD_LOG_DIR') or cfg.get('LOG_DIR') or BASE_DIR / 'logs')
+STATS_FILE = Path(cfg.get('STATS_FILE', LOG_DIR / 'stats.json'))
+STATS_INTERVALO_S = cfg.get('STATS_INTERVALO_S', 30)
+STATS_VENTANA_S = cfg.get('STATS_VENTANA_S', 900)
+STATS_PUERTO = cfg.get('STATS_PUERTO')
+PERFILES_DIR = LOG_DIR / 'perfiles'
+
+BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger('instrumentacion')
+
+# ----------------------------------------------------------------------
+# 1) Registro del proceso
+# ----------------------------------------------------------------------
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._t = {}        # etapa -> [n, segundos, max, buckets]
+        self._c = {}        # contador -> n
+        self._g = {}        # nivel -> valor
+        self.desde = time.time()
+
+    def registrar(self, etapa, segundos):
+        with self._lock:
+            st = self._t.get(etapa)
+            if st is None:
+                st = self._t[etapa] = [0, 0.0, 0.0, [0] * (len(BUCKETS) + 1)]
+            st[0] += 1
+            st[1] += segundos
+            st[2] = max(st[2], segundos)
+            st[3][bisect.bisect_left(BUCKETS, segundos)] += 1
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self._c[nombre] = self._c.get(nombre, 0) + n
+
+    def nivel(self, nombre, valor):
+        with self._lock:
+            self._g[nombre] = valor
+
+    def etapa(self, nombre):
+        return _Etapa(self, nombre)
+
+    # ------------------------------------------------------------------
+    def snapshot(self):
+        with self._lock:
+            return {
+                "etapas": {e: {"n": n, "segundos": s, "max": m, "buckets": list(b)}
+                           for e, (n, s, m, b) in self._t.items()},
+                "contadores": dict(self._c),
+                "niveles": dict(self._g),
+            }
+
+    def tomar(self):
+        """Snapshot de etapas y contadores + reinicio (lo que un worker devuelve por trabajo)."""
+        with self._lock:
+            delta = {
+                "etapas": {e: {"n": n, "segundos": s, "max": m, "buckets": list(b)}
+                           for e, (n, s, m, b) in self._t.items()},
+                "contadores": dict(self._c),
+            }
+            self._t.clear()
+            self._c.clear()
+        return delta
+
+    def fusionar(self, delta):
+        if not delta:
+            return
+        with self._lock:
+            for e, d in delta.get("etapas", {}).items():
+                st = self._t.setdefault(e, [0, 0.0, 0.0, [0] * (len(BUCKETS) + 1)])
+                st[0] += d["n"]
+                st[1] += d["segundos"]
+                st[2] = max(st[2], d["max"])
+                st[3] = [a + b for a, b in zip(st[3], d["buckets"])]
+            for k, n in delta.get("contadores", {}).items():
+                self._c[k] = self._c.get(k, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._t.clear()
+            self._c.clear()
+            self._g.clear()
+            self.desde = time.time()
+
+    # ------------------------------------------------------------------
+    def prometheus(self, prefijo="jcpsalud"):
+        """Formato de texto de Prometheus (histograma por etapa, contadores, niveles)."""
+        s = self.snapshot()
+        out = [f"# TYPE {prefijo}_etapa_segundos histogram"]
+        for e, d in sorted(s["etapas"].items()):
+            acum = 0
+            for le, n in zip(BUCKETS + ("+Inf",), d["buckets"]):
+                acum += n
+                out.append(f'{prefijo}_etapa_segundos_bucket{{etapa="{e}",le="{le}"}} {acum}')
+            out.append(f'{prefijo}_etapa_segundos_sum{{etapa="{e}"}} {d["segundos"]:.6f}')
+            out.append(f'{prefijo}_etapa_segundos_count{{etapa="{e}"}} {d["n"]}')
+        for k, n in sorted(s["contadores"].items()):
+            out.append(f"# TYPE {prefijo}_{k}_total counter")
+            out.append(f"{prefijo}_{k}_total {n}")
+        for k, v in sorted(s["niveles"].items()):
+            out.append(f"# TYPE {prefijo}_{k} gauge")
+            out.append(f"{prefijo}_{k} {v}")
+        return "\n".join(out) + "\n"
+
+
+class _Etapa(ContextDecorator):
+    """Cronómetro de una etapa; sirve como `with` y como decorador."""
+
+    def __init__(self, reg, nombre):
+        self.reg = reg
+        self.nombre = nombre
+
+    def _recreate_cm(self):
+        return _Etapa(self.reg, self.nombre)     # un cronómetro por llamada (hilos)
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.reg.registrar(self.nombre, time.perf_counter() - self.t0)
+        return False
+
+
+REG = Registro()
+etapa = REG.etapa
+registrar = REG.registrar
+contar = REG.contar
+nivel = REG.nivel
+tomar = REG.tomar
+fusionar = REG.fusionar
+
+def acierto(cache, ok):
+    """Acierto / fallo de una caché → contadores cache_<nombre>_aciertos|fallos."""
+    REG.contar(f"cache_{cache}_{'aciertos' if ok else 'fallos'}")
+
+# ----------------------------------------------------------------------
+# 2) Resumen JSON con ventana móvil
+# ----------------------------------------------------------------------
+def _resumen(s):
+    etapas = {}
+    for e, d in sorted(s["etapas"].items()):
+        r = etapas[e] = {"n": d["n"], "segundos": round(d["segundos"], 3),
+                         "medio_ms": round(1000 * d["segundos"] / d["n"], 1) if d["n"] else None}
+        if "max" in d:
+            r["max_ms"] = round(1000 * d["max"], 1)
+    c = s["contadores"]
+    caches = {}
+    for k in c:
+        partes = k.split("_")
+        if partes[0] == "cache" and partes[-1] in ("aciertos", "fallos"):
+            nombre = "_".join(partes[1:-1])
+            a, f = c.get(f"cache_{nombre}_aciertos", 0), c.get(f"cache_{nombre}_fallos", 0)
+            caches[nombre] = {"aciertos": a, "fallos": f, "tasa": round(a / (a + f), 3) if a + f else None}
+    return {"etapas": etapas, "contadores": dict(sorted(c.items())), "caches": caches}
+
+def _restar(a, b):
+    """Snapshot a − b (para la ventana; el máximo no es restable y se omite)."""
+    etapas = {}
+    for e, d in a["etapas"].items():
+        v = b["etapas"].get(e, {"n": 0, "segundos": 0.0})
+        if d["n"] - v["n"]:
+            etapas[e] = {"n": d["n"] - v["n"], "segundos": d["segundos"] - v["segundos"]}
+    cont = {k: n - b["contadores"].get(k, 0) for k, n in a["contadores"].items()
+            if n - b["contadores"].get(k, 0)}
+    return {"etapas": etapas, "contadores": cont}
+
+
+class EscritorStats:
+    """Hilo que reescribe STATS_FILE cada `intervalo` s; `antes()` actualiza niveles."""
+
+    def __init__(self, path=STATS_FILE, intervalo=STATS_INTERVALO_S, ventana=STATS_VENTANA_S,
+                 reg=REG, antes=None):
+        self.path = Path(path)
+        self.intervalo = intervalo
+        self.ventana = ventana
+        self.reg = reg
+        self.antes = antes
+        self._hist = deque()          # (t, snapshot)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def escribir(self, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        if self.antes:
+            try:
+                self.antes()
+            except Exception as e:
+                logger.warning(f"⚠️ stats: {e}")
+        s = self.reg.snapshot()
+        self._hist.append((ahora, s))
+        while len(self._hist) > 1 and ahora - self._hist[1][0] >= self.ventana:
+            self._hist.popleft()
+        t0, viejo = self._hist[0]
+        doc = {
+            "actualizado": datetime.fromtimestamp(ahora).isoformat(timespec="seconds"),
+            "desde": datetime.fromtimestamp(self.reg.desde).isoformat(timespec="seconds"),
+            "niveles": s["niveles"],
+            "total": _resumen(s),
+            "ventana_s": round(ahora - t0),
+            "ventana": _resumen(_restar(s, viejo)),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+        return doc
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='stats', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.intervalo):
+            try:
+                self.escribir()
+            except Exception as e:
+                logger.error(f"❌ stats: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.escribir()
+
+# ----------------------------------------------------------------------
+# 3) Endpoint Prometheus
+# ----------------------------------------------------------------------
+def servir(puerto=STATS_PUERTO, host="127.0.0.1", reg=REG):
+    """GET /metrics en texto de Prometheus, en un hilo; devuelve el servidor."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = reg.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer((host, int(puerto)), _Handler)
+    threading.Thread(target=srv.serve_forever, name='stats_http', daemon=True).start()
+    logger.info(f"📈 Métricas en http://{host}:{srv.server_address[1]}/metrics")
+    return srv
+
+# ----------------------------------------------------------------------
+# 4) cProfile por trabajo
+# ----------------------------------------------------------------------
+def perfilar(kind):
+    """
+    ¿Se perfila este tipo de trabajo? JCPSALUD_PERFILAR o config PERFILAR,
+    como lista o como texto separado por comas ("STARFIT,POLAR", "*").
+    """
+    sel = os.environ.get('JCPSALUD_PERFILAR')
+    sel = sel if sel is not None else cfg.get('PERFILAR', [])
+    if isinstance(sel, str):
+        sel = sel.split(",")
+    sel = {s.strip().upper() for s in sel if s.strip()}
+    return "*" in sel or kind.upper() in sel
+
+def perfilado(nombre, fn, *args, **kwargs):
+    """Ejecuta fn bajo cProfile y deja logs/perfiles/<nombre>_<fecha>_<pid>.prof."""
+    import cProfile
+    pr = cProfile.Profile()
+    try:
+        return pr.runcall(fn, *args, **kwargs)
+    finally:
+        PERFILES_DIR.mkdir(parents=True, exist_ok=True)
+        destino = PERFILES_DIR / f"{nombre}_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}.prof"
+        pr.dump_stats(str(destino))
+        logger.info(f"🔬 Perfil de {nombre} en {destino}")
@@ -0,0 +1,69 @@
+# === scripts/label_matcher.py ===
+"""
+Matcher precompilado de etiquetas OCR → métrica canónica.
+
+Compila una vez el diccionario {canon: [alias, …]} en:
+  1) búsqueda exacta por hash (base del canon y alias normalizados),
+  2) prefijo: la base más larga con la que empieza la etiqueta,
+  3) fuzzy: rapidfuzz.process.extractOne sobre todas las bases y alias
+     a la vez, quedándose con el MEJOR puntaje (no el primero ≥ umbral).
+Los resultados se memorizan por etiqueta cruda (LRU).
+"""
+from functools import lru_cache
+from unidecode import unidecode
+from rapidfuzz import fuzz, process
+
+
+def normalizar_clave(s: str) -> str:
+    return unidecode(s).strip().lower()
+
+
+def base_canon(canon: str) -> str:
+    """'Grasa Corporal (%)' → 'grasa corporal'."""
+    return normalizar_clave(canon.split(" (")[0])
+
+
+class LabelMatcher:
+    def __init__(self, canon: dict, normalizar=normalizar_clave, umbral=80, memo=4096):
+        self.normalizar = normalizar
+        self.umbral = umbral
+        self.exactas = {}
+        self.bases = {}
+        choices, destino = [], []
+        for c, aliases in canon.items():
+            b = base_canon(c)
+            self.bases.setdefault(b, c)
+            self.exactas.setdefault(b, c)
+            choices.append(b)
+            destino.append(c)
+            for a in aliases:
+                for k in {normalizar_clave(a), normalizar(a)}:
+                    if k:
+                        self.exactas.setdefault(k, c)
+                choices.append(normalizar_clave(a))
+                destino.append(c)
+        self._choices = choices
+        self._destino = destino
+        self._largos = sorted({len(b) for b in self.bases if b}, reverse=True)
+        self.match = lru_cache(maxsize=memo)(self._match)
+
+    def __call__(self, raw: str):
+        return self.match(raw)
+
+    def _match(self, raw: str):
+        t = self.normalizar(raw)
+        if not t:
+            return None
+        # 1) exacta
+        c = self.exactas.get(t)
+        if c:
+            return c
+        # 2) prefijo más largo (equivale a t.startswith(base))
+        for n in self._largos:
+            c = self.bases.get(t[:n]) if len(t) >= n else None
+            if c:
+                return c
+        # 3) fuzzy vectorizado sobre bases + alias
+        hit = process.extractOne(t, self._choices, scorer=fuzz.ratio,
+                                 processor=None, score_cutoff=self.umbral)
+        return self._destino[hit[2]] if hit else None
@@ -0,0 +1,301 @@
+# === scripts/laboratorio_ocr.py ===
+"""
+Extractor de informes de laboratorio (PDF o imagen) → [(métrica, valor, unidad)].
+
+PDF: cada página se lee primero de su capa de texto (PyMuPDF), que es
+instantánea; sólo las páginas sin texto (escaneadas) se rasterizan a LAB_DPI
+y pasan por OCR, repartidas en un pool de procesos (LAB_WORKERS). Cada worker
+recibe sólo (ruta, nº de página): abre el PDF y rasteriza él mismo.
+Imagen (jpg/png): una sola página por OCR.
+
+Cada renglón se parte en etiqueta / valor / unidad; la etiqueta se mapea al
+canon de ocr_laboratorio/metricas_dict_laboratorio.json con el mismo
+LabelMatcher precompilado que StarFit. Si la unidad leída no es la del canon
+y hay factor conocido (mmol/L → mg/dL, /mm3 → 10^3/uL, …) se convierte; si
+no, la métrica se publica con la unidad leída para no mezclar series.
+
+Uso:
+    python laboratorio_ocr.py informe.pdf [otro.jpg …] [--sin-subir]
+"""
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from unidecode import unidecode
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+try:
+    from uploader import upload_data
+except ModuleNotFoundError:
+    def upload_data(img, datos):
+        print("⚠️ uploader.py no disponible, skip upload")
+
+import roi_ocr
+import preproceso
+import instrumentacion
+from label_matcher import LabelMatcher
+
+logger = logging.getLogger('laboratorio_ocr')
+
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+DPI = cfg.get('LAB_DPI', 300)
+WORKERS = int(cfg.get('LAB_WORKERS', min(4, os.cpu_count() or 1)))
+MIN_CHARS = cfg.get('LAB_MIN_CHARS', 40)        # menos texto que esto: página escaneada
+CFG_OCR = "--oem 3 --psm 4"                     # columnas de tabla, renglones de distinto alto
+IMG_EXT = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp'}
+
+Analito = namedtuple("Analito", "metrica valor unidad conf", defaults=(None,))
+
+# ----------------------------------------------------------------------
+# 1) Canon y mapeo de etiquetas
+# ----------------------------------------------------------------------
+DICT_FILE = BASE_DIR / "ocr_laboratorio" / "metricas_dict_laboratorio.json"
+try:
+    with open(DICT_FILE, encoding="utf-8") as f:
+        CANON = json.load(f)
+except Exception:
+    CANON = {}
+
+def _norm_lab(raw: str) -> str:
+    t = unidecode(raw).lower()
+    t = re.sub(r"[^a-z0-9()/+\- ]", " ", t)
+    return " ".join(t.split()).strip(" -")
+
+_matcher_cache = {}
+
+def _matcher():
+    """Matcher compilado para el CANON actual (se recompila si CANON se reemplaza)."""
+    m = _matcher_cache.get(id(CANON))
+    if m is None:
+        _matcher_cache.clear()
+        m = _matcher_cache[id(CANON)] = LabelMatcher(CANON, normalizar=_norm_lab, umbral=88)
+    return m
+
+@instrumentacion.etapa("map")
+def map_lbl_lab(raw: str):
+    return _matcher()(raw)
+
+# ----------------------------------------------------------------------
+# 2) Unidades
+# ----------------------------------------------------------------------
+def _norm_unidad(u: str) -> str:
+    """'mg/dL' → 'mg/dl'; 'x10^3/µL' → '10^3/ul'; 'mm³' → 'mm3'."""
+    u = (u or "").strip("()[] ").lower().replace("µ", "u").replace("μ", "u").replace("³", "3")
+    u = u.replace(" ", "").replace("*", "").replace("x10", "10")
+    return "/ul" if u == "mm3" else re.sub(r"/mm3$", "/ul", u)
+
+def unidad_canon(canon: str) -> str:
+    """'Glucosa (mg/dL)' → 'mg/dL'."""
+    m = re.search(r"\(([^()]*)\)$", canon)
+    return m.group(1) if m else ""
+
+# (canon, unidad leída normalizada) → factor hacia la unidad del canon
+CONVERSIONES = {
+    ("Glucosa (mg/dL)", "mmol/l"): 18.016,
+    ("Colesterol Total (mg/dL)", "mmol/l"): 38.67,
+    ("HDL (mg/dL)", "mmol/l"): 38.67,
+    ("LDL (mg/dL)", "mmol/l"): 38.67,
+    ("No HDL (mg/dL)", "mmol/l"): 38.67,
+    ("Triglicéridos (mg/dL)", "mmol/l"): 88.57,
+    ("Creatinina (mg/dL)", "umol/l"): 1 / 88.4,
+    ("Ácido Úrico (mg/dL)", "umol/l"): 1 / 59.48,
+    ("Vitamina D (ng/mL)", "nmol/l"): 1 / 2.496,
+    ("Hemoglobina (g/dL)", "g/l"): 0.1,
+    ("Leucocitos (10^3/uL)", "/ul"): 1e-3,
+    ("Plaquetas (10^3/uL)", "/ul"): 1e-3,
+    ("Glóbulos Rojos (10^6/uL)", "/ul"): 1e-6,
+}
+
+def convertir(canon, valor, unidad):
+    """→ (métrica, valor, unidad) en la unidad del canon cuando se puede."""
+    uc = unidad_canon(canon)
+    u = _norm_unidad(unidad)
+    if not u or u == _norm_unidad(uc):
+        return canon, valor, uc
+    f = CONVERSIONES.get((canon, u))
+    if f is not None:
+        return canon, round(valor * f, 2), uc
+    base = canon[:-len(uc) - 3] if uc else canon
+    return f"{base} ({unidad})", valor, unidad
+
+# ----------------------------------------------------------------------
+# 3) Renglón → (etiqueta, valor, unidad)
+# ----------------------------------------------------------------------
+NUM_RE = re.compile(r"^[<>≤≥]?=?(\d+(?:[.,]\d+)*)\*?$")
+
+def _num(s: str) -> float:
+    """'1.234,5' → 1234.5; '5,4' → 5.4; '5.4' → 5.4; '250.000' → 250000 (miles)."""
+    if "," in s and "." in s:
+        s = s.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"[1-9]\d{0,2}\.\d{3}", s):
+        s = s.replace(".", "")
+    elif s.count(",") == 1:
+        s = s.replace(",", ".")
+    elif s.count(".") > 1 or s.count(",") > 1:
+        s = s.replace(".", "").replace(",", "")
+    return float(s)
+
+def _es_unidad(tok: str) -> bool:
+    t = tok.strip("()[]").lower()
+    return t == "%" or t in {"fl", "pg", "u", "ui"} or ("/" in t and re.search(r"[a-zµμ]", t) is not None)
+
+def partir(texto: str):
+    """
+    'Colesterol HDL ....... 52 mg/dL 40 - 60' → ('Colesterol HDL', 52.0, 'mg/dL').
+    El valor es el primer número que no es la primera palabra ('25 OH Vitamina D 32').
+    """
+    toks = texto.replace("…", " ").split()
+    for i in range(1, len(toks)):
+        m = NUM_RE.match(toks[i])
+        if not m:
+            continue
+        etq = " ".join(toks[:i]).rstrip(" .:=")
+        if not re.search(r"[A-Za-zÁÉÍÓÚáéíóú]{2}", etq):
+            return None
+        try:
+            val = _num(m.group(1))
+        except ValueError:
+            return None
+        uni = toks[i + 1] if i + 1 < len(toks) and _es_unidad(toks[i + 1]) else ""
+        return etq, val, uni.strip("()[]")
+    return None
+
+def analitos(renglones):
+    """[(texto, conf), …] → [Analito, …]; la primera aparición de cada métrica gana."""
+    out, vistos = [], set()
+    with instrumentacion.etapa("parse"):
+        partes = [(partir(t), conf) for t, conf in renglones
+                  if conf is None or conf >= roi_ocr.CONF_MIN]
+    for p, conf in partes:
+        if not p:
+            continue
+        etq, val, uni = p
+        canon = map_lbl_lab(etq)
+        if not canon:
+            logger.debug(f"sin canon: '{etq}'")
+            continue
+        metrica, val, uni = convertir(canon, val, uni)
+        if metrica in vistos:
+            continue
+        vistos.add(metrica)
+        out.append(Analito(metrica, round(val, 2), uni, conf))
+    return out
+
+# ----------------------------------------------------------------------
+# 4) Páginas: capa de texto u OCR
+# ----------------------------------------------------------------------
+def _pymupdf():
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            import fitz as pymupdf
+        except ImportError:
+            raise RuntimeError("Para leer PDFs de laboratorio hace falta PyMuPDF (pip install pymupdf)")
+    return pymupdf
+
+def renglones_palabras(palabras):
+    """
+    Palabras con caja [(x0, y0, x1, y1, texto, …), …] → textos de renglón.
+    Agrupa por altura (el centro dentro de media línea) y ordena por x, así
+    una fila de tabla queda 'etiqueta valor unidad referencia' aunque el PDF
+    guarde las columnas en bloques separados.
+    """
+    filas = []
+    for w in sorted(palabras, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        cy, h = (w[1] + w[3]) / 2, max(w[3] - w[1], 1e-6)
+        if filas and abs(cy - filas[-1][0]) <= 0.5 * h:
+            filas[-1][1].append(w)
+        else:
+            filas.append([cy, [w]])
+    return [" ".join(str(w[4]) for w in sorted(ws, key=lambda w: w[0])) for _, ws in filas]
+
+def _ocr_gris(g):
+    th = preproceso.preprocesar_gris(g, "laboratorio")
+    return [(r.texto, r.conf) for r in roi_ocr.renglones_pagina(th, config=CFG_OCR)]
+
+def ocr_pagina(ruta, i, dpi=DPI):
+    """(ruta del PDF, nº de página) → renglones OCR; corre dentro de un worker."""
+    pymupdf = _pymupdf()
+    with pymupdf.open(str(ruta)) as doc:
+        pix = doc[i].get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+    g = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, -1)[:, :pix.width]
+    return _ocr_gris(np.ascontiguousarray(g))
+
+def _init_worker():
+    import ocr_backend
+    ocr_backend.get().precargar(roi_ocr.LANG)
+
+def leer_pdf(ruta, workers=WORKERS):
+    """PDF → renglones [(texto, conf)] en orden de página (conf None = capa de texto)."""
+    pymupdf = _pymupdf()
+    por_pagina, escaneadas = {}, []
+    with pymupdf.open(str(ruta)) as doc:
+        for i, page in enumerate(doc):
+            palabras = page.get_text("words")
+            if sum(len(w[4]) for w in palabras) >= MIN_CHARS:
+                por_pagina[i] = [(t, None) for t in renglones_palabras(palabras)]
+            else:
+                escaneadas.append(i)
+        n = len(doc)
+
+    if escaneadas:
+        logger.info(f"{Path(ruta).name}: {n - len(escaneadas)} páginas con texto, "
+                    f"{len(escaneadas)} por OCR")
+        workers = min(workers, len(escaneadas))
+        if workers <= 1:
+            for i in escaneadas:
+                por_pagina[i] = ocr_pagina(ruta, i)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex:
+                futs = {i: ex.submit(ocr_pagina, str(ruta), i) for i in escaneadas}
+                for i, fut in futs.items():
+                    por_pagina[i] = fut.result()
+    return [r for i in range(n) for r in por_pagina.get(i, [])]
+
+def extraer(ruta: Path, workers=WORKERS):
+    """Informe (PDF o imagen) → [Analito(métrica, valor, unidad, conf), …]."""
+    ruta = Path(ruta)
+    ext = ruta.suffix.lower()
+    if ext == '.pdf':
+        renglones = leer_pdf(ruta, workers)
+    elif ext in IMG_EXT:
+        renglones = _ocr_gris(preproceso.leer_gris(ruta))
+    else:
+        raise ValueError(f"Formato de laboratorio no soportado: {ruta.name}")
+    return analitos(renglones)
+
+# ----------------------------------------------------------------------
+# 5) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extrae analitos de informes de laboratorio")
+    ap.add_argument('rutas', nargs='+')
+    ap.add_argument('--sin-subir', action='store_true', help="sólo mostrar lo extraído")
+    ap.add_argument('--workers', type=int, default=WORKERS)
+    args = ap.parse_args(argv)
+
+    todos = []
+    for r in args.rutas:
+        datos = extraer(Path(r), args.workers)
+        print(f"🧪 {Path(r).name}: {len(datos)} analitos")
+        for a in datos:
+            print(f" • {a.metrica}: {a.valor} {a.unidad}")
+        if datos and not args.sin_subir:
+            upload_data(r, datos)
+        todos.extend(datos)
+    if todos and not args.sin_subir:
+        import uploader
+        uploader.vaciar()
+    return todos
+
+if __name__ == "__main__":
+    main()
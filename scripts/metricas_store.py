@@ -0,0 +1,246 @@
+# === scripts/metricas_store.py ===
+"""
+Almacén local de métricas (SQLite): la fuente de verdad.
+
+upload_data() escribe aquí primero; CAPTURAS pasa a ser un espejo que se
+alimenta de forma incremental: cada alta o corrección recibe un número de
+cambio creciente y sincronizar() sólo envía lo posterior a la última marca
+(uploader reescribe en su fila las correcciones, sin duplicarlas).
+
+Una medida se identifica por (fecha, métrica, archivo): reprocesar la misma
+captura corrige el valor en lugar de duplicarlo. El índice (métrica, fecha)
+hace que series y rangos por métrica no recorran el historial completo.
+
+Uso:
+    python metricas_store.py --importar   # carga inicial desde CAPTURAS
+    python metricas_store.py              # resumen del almacén
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+cfg = json.loads((BASE_DIR / 'config.json').read_text(encoding='utf-8'))
+DATA_DIR = Path(os.environ.get('JCPSALUD_DATA_DIR') or cfg.get('DATA_DIR') or BASE_DIR / 'data')
+DEFAULT_PATH = DATA_DIR / 'metricas.sqlite'
+
+logger = logging.getLogger('uploader')
+
+COLUMNAS = ("fecha", "metrica", "valor", "archivo", "conf", "origen")
+
+# ----------------------------------------------------------------------
+# 1) Almacén
+# ----------------------------------------------------------------------
+class MetricStore:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        # una conexión por proceso (los workers del pool comparten el archivo)
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=30,
+                                         isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS medidas ("
+                " fecha TEXT NOT NULL, metrica TEXT NOT NULL, valor REAL NOT NULL,"
+                " archivo TEXT NOT NULL DEFAULT '', conf REAL, origen TEXT,"
+                " cambio INTEGER NOT NULL, creado REAL NOT NULL,"
+                " PRIMARY KEY (fecha, metrica, archivo))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS medidas_metrica ON medidas(metrica, fecha)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS medidas_cambio ON medidas(cambio)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v INTEGER)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def _meta(self, db, k):
+        row = db.execute("SELECT v FROM meta WHERE k = ?", (k,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, db, k, v):
+        db.execute("INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)", (k, v))
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def guardar(self, medidas):
+        """
+        medidas: [(fecha, métrica, valor, archivo, conf, origen), …].
+        Inserta o corrige; devuelve cuántas filas cambiaron de verdad. Un
+        cambio sólo de confianza se guarda sin marcar la fila para CAPTURAS
+        (el valor que ya está en la hoja sigue siendo el mismo).
+        """
+        medidas = list(medidas)
+        if not medidas:
+            return 0
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                cambio = inicio = self._meta(db, 'cambio')
+                ahora = time.time()
+                for fecha, metrica, valor, archivo, conf, origen in medidas:
+                    cambio += 1
+                    db.execute(
+                        "INSERT INTO medidas VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (fecha, metrica, archivo) DO UPDATE SET"
+                        "  valor = excluded.valor, conf = excluded.conf,"
+                        "  origen = COALESCE(excluded.origen, origen),"
+                        "  cambio = CASE WHEN round(valor, 2) != round(excluded.valor, 2)"
+                        "           THEN excluded.cambio ELSE cambio END"
+                        " WHERE round(valor, 2) != round(excluded.valor, 2)"
+                        "  OR conf IS NOT excluded.conf",
+                        (fecha, metrica, float(valor), archivo or '', conf, origen, cambio, ahora)
+                    )
+                n = db.execute("SELECT COUNT(*) FROM medidas WHERE cambio > ?", (inicio,)).fetchone()[0]
+                self._set_meta(db, 'cambio', cambio)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return n
+
+    def importar(self, filas, origen=None):
+        """
+        Filas de CAPTURAS [Fecha, Métrica, Valor, Archivo] → medidas ya
+        sincronizadas (cambio 0). No pisa lo que ya existe localmente; si la
+        hoja repite una medida (correcciones agregadas al final por versiones
+        anteriores) vale la última fila.
+        """
+        datos = []
+        for r in filas:
+            r = list(r) + [''] * (4 - len(r))
+            try:
+                valor = float(str(r[2]).replace(',', '.'))
+            except ValueError:
+                continue
+            if r[0] and r[1]:
+                datos.append((str(r[0]).strip(), str(r[1]).strip(), valor, str(r[3]).strip(), None, origen))
+        datos = list({(d[0], d[1], d[3]): d for d in datos}.values())
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            antes = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO medidas VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                [d + (time.time(),) for d in datos]
+            )
+            n = db.total_changes - antes
+            db.execute("COMMIT")
+        return n
+
+    # ------------------------------------------------------------------
+    # Sincronización incremental hacia CAPTURAS
+    # ------------------------------------------------------------------
+    def pendientes_sync(self):
+        with self._lock:
+            db = self._db()
+            return db.execute("SELECT COUNT(*) FROM medidas WHERE cambio > ?",
+                              (self._meta(db, 'sync'),)).fetchone()[0]
+
+    def sincronizar(self, enviar, lote=5000):
+        """
+        Pasa a `enviar(filas)` las medidas nuevas o corregidas desde la última
+        sincronización, como filas de CAPTURAS, y avanza la marca. Si `enviar`
+        falla la marca no se mueve (se reintenta la próxima vez).
+        """
+        total = 0
+        while True:
+            with self._lock:
+                db = self._db()
+                marca = self._meta(db, 'sync')
+                rows = db.execute(
+                    "SELECT fecha, metrica, valor, archivo, cambio FROM medidas"
+                    " WHERE cambio > ? ORDER BY cambio LIMIT ?", (marca, lote)
+                ).fetchall()
+            if not rows:
+                return total
+            enviar([[f, m, f"{v:.2f}", a] for f, m, v, a, _ in rows])
+            with self._lock:
+                db = self._db()
+                self._set_meta(db, 'sync', max(self._meta(db, 'sync'), rows[-1][4]))
+            total += len(rows)
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    @property
+    def ultimo_cambio(self):
+        with self._lock:
+            return self._meta(self._db(), 'cambio')
+
+    def metricas(self):
+        with self._lock:
+            return [m for (m,) in self._db().execute("SELECT DISTINCT metrica FROM medidas ORDER BY metrica")]
+
+    def serie(self, metrica, desde=None, hasta=None):
+        """[(fecha, valor), …] de una métrica, por fecha (usa el índice métrica+fecha)."""
+        q = "SELECT fecha, valor FROM medidas WHERE metrica = ?"
+        args = [metrica]
+        if desde:
+            q += " AND fecha >= ?"; args.append(str(desde))
+        if hasta:
+            q += " AND fecha <= ?"; args.append(str(hasta))
+        with self._lock:
+            return self._db().execute(q + " ORDER BY fecha, cambio", args).fetchall()
+
+    def tabla(self, desde=None, hasta=None, metricas=None, desde_cambio=None, tocadas_desde=None):
+        """
+        DataFrame largo (fecha, metrica, valor, archivo, conf, origen, cambio).
+        `tocadas_desde`: todas las filas de las fechas con algún cambio posterior.
+        """
+        import pandas as pd
+        q, args = "SELECT fecha, metrica, valor, archivo, conf, origen, cambio FROM medidas WHERE 1=1", []
+        if metricas is not None:
+            metricas = list(metricas)
+            q += f" AND metrica IN ({','.join('?' * len(metricas))})"; args += metricas
+        if desde:
+            q += " AND fecha >= ?"; args.append(str(desde))
+        if hasta:
+            q += " AND fecha <= ?"; args.append(str(hasta))
+        if desde_cambio is not None:
+            q += " AND cambio > ?"; args.append(int(desde_cambio))
+        if tocadas_desde is not None:
+            q += " AND fecha IN (SELECT fecha FROM medidas WHERE cambio > ?)"; args.append(int(tocadas_desde))
+        with self._lock:
+            rows = self._db().execute(q + " ORDER BY fecha, cambio", args).fetchall()
+        return pd.DataFrame(rows, columns=list(COLUMNAS) + ["cambio"])
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+# ----------------------------------------------------------------------
+# 2) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Almacén local de métricas")
+    ap.add_argument('--importar', action='store_true', help="cargar el historial de CAPTURAS")
+    ap.add_argument('--db', default=str(DEFAULT_PATH))
+    args = ap.parse_args(argv)
+
+    store = MetricStore(args.db)
+    if args.importar:
+        sys.path.append(str(Path(__file__).resolve().parent))
+        import sheets_client
+        filas = sheets_client.worksheet("CAPTURAS").get("A2:D")
+        print(f"📥 {store.importar(filas)} medidas importadas de {len(filas)} filas de CAPTURAS")
+
+    print(f"🗄️ {len(store.metricas())} métricas, último cambio {store.ultimo_cambio}, "
+          f"{store.pendientes_sync()} pendientes de sincronizar")
+    return store
+
+if __name__ == "__main__":
+    main()
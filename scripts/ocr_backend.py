@@ -0,0 +1,181 @@
+# === scripts/ocr_backend.py ===
+"""
+Backends de OCR intercambiables.
+
+- "pytesseract": histórico; cada llamada lanza el binario `tesseract`, que
+  vuelve a cargar spa+eng desde disco y recibe la imagen como archivo temporal.
+- "tesserocr": motor persistente en el propio proceso (una instancia de
+  TessBaseAPI por hilo y por idioma/OEM) que mantiene los modelos cargados y
+  recibe la imagen como buffer NumPy en memoria.
+- "auto" (por defecto): tesserocr si está instalado, si no pytesseract.
+
+Se elige con OCR_BACKEND en config.json o con la variable de entorno
+JCPSALUD_OCR_BACKEND. Ambos devuelven image_to_data en el formato DICT de
+pytesseract, así el resto del código no cambia.
+"""
+import os
+import json
+import shlex
+import logging
+import threading
+from pathlib import Path
+
+import pytesseract
+
+BASE_DIR = Path(__file__).resolve().parent
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+
+logger = logging.getLogger('ocr_backend')
+
+_CAMPOS_INT = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height")
+
+# ----------------------------------------------------------------------
+# 1) pytesseract (fallback)
+# ----------------------------------------------------------------------
+class PytesseractBackend:
+    nombre = "pytesseract"
+
+    def image_to_data(self, img, lang, config=""):
+        return pytesseract.image_to_data(img, lang=lang, config=config,
+                                         output_type=pytesseract.Output.DICT)
+
+    def image_to_string(self, img, lang, config=""):
+        return pytesseract.image_to_string(img, lang=lang, config=config)
+
+    def precargar(self, lang, oem=3):
+        pass
+
+# ----------------------------------------------------------------------
+# 2) tesserocr (motor persistente)
+# ----------------------------------------------------------------------
+def parse_config(config):
+    """'--oem 3 --psm 6 -c k=v' → (oem, psm, {k: v})."""
+    oem, psm, variables = 3, 3, {}
+    toks = shlex.split(config or "")
+    i = 0
+    while i < len(toks):
+        t = toks[i]
+        if t == "--oem" and i + 1 < len(toks):
+            oem = int(toks[i + 1]); i += 1
+        elif t == "--psm" and i + 1 < len(toks):
+            psm = int(toks[i + 1]); i += 1
+        elif t == "-c" and i + 1 < len(toks):
+            k, _, v = toks[i + 1].partition("=")
+            variables[k] = v; i += 1
+        i += 1
+    return oem, psm, variables
+
+def parse_tsv(tsv):
+    """Texto TSV de Tesseract (sin cabecera) → dict estilo pytesseract.Output.DICT."""
+    d = {k: [] for k in _CAMPOS_INT + ("conf", "text")}
+    for linea in tsv.splitlines():
+        cols = linea.split("\t")
+        if len(cols) < 12 or not cols[0].isdigit():
+            continue
+        for k, v in zip(_CAMPOS_INT, cols[:10]):
+            d[k].append(int(v))
+        d["conf"].append(float(cols[10]))
+        d["text"].append(cols[11])
+    return d
+
+
+class TesserocrBackend:
+    nombre = "tesserocr"
+
+    def __init__(self):
+        import tesserocr          # noqa: F401  (falla aquí si no está instalado)
+        from PIL import Image     # noqa: F401
+        self._local = threading.local()
+
+    def _api(self, lang, oem):
+        import tesserocr
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        k = (lang, oem)
+        if k not in apis:
+            apis[k] = tesserocr.PyTessBaseAPI(lang=lang, oem=tesserocr.OEM(oem))
+            logger.info(f"🧠 tesserocr cargado ({lang}, oem={oem}) en hilo {threading.get_ident()}")
+        return apis[k]
+
+    def precargar(self, lang, oem=3):
+        self._api(lang, oem)
+
+    def _preparar(self, img, lang, config):
+        import tesserocr
+        from PIL import Image
+        oem, psm, variables = parse_config(config)
+        api = self._api(lang, oem)
+        api.SetPageSegMode(tesserocr.PSM(psm))
+        for k, v in variables.items():
+            api.SetVariable(k, v)
+        api.SetImage(Image.fromarray(img))   # buffer en memoria, sin archivo temporal
+        return api, variables
+
+    def _limpiar(self, api, variables):
+        for k in variables:
+            api.SetVariable(k, "")
+        api.Clear()
+
+    def image_to_data(self, img, lang, config=""):
+        api, variables = self._preparar(img, lang, config)
+        try:
+            api.Recognize()
+            return parse_tsv(api.GetTSVText(0))
+        finally:
+            self._limpiar(api, variables)
+
+    def image_to_string(self, img, lang, config=""):
+        api, variables = self._preparar(img, lang, config)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            self._limpiar(api, variables)
+
+# ----------------------------------------------------------------------
+# 3) Selección
+# ----------------------------------------------------------------------
+_lock = threading.Lock()
+_backend = None
+
+def nombre_configurado():
+    return os.environ.get('JCPSALUD_OCR_BACKEND') or cfg.get('OCR_BACKEND', 'auto')
+
+def crear(nombre):
+    if nombre in ("tesserocr", "auto"):
+        try:
+            return TesserocrBackend()
+        except ImportError:
+            if nombre == "tesserocr":
+                logger.warning("⚠️ tesserocr no disponible, usando pytesseract")
+    return PytesseractBackend()
+
+def get():
+    """Backend del proceso (se crea una vez y queda caliente)."""
+    global _backend
+    with _lock:
+        if _backend is None:
+            _backend = crear(nombre_configurado())
+            logger.info(f"🔤 Backend OCR: {_backend.nombre}")
+        return _backend
+
+def precargar(lang, oem=3):
+    """
+    Carga los modelos del backend del proceso. Si tesserocr no puede cargar
+    el idioma (traineddata faltante, versión incompatible) el proceso sigue
+    con pytesseract en lugar de romper, p.ej., el pool de workers entero.
+    """
+    backend = get()
+    try:
+        backend.precargar(lang, oem)
+    except Exception as e:
+        if isinstance(backend, PytesseractBackend):
+            raise
+        logger.warning(f"⚠️ {backend.nombre} no pudo cargar {lang} ({e}); usando pytesseract")
+        set_backend(PytesseractBackend())
+
+def set_backend(backend):
+    global _backend
+    with _lock:
+        _backend = backend
@@ -0,0 +1,178 @@
+# === scripts/ocr_cache.py ===
+"""
+Caché persistente de resultados OCR por contenido de imagen.
+
+Clave = sha256(bytes de la imagen) + extractor + versión del extractor +
+backend OCR (pytesseract y tesserocr no leen exactamente igual), de modo
+que una misma captura re-sincronizada con otro nombre/mtime no vuelve a
+pasar por Tesseract. Guarda las tuplas (métrica, valor) en SQLite y expulsa
+las entradas menos usadas cuando se supera OCR_CACHE_MB.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import functools
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent))
+import instrumentacion
+import ocr_backend
+from roi_ocr import Medida
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+cfg = json.loads((BASE_DIR / 'config.json').read_text(encoding='utf-8'))
+
+DEFAULT_PATH = BASE_DIR / 'cache' / 'ocr_cache.sqlite'
+MAX_BYTES = int(float(cfg.get('OCR_CACHE_MB', 64)) * 1024 * 1024)
+
+logger = logging.getLogger('ocr_cache')
+
+# ----------------------------------------------------------------------
+# 1) Hash de contenido
+# ----------------------------------------------------------------------
+def hash_archivo(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+# ----------------------------------------------------------------------
+# 2) Almacén SQLite con LRU por tamaño
+# ----------------------------------------------------------------------
+class OCRCache:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        # una conexión por proceso (los workers del pool comparten el archivo)
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr ("
+                " clave TEXT PRIMARY KEY, datos TEXT NOT NULL,"
+                " bytes INTEGER NOT NULL, usado REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_usado ON ocr(usado)")
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, clave):
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT datos FROM ocr WHERE clave = ?", (clave,)).fetchone()
+            if row is None:
+                self.misses += 1
+                instrumentacion.acierto("ocr", False)
+                return None
+            db.execute("UPDATE ocr SET usado = ? WHERE clave = ?", (time.time(), clave))
+            db.commit()
+            self.hits += 1
+        instrumentacion.acierto("ocr", True)
+        return [Medida(*d) for d in json.loads(row[0])]
+
+    def contiene(self, clave):
+        """Consulta sin contar acierto/fallo ni tocar el LRU."""
+        with self._lock:
+            return self._db().execute("SELECT 1 FROM ocr WHERE clave = ?", (clave,)).fetchone() is not None
+
+    def put(self, clave, datos):
+        blob = json.dumps([list(d) + [getattr(d, 'conf', None)] for d in datos], ensure_ascii=False)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO ocr (clave, datos, bytes, usado) VALUES (?, ?, ?, ?)",
+                (clave, blob, len(blob.encode('utf-8')), time.time())
+            )
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM ocr").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        borrar = []
+        for clave, n in db.execute("SELECT clave, bytes FROM ocr ORDER BY usado"):
+            if total <= self.max_bytes:
+                break
+            borrar.append((clave,))
+            total -= n
+        db.executemany("DELETE FROM ocr WHERE clave = ?", borrar)
+        logger.info(f"🧹 OCR cache: {len(borrar)} entradas expulsadas (LRU)")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+# ----------------------------------------------------------------------
+# 3) Caché por defecto + decorador para extractores
+# ----------------------------------------------------------------------
+_caches = {}
+
+def default_cache():
+    """
+    Caché del proceso. JCPSALUD_OCR_CACHE permite apuntarla a otro archivo
+    ("0" la desactiva), útil en tests y para reprocesar sin caché.
+    """
+    env = os.environ.get('JCPSALUD_OCR_CACHE')
+    if env == '0' or cfg.get('OCR_CACHE', True) is False:
+        return None
+    path = Path(env) if env else DEFAULT_PATH
+    if path not in _caches:
+        _caches[path] = OCRCache(path)
+    return _caches[path]
+
+def cacheado(extractor, version):
+    """
+    Decora `fn(img, ...) -> [(métrica, valor), ...]` para consultar la caché
+    antes de hacer OCR. Cambiar `version` (o el backend OCR del proceso)
+    invalida los resultados anteriores.
+    `fn.en_cache(img)` dice si la imagen ya tiene resultado (para no
+    preprocesarla en vano).
+    """
+    def deco(fn):
+        def _clave(img):
+            try:
+                return f"{extractor}:{version}+{ocr_backend.get().nombre}:{hash_archivo(img)}"
+            except OSError:
+                return None
+
+        @functools.wraps(fn)
+        def wrapper(img, *args, **kwargs):
+            cache = default_cache()
+            clave = _clave(img) if cache is not None else None
+            if clave is None:
+                return fn(img, *args, **kwargs)
+            datos = cache.get(clave)
+            if datos is not None:
+                return datos
+            datos = fn(img, *args, **kwargs)
+            cache.put(clave, datos)
+            return datos
+
+        def en_cache(img):
+            cache = default_cache()
+            clave = _clave(img) if cache is not None else None
+            return clave is not None and cache.contiene(clave)
+
+        wrapper.en_cache = en_cache
+        return wrapper
+    return deco
@@ -0,0 +1,156 @@
+# === scripts/ocr_pool.py ===
+"""
+Pool de workers OCR "calientes" para ocr_watcher.
+
+Cada worker importa una sola vez cv2, pytesseract y pandas/scipy y luego
+llama directamente a extraer_starfit / extraer_amazfit / analizar_noche, en
+lugar de lanzar un intérprete `python` nuevo por archivo. Los workers sólo
+extraen: la subida (store, journal y cuota de Sheets) es del proceso
+principal, que recibe las métricas en on_done.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = Path(__file__).resolve().parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.append(str(BASE_DIR))
+import instrumentacion
+
+logger = logging.getLogger('ocr_pool')
+
+# ----------------------------------------------------------------------
+# 1) Inicialización de cada worker (una vez por proceso)
+# ----------------------------------------------------------------------
+def _init_worker():
+    import starfit_ocr         # noqa: F401  (cv2, pytesseract, uploader)
+    import amazfit_ocr         # noqa: F401
+    import polar_hrv_analyzer  # noqa: F401  (pandas, scipy)
+    import ocr_backend, roi_ocr
+    ocr_backend.precargar(roi_ocr.LANG)   # tesserocr (si está) queda con spa+eng cargado
+
+# ----------------------------------------------------------------------
+# 2) Trabajos (se ejecutan dentro del worker)
+# ----------------------------------------------------------------------
+def extraer_starfit(rutas):
+    import starfit_ocr
+    return starfit_ocr.procesar_grupo([Path(p) for p in rutas])
+
+def extraer_amazfit(ruta):
+    import amazfit_ocr
+    return amazfit_ocr.extraer_amazfit(Path(ruta))
+
+def extraer_polar(rr, acc, hr):
+    import polar_hrv_analyzer
+    return [(metrica, valor) for _, metrica, valor in polar_hrv_analyzer.analizar_noche(rr, acc, hr)]
+
+def extraer_lab(ruta):
+    import laboratorio_ocr
+    return laboratorio_ocr.extraer(Path(ruta))
+
+# Sólo extracción: la subida la hace el proceso principal
+JOBS = {
+    'POLAR':       extraer_polar,
+    'STARFIT':     extraer_starfit,
+    'AMAZFIT':     extraer_amazfit,
+    'LABORATORIO': extraer_lab,
+}
+
+def referencia(kind, *args):
+    """Archivo del que salen la fecha y el Archivo de las filas (1ª captura, RR…)."""
+    return args[0][0] if kind == 'STARFIT' else args[0]
+
+def _run_job(kind, *args, perfilar=False):
+    """
+    Ejecuta un trabajo y devuelve (resultado, segundos, instrumentación del
+    worker desde el trabajo anterior). Con `perfilar` (o PERFILAR en config)
+    corre bajo cProfile. Las excepciones viajan como RuntimeError: algunas
+    (p.ej. TesseractNotFoundError) no se pueden des-serializar en el padre.
+    """
+    t0 = time.perf_counter()
+    try:
+        if perfilar or instrumentacion.perfilar(kind):
+            res = instrumentacion.perfilado(kind, JOBS[kind], *args)
+        else:
+            res = JOBS[kind](*args)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    return res, time.perf_counter() - t0, instrumentacion.tomar()
+
+# ----------------------------------------------------------------------
+# 3) Pool
+# ----------------------------------------------------------------------
+class OCRPool:
+    """ProcessPoolExecutor de larga vida + tiempos por trabajo."""
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._ex = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._lock = threading.Lock()
+        self.stats = {}   # kind -> {'n', 'errores', 'segundos'}
+        self.en_vuelo = 0
+        logger.info(f"🧵 OCRPool iniciado con {self.workers} workers")
+
+    def submit(self, kind, key, *args, on_done=None, perfilar=False):
+        """
+        Encola un trabajo. `on_done(ok, resultado)` se llama en el proceso
+        principal al terminar (ok=False y resultado=excepción si falló).
+        `perfilar=True` lo corre bajo cProfile (ver instrumentacion).
+        """
+        t_sub = time.perf_counter()
+        with self._lock:
+            self.en_vuelo += 1
+        instrumentacion.nivel("pool_en_vuelo", self.en_vuelo)
+        fut = self._ex.submit(_run_job, kind, *args, perfilar=perfilar)
+
+        def _done(f):
+            total = time.perf_counter() - t_sub
+            st = self._stat(kind)
+            with self._lock:
+                self.en_vuelo -= 1
+            instrumentacion.nivel("pool_en_vuelo", self.en_vuelo)
+            try:
+                res, secs, delta = f.result()
+            except Exception as e:
+                with self._lock:
+                    st['n'] += 1
+                    st['errores'] += 1
+                instrumentacion.contar(f"trabajos_{kind.lower()}_errores")
+                logger.error(f"❌ Error {kind} {key}: {e}")
+                if on_done:
+                    on_done(False, e)
+                return
+            with self._lock:
+                st['n'] += 1
+                st['segundos'] += secs
+            instrumentacion.fusionar(delta)
+            instrumentacion.registrar(f"trabajo_{kind.lower()}", secs)
+            instrumentacion.registrar("espera_pool", total - secs)
+            n = len(res) if isinstance(res, (list, tuple)) else '-'
+            logger.info(f"⏱ {kind} {key}: {secs:.2f}s en worker, {total:.2f}s total ({n} métricas)")
+            if on_done:
+                on_done(True, res)
+
+        fut.add_done_callback(_done)
+        return fut
+
+    def _stat(self, kind):
+        with self._lock:
+            return self.stats.setdefault(kind, {'n': 0, 'errores': 0, 'segundos': 0.0})
+
+    def resumen(self):
+        with self._lock:
+            return {
+                k: dict(v, promedio=(v['segundos'] / max(v['n'] - v['errores'], 1)))
+                for k, v in self.stats.items()
+            }
+
+    def shutdown(self, wait=True):
+        self._ex.shutdown(wait=wait)
+        for kind, st in self.resumen().items():
+            logger.info(f"⏱ {kind}: {st['n']} trabajos, {st['errores']} errores, "
+                        f"{st['promedio']:.2f}s promedio")
@@ -1,47 +1,36 @@
 # === scripts/ocr_watcher.py ===
-import json
+import os
 import logging
 import time
-import subprocess
 import shutil
-import re
+import sys
+import threading
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+sys.path.append(str(Path(__file__).resolve().parent))
+from ocr_pool import OCRPool, referencia
+from event_queue import CoalescingQueue
+import instrumentacion
+
 # ----------------------------------------------------------------------
-# 1) Configuración
+# 1) Configuración (carpetas y agrupado compartidos con ingesta/reimportar)
 # ----------------------------------------------------------------------
-BASE_DIR  = Path(__file__).resolve().parent.parent
-cfg       = json.loads((BASE_DIR / 'config.json').read_text(encoding='utf-8'))
-ROOT      = Path(cfg['ROOT'])
-INCOMING  = ROOT / cfg['INCOMING']
-PROCESSED = ROOT / cfg['PROCESSED']
-
-# Asegurar carpetas raíz
-for d in (INCOMING, PROCESSED):
-    d.mkdir(parents=True, exist_ok=True)
-
-# Hot-folders
-POLAR_IN    = INCOMING / 'Polar'
-STARFIT_IN  = INCOMING / 'starfit'
-AMAZFIT_IN  = INCOMING / 'amazfit'
-LAB_IN      = INCOMING / 'laboratorio'
-for d in (POLAR_IN, STARFIT_IN, AMAZFIT_IN, LAB_IN):
-    d.mkdir(parents=True, exist_ok=True)
-
-# Procesados
-POLAR_OUT    = PROCESSED / 'Polar'
-STARFIT_OUT  = PROCESSED / 'starfit'
-AMAZFIT_OUT  = PROCESSED / 'amazfit'
-LAB_OUT      = PROCESSED / 'laboratorio'
-for d in (POLAR_OUT, STARFIT_OUT, AMAZFIT_OUT, LAB_OUT):
-    d.mkdir(parents=True, exist_ok=True)
+from carpetas import (BASE_DIR, cfg, ROOT, INCOMING, OCR_WORKERS, DEBOUNCE_S,
+                      POLAR_IN, STARFIT_IN, AMAZFIT_IN, LAB_IN,
+                      POLAR_OUT, STARFIT_OUT, AMAZFIT_OUT, LAB_OUT,
+                      clasificar, completo, polar_files)
+import carpetas
+
+REINTENTO_S = cfg.get('REINTENTO_S', 60)   # espera antes de reintentar un grupo fallido
+
+carpetas.crear_carpetas()
 
 # ----------------------------------------------------------------------
 # 2) Logger (archivo + consola)
 # ----------------------------------------------------------------------
-LOG_DIR = BASE_DIR / 'logs'
+LOG_DIR = Path(os.environ.get('JCPSALUD_LOG_DIR') or cfg.get('LOG_DIR') or BASE_DIR / 'logs')
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 logfile = LOG_DIR / f"{time.strftime('%Y-%m-%d')}.log"
 
@@ -64,108 +53,130 @@ logger.info(f"🔧 Config: STARFIT_IN = {STARFIT_IN}")
 # 3) Funciones de Procesamiento
 # ----------------------------------------------------------------------
 
-# POLAR (sin cambios)
-def _extract_polar_base(name):
-    m = re.search(r"(\d{8}_\d{4})", name)
-    return m.group(1) if m else None
-
-def detect_polar_sets():
-    txts = list(POLAR_IN.glob('*.txt'))
-    groups = {}
-    for f in txts:
-        base = _extract_polar_base(f.name)
-        if not base: continue
-        g = groups.setdefault(base, {})
-        if '_RR.txt' in f.name:  g['RR']  = f
-        if '_ACC.txt' in f.name: g['ACC'] = f
-        if '_HR.txt' in f.name:  g['HR']  = f
-    return [(b, g) for b,g in groups.items() if {'RR','ACC','HR'}.issubset(g)]
+# Pool de workers (se crea en __main__) y trabajos en curso
+POOL = None
+_en_curso = set()
+_en_curso_lock = threading.Lock()
+
+def _listo(kind, key, paths):
+    """
+    Grupo completo y sin un trabajo del mismo (kind, key) en curso; si lo hay,
+    sus archivos siguen esperando (y coalesciendo) en la cola hasta que termine.
+    """
+    with _en_curso_lock:
+        if (kind, key) in _en_curso:
+            return False
+    return completo(kind, key, paths)
+
+def _submit(kind, key, paths, mover, *args):
+    """Envía el trabajo al pool; si falla, el grupo vuelve a la cola tras REINTENTO_S."""
+    tag = (kind, key)
+    with _en_curso_lock:
+        _en_curso.add(tag)
+
+    def on_done(ok, res):
+        try:
+            if ok and res:
+                # la subida es del proceso principal: un solo journal/flusher y una sola cuota
+                import uploader
+                uploader.upload_data(referencia(kind, *args), res)
+            mover(ok, res)
+        except Exception as e:
+            ok = False
+            logger.error(f"❌ Error {kind} {key}: {e}")
+        finally:
+            with _en_curso_lock:
+                _en_curso.discard(tag)
+            if not ok:
+                # los archivos siguen en su carpeta
+                logger.info(f"🔁 {kind} {key} se reintenta en {REINTENTO_S}s")
+                QUEUE.reintentar(kind, key, paths, REINTENTO_S)
 
-def process_polar(base, files):
-    logger.info(f"Procesando POLAR {base}")
     try:
-        subprocess.run([
-            'python', str(BASE_DIR/'scripts'/'polar_hrv_analyzer.py'),
-            str(files['RR']), str(files['ACC']), str(files['HR'])
-        ], check=True)
-        subprocess.run(['python', str(BASE_DIR/'scripts'/'uploader.py')], check=True)
+        POOL.submit(kind, key, *args, on_done=on_done)
+    except Exception:
+        with _en_curso_lock:
+            _en_curso.discard(tag)
+        raise                               # CoalescingQueue.tick lo registra y olvida el grupo
+
+# POLAR
+def process_polar(base, files):
+    def mover(ok, _res):
+        if not ok:
+            return
         for f in files.values():
             dst = POLAR_OUT / f.name
             shutil.move(str(f), str(dst))
             logger.info(f" → Moved POLAR file {f.name}")
         logger.info(f"✅ POLAR {base} procesado y movido")
-    except Exception as e:
-        logger.error(f"❌ Error POLAR {base}: {e}")
-
-# STARFIT (modificado)
-def detect_starfit_sets():
-    # Listamos TODOs, sin glob rígido
-    all_files = list(STARFIT_IN.iterdir())
-    # Filtramos solo por sufijo, case‐insensitive
-    files = [
-        f for f in all_files
-        if f.suffix.lower() in {'.jpg', '.jpeg', '.png'}
-    ]
-    logger.info(f"🔍 detect_starfit_sets: listado crudo = {[p.name for p in all_files]}")
-    logger.info(f"🔍 detect_starfit_sets: imágenes detectadas = {[p.name for p in files]}")
-    # Agrupamos por fecha YYYYMMDD en el nombre
-    groups = {}
-    for f in files:
-        m = re.search(r"(\d{8})", f.name)
-        key = m.group(1) if m else '<sin_fecha>'
-        groups.setdefault(key, []).append(f)
-    for day, imgs in groups.items():
-        logger.info(f"  • Grupo {day}: {[p.name for p in imgs]}")
-    valid = [(day, imgs) for day, imgs in groups.items() if len(imgs) >= 2]
-    logger.info(f"🔍 detect_starfit_sets: {len(valid)} grupos válidos (>=2 imágenes)")
-    return valid
 
+    logger.info(f"Procesando POLAR {base}")
+    _submit('POLAR', base, list(files.values()), mover,
+            str(files['RR']), str(files['ACC']), str(files['HR']))
+
+# STARFIT
 def process_starfit(base, files):
-    logger.info(f"Procesando STARFIT {base} con {len(files)} capturas")
-    try:
-        cmd = ['python', str(BASE_DIR/'scripts'/'starfit_ocr.py')] + [str(f) for f in files]
-        subprocess.run(cmd, check=True)
+    def mover(ok, _res):
+        if not ok:
+            return
         for f in files:
             dst = STARFIT_OUT / f.name
             shutil.move(str(f), str(dst))
             logger.info(f" → Moved STARFIT file {f.name}")
         logger.info(f"✅ STARFIT {base} procesado y movido")
-    except Exception as e:
-        logger.error(f"❌ Error STARFIT {base}: {e}")
 
-# AMAZFIT (sin cambios)
+    logger.info(f"Procesando STARFIT {base} con {len(files)} capturas")
+    _submit('STARFIT', base, files, mover, [str(f) for f in files])
+
+# AMAZFIT
 def process_amazfit(img_file):
-    logger.info(f"Procesando AMAZFIT: {img_file.name}")
-    try:
-        subprocess.run([
-            'python', str(BASE_DIR/'scripts'/'amazfit_ocr.py'),
-            str(img_file)
-        ], check=True)
+    def mover(ok, _res):
+        if not ok:
+            return
         dst = AMAZFIT_OUT / img_file.name
         shutil.move(str(img_file), str(dst))
         logger.info(f" → Moved AMAZFIT file {img_file.name}")
         logger.info(f"✅ AMAZFIT {img_file.name} procesado y movido")
-    except Exception as e:
-        logger.error(f"❌ Error AMAZFIT {img_file.name}: {e}")
 
-# LABORATORIO (sin cambios)
+    logger.info(f"Procesando AMAZFIT: {img_file.name}")
+    _submit('AMAZFIT', img_file.name, [img_file], mover, str(img_file))
+
+# LABORATORIO (laboratorio_ocr: capa de texto del PDF, OCR sólo de páginas escaneadas)
 def process_lab(img_file):
-    logger.info(f"Procesando LABORATORIO: {img_file.name}")
-    try:
-        subprocess.run([
-            'python', str(BASE_DIR/'scripts'/'laboratorio_ocr.py'),
-            str(img_file)
-        ], check=True)
+    def mover(ok, _res):
+        if not ok:
+            return
         dst = LAB_OUT / img_file.name
         shutil.move(str(img_file), str(dst))
         logger.info(f" → Moved LAB file {img_file.name}")
         logger.info(f"✅ LABORATORIO {img_file.name} procesado y movido")
-    except Exception as e:
-        logger.error(f"❌ Error LABORATORIO {img_file.name}: {e}")
+
+    logger.info(f"Procesando LABORATORIO: {img_file.name}")
+    _submit('LABORATORIO', img_file.name, [img_file], mover, str(img_file))
 
 # ----------------------------------------------------------------------
-# 4) Handler de eventos
+# 4) Cola de eventos (debounce + deduplicación) y Handler
 # ----------------------------------------------------------------------
+def despachar(kind, key, paths):
+    if kind == 'POLAR':
+        process_polar(key, polar_files(paths))
+    elif kind == 'STARFIT':
+        process_starfit(key, paths)
+    elif kind == 'AMAZFIT':
+        process_amazfit(paths[0])
+    elif kind == 'LABORATORIO':
+        process_lab(paths[0])
+
+QUEUE = CoalescingQueue(clasificar, despachar, _listo, quiet=DEBOUNCE_S)
+
+def niveles():
+    """Profundidad de colas para el archivo de estadísticas / endpoint."""
+    instrumentacion.nivel("cola_eventos", len(QUEUE))
+    with _en_curso_lock:
+        instrumentacion.nivel("trabajos_en_curso", len(_en_curso))
+    import uploader
+    instrumentacion.nivel("journal_pendientes", uploader.journal.pendientes())
+
 class Handler(FileSystemEventHandler):
     def on_created(self, event): self._handle('CREATED ', event)
     def on_modified(self, event): self._handle('MODIFIED', event)
@@ -173,34 +184,33 @@ class Handler(FileSystemEventHandler):
 
     def _handle(self, tag, event):
         if event.is_directory: return
-        p = Path(event.src_path)
-        ext = p.suffix.lower()
-        parent = p.parent.name.lower()
+        # en un MOVED el archivo válido es el destino (p.ej. renombre tras sync)
+        p = Path(getattr(event, 'dest_path', '') or event.src_path)
         logger.info(f"[{tag}] {p}")
-        if ext == '.txt' and parent == 'polar':
-            for b,grp in detect_polar_sets():
-                process_polar(b,grp)
-        elif ext in {'.jpg','.jpeg','.png'} and parent == 'starfit':
-            for b,fs in detect_starfit_sets():
-                process_starfit(b,fs)
-        elif ext in {'.jpg','.jpeg','.png'} and parent == 'amazfit':
-            process_amazfit(p)
-        elif ext in {'.jpg','.jpeg','.png','.pdf'} and parent == 'laboratorio':
-            process_lab(p)
+        instrumentacion.contar("eventos")
+        QUEUE.notify(p)
 
 # ----------------------------------------------------------------------
 # 5) Main + escaneo inicial
 # ----------------------------------------------------------------------
 if __name__ == '__main__':
     print(f"[ocr_watcher] 🟢 Vigilando {INCOMING} (Ctrl-C para salir)")
+    POOL = OCRPool(OCR_WORKERS)
     obs = Observer()
     obs.schedule(Handler(), str(INCOMING), recursive=True)
     obs.start()
+    QUEUE.start()
+    STATS = instrumentacion.EscritorStats(antes=niveles)
+    STATS.start()
+    if instrumentacion.STATS_PUERTO:
+        instrumentacion.servir(instrumentacion.STATS_PUERTO)
     logger.info("🟢 Watcher iniciado")
     logger.info("🔍 Escaneando pendientes al inicio…")
-    # procesamos StarFit ya al arrancar
-    for day, files in detect_starfit_sets():
-        process_starfit(day, files)
+    # todo lo que ya está en las hot-folders pasa por la misma cola
+    for d in (POLAR_IN, STARFIT_IN, AMAZFIT_IN, LAB_IN):
+        for f in d.iterdir():
+            if f.is_file():
+                QUEUE.notify(f)
     try:
         while True:
             time.sleep(1)
@@ -208,3 +218,9 @@ if __name__ == '__main__':
         logger.info("🔴 Watcher detenido")
         obs.stop()
     obs.join()
+    QUEUE.stop()
+    POOL.shutdown()
+    import uploader
+    uploader.vaciar()
+    STATS.stop()
+    logger.info(f"📈 Estadísticas en {instrumentacion.STATS_FILE}")
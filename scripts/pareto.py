@@ -0,0 +1,197 @@
+# === scripts/pareto.py ===
+"""
+Análisis de Pareto del desvío respecto a los objetivos (peso, grasa,
+longevidad) sobre la matriz fecha × métrica del store local.
+
+1) Brecha normalizada por métrica y día:
+   - con objetivo (config OBJETIVOS): distancia al objetivo en unidades de
+     `escala`, sólo en el sentido malo ("bajar" / "subir") o en ambos ("rango");
+   - sin objetivo: brecha total × |correlación| con ella en la ventana ×
+     min(|z|, Z_MAX)/Z_MAX, con z respecto a la línea base de los BASE_DIAS
+     previos: pesa lo que está fuera de lo habitual Y se mueve junto con el
+     desvío, sin superar nunca a la brecha de los objetivos.
+2) Contribución = media móvil (VENTANA días) de brecha².
+3) Pareto: las métricas que suman COBERTURA (80 %) de la contribución del
+   día, hasta MAXIMO (~30).
+
+Todo es vectorizado sobre la matriz (pandas rolling / NumPy). Las
+contribuciones se guardan por día en cache/pareto: una corrida diaria sólo
+recalcula desde la primera fecha tocada en el store, con el historial justo
+para sus ventanas.
+
+Uso:
+    python pareto.py [--fecha YYYY-MM-DD] [--completo]
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+from metricas_store import MetricStore
+from pivotes import ancha
+
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+CACHE_DIR = BASE_DIR.parent / 'cache' / 'pareto'
+
+OBJETIVOS = cfg.get('OBJETIVOS', {
+    "Peso (kg)":          {"objetivo": 75.0, "escala": 5.0,  "sentido": "bajar"},
+    "Grasa Corporal (%)": {"objetivo": 15.0, "escala": 5.0,  "sentido": "bajar"},
+    "Grasa Visceral":     {"objetivo": 9.0,  "escala": 3.0,  "sentido": "bajar"},
+    "IMC":                {"objetivo": 24.0, "escala": 2.0,  "sentido": "bajar"},
+    "POLAR_HRV_RMSSD":    {"objetivo": 40.0, "escala": 10.0, "sentido": "subir"},
+    "POLAR_HR_MIN":       {"objetivo": 55.0, "escala": 5.0,  "sentido": "bajar"},
+})
+VENTANA = cfg.get('PARETO_VENTANA_DIAS', 28)
+BASE_DIAS = cfg.get('PARETO_BASE_DIAS', 90)
+COBERTURA = cfg.get('PARETO_COBERTURA', 0.8)
+MAXIMO = cfg.get('PARETO_MAXIMO', 30)
+Z_MAX = 3.0
+
+# ----------------------------------------------------------------------
+# 1) Brechas y contribuciones (vectorizado)
+# ----------------------------------------------------------------------
+def diaria(matriz):
+    """Matriz ancha (índice 'YYYY-MM-DD') → índice diario continuo (días sin datos = NaN)."""
+    if matriz.empty:
+        return matriz
+    idx = pd.to_datetime(matriz.index)
+    m = matriz.set_axis(idx)
+    return m.reindex(pd.date_range(idx.min(), idx.max(), freq='D'))
+
+def brechas(m, objetivos=None, ventana=VENTANA, base_dias=BASE_DIAS):
+    """Matriz diaria → brechas normalizadas (≥ 0) con la misma forma."""
+    objetivos = OBJETIVOS if objetivos is None else objetivos
+    con = [c for c in m.columns if c in objetivos]
+    sin = [c for c in m.columns if c not in objetivos]
+    out = pd.DataFrame(np.nan, index=m.index, columns=m.columns)
+
+    if con:
+        X = m[con].to_numpy(dtype=float)
+        obj = np.array([objetivos[c]['objetivo'] for c in con], dtype=float)
+        esc = np.array([objetivos[c].get('escala', 1.0) for c in con], dtype=float)
+        sentido = np.array([objetivos[c].get('sentido', 'rango') for c in con])
+        d = (X - obj) / esc
+        out[con] = np.where(sentido == 'bajar', np.clip(d, 0, None),
+                            np.where(sentido == 'subir', np.clip(-d, 0, None), np.abs(d)))
+    total = np.sqrt((out[con] ** 2).sum(axis=1, min_count=1)) if con else None
+
+    if sin:
+        S = m[sin]
+        previa = S.shift(1).rolling(base_dias, min_periods=7)
+        z = (S - previa.mean()) / previa.std().replace(0, np.nan)
+        inusual = z.abs().clip(upper=Z_MAX) / Z_MAX
+        if total is not None:
+            peso = S.rolling(ventana, min_periods=7).corr(total).abs().mul(total, axis=0)
+        else:
+            peso = 1.0
+        out[sin] = (inusual * peso).to_numpy()
+    return out
+
+def contribuciones(matriz, objetivos=None, ventana=VENTANA, base_dias=BASE_DIAS):
+    """Matriz ancha → contribución diaria por métrica (media móvil de brecha²)."""
+    m = diaria(matriz)
+    if m.empty:
+        return m
+    g = brechas(m, objetivos, ventana, base_dias)
+    return (g ** 2).rolling(ventana, min_periods=1).mean()
+
+def pareto(contrib, fecha=None, cobertura=COBERTURA, maximo=MAXIMO):
+    """
+    Métricas que explican `cobertura` del desvío en `fecha` (por defecto la
+    última). ValueError si `fecha` no es una fecha o no está en `contrib`.
+    """
+    if fecha:
+        try:
+            dia = pd.Timestamp(fecha)
+        except ValueError:
+            raise ValueError(f"fecha inválida: {fecha!r} (se espera YYYY-MM-DD)") from None
+        if dia not in contrib.index:
+            raise ValueError(f"sin contribuciones para {dia.date()}: hay datos del "
+                             f"{contrib.index[0].date()} al {contrib.index[-1].date()}")
+        fila = contrib.loc[dia]
+    else:
+        fila = contrib.iloc[-1]
+    fila = fila[fila > 0].dropna().sort_values(ascending=False)
+    if fila.empty:
+        return pd.DataFrame(columns=["contribucion", "parte", "acumulado"])
+    parte = fila / fila.sum()
+    acum = parte.cumsum()
+    n = min(int(np.searchsorted(acum.to_numpy(), cobertura - 1e-9)) + 1, maximo)
+    return pd.DataFrame({"contribucion": fila, "parte": parte, "acumulado": acum}).iloc[:n]
+
+# ----------------------------------------------------------------------
+# 2) Caché por día
+# ----------------------------------------------------------------------
+def cargar(cache_dir=CACHE_DIR):
+    est, pkl = Path(cache_dir) / 'estado.json', Path(cache_dir) / 'contrib.pkl'
+    if not (est.exists() and pkl.exists()):
+        return 0, None
+    estado = json.loads(est.read_text(encoding='utf-8'))
+    if estado.get('params') != _params():
+        return 0, None       # cambiaron objetivos o ventanas: recalcular todo
+    return estado['cambio'], pd.read_pickle(pkl)
+
+def guardar(cambio, contrib, cache_dir=CACHE_DIR):
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    contrib.to_pickle(Path(cache_dir) / 'contrib.pkl')
+    (Path(cache_dir) / 'estado.json').write_text(
+        json.dumps({'cambio': cambio, 'params': _params()}), encoding='utf-8')
+
+def _params():
+    return {'objetivos': OBJETIVOS, 'ventana': VENTANA, 'base_dias': BASE_DIAS}
+
+def actualizar(store=None, completo=False, cache_dir=CACHE_DIR):
+    """Contribuciones al día, recalculando sólo desde la primera fecha tocada."""
+    store = store or MetricStore()
+    marca, contrib = (0, None) if completo else cargar(cache_dir)
+    tope = store.ultimo_cambio
+    if contrib is not None and tope <= marca:
+        return contrib
+
+    if contrib is None:
+        contrib = contribuciones(ancha(store.tabla()))
+        print(f"📐 Pareto: {len(contrib)} días calculados")
+    else:
+        fechas = store.tabla(desde_cambio=marca)['fecha']
+        if len(fechas):
+            d0 = pd.Timestamp(fechas.min())
+            inicio = d0 - pd.Timedelta(days=BASE_DIAS + VENTANA)
+            nuevas = contribuciones(ancha(store.tabla(desde=inicio.date().isoformat())))
+            nuevas = nuevas[nuevas.index >= d0]
+            contrib = pd.concat([contrib[contrib.index < d0], nuevas]).sort_index()
+            print(f"📐 Pareto: {len(nuevas)} días recalculados desde {d0.date()}")
+    guardar(tope, contrib, cache_dir)
+    return contrib
+
+# ----------------------------------------------------------------------
+# 3) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Pareto del desvío respecto a los objetivos")
+    ap.add_argument('--fecha', default=None)
+    ap.add_argument('--completo', action='store_true', help="ignorar la caché")
+    args = ap.parse_args(argv)
+
+    contrib = actualizar(completo=args.completo)
+    if contrib.empty:
+        print("⚠️ El store no tiene métricas todavía.")
+        return None
+    try:
+        sel = pareto(contrib, args.fecha)
+    except ValueError as e:
+        ap.error(str(e))
+    if sel.empty:
+        print("✅ Sin desvío respecto a los objetivos.")
+        return sel
+    print(f"🎯 {len(sel)} métricas explican {sel['acumulado'].iloc[-1]:.0%} del desvío:")
+    for metrica, r in sel.iterrows():
+        print(f" • {metrica}: {r['parte']:.1%} (acum. {r['acumulado']:.0%})")
+    return sel
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# === scripts/pivotes.py ===
+"""
+PIVOT_IA / PIVOT_SEC generados localmente desde el store de métricas.
+
+Cada hoja es una tabla fecha × métrica (la última corrección gana) con
+encabezados abreviados: PIVOT_IA lleva las métricas críticas para la
+recomendación (config PIVOT_IA_METRICAS, en ese orden) y PIVOT_SEC el resto,
+en orden alfabético.
+
+Modo incremental: se guarda la última tabla publicada y el número de cambio
+del store hasta el que llega; sólo se recalculan las fechas tocadas desde
+entonces y se escriben únicamente las celdas que cambiaron, en un solo
+values_batch_update para las dos hojas. --completo reconstruye todo y lo
+compara contra lo que hay realmente en las hojas.
+
+Uso:
+    python pivotes.py [--completo]
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+import sheets_client
+from metricas_store import MetricStore
+
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+ESTADO_DIR = BASE_DIR.parent / 'cache' / 'pivotes'
+
+HOJAS = ("PIVOT_IA", "PIVOT_SEC")
+CRITICAS = cfg.get('PIVOT_IA_METRICAS', [
+    "Peso (kg)", "Grasa Corporal (%)", "Grasa Visceral", "Masa Muscular (kg)", "IMC",
+    "Agua Corporal (%)", "BMR (kcal)", "Edad Corporal",
+    "POLAR_HRV_RMSSD", "POLAR_HRV_SDNN", "POLAR_HRV_LF_HF_RATIO",
+    "POLAR_HR_MIN", "POLAR_HR_PROMEDIO",
+    "AMAZFIT_KCAL_COMIDO", "AMAZFIT_KCAL_EJERCICIO", "AMAZFIT_KCAL_RESTANTE", "AMAZFIT_KCAL_META",
+])
+ABREV = cfg.get('PIVOT_ABREV', {})
+
+# ----------------------------------------------------------------------
+# 1) Encabezados y columnas
+# ----------------------------------------------------------------------
+def abreviar(metrica):
+    """'Grasa Corporal (%)' → 'Grasa Corp. (%)'; 'POLAR_HRV_RMSSD' → 'RMSSD'."""
+    if metrica in ABREV:
+        return ABREV[metrica]
+    base, _, unidad = metrica.partition(" (")
+    for pref in ("POLAR_HRV_", "POLAR_", "AMAZFIT_"):
+        if base.startswith(pref):
+            base = base[len(pref):]
+            break
+    palabras = [p if len(p) <= 5 else p[:4] + "." for p in base.replace("_", " ").split()]
+    return " ".join(palabras) + (f" ({unidad}" if unidad else "")
+
+def encabezados(metricas):
+    """
+    abreviar() de cada columna, sin repetidos: si dos métricas dan el mismo
+    encabezado (p.ej. 'POLAR_HR_MAX' y 'AMAZFIT_HR_MAX' → 'HR MAX') las
+    siguientes llevan sufijo ' #2', ' #3', … en el orden de las columnas.
+    """
+    usados, out = {"Fecha"}, []
+    for m in metricas:
+        cab, n = abreviar(m), 1
+        while cab in usados:
+            n += 1
+            cab = f"{abreviar(m)} #{n}"
+        usados.add(cab)
+        out.append(cab)
+    return out
+
+def columnas(hoja, metricas):
+    if hoja == "PIVOT_IA":
+        return [m for m in CRITICAS if m in metricas]
+    criticas = set(CRITICAS)
+    return sorted(m for m in metricas if m not in criticas)
+
+def _col(j):
+    """0 → 'A', 26 → 'AA'."""
+    s = ""
+    j += 1
+    while j:
+        j, r = divmod(j - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+# ----------------------------------------------------------------------
+# 2) Tabla ancha (vectorizada)
+# ----------------------------------------------------------------------
+def ancha(largo):
+    """
+    Filas largas (fecha, metrica, valor, archivo, cambio) → fecha × métrica;
+    gana el último cambio y, a igual cambio (p.ej. filas importadas, todas con
+    0), el último archivo, para que el resultado no dependa del orden de lectura.
+    """
+    if largo.empty:
+        return pd.DataFrame(dtype=float)
+    ult = (largo.sort_values(['cambio', 'archivo'], kind='stable')
+                .drop_duplicates(['fecha', 'metrica'], keep='last'))
+    return ult.pivot(index='fecha', columns='metrica', values='valor').sort_index()
+
+def construir(anterior, tocadas):
+    """Reemplaza en `anterior` las filas de las fechas de `tocadas` (ya completas)."""
+    if anterior is None or anterior.empty:
+        return tocadas.copy()
+    out = pd.concat([anterior.drop(index=tocadas.index, errors='ignore'), tocadas])
+    return out.sort_index()
+
+def celdas(tabla, hoja):
+    """Tabla ancha → matriz de textos tal como se ve la hoja (cabecera + filas)."""
+    cols = columnas(hoja, set(tabla.columns))
+    sub = tabla.reindex(columns=cols)
+    sub = sub[sub.notna().any(axis=1)]        # fechas sin métricas de esta hoja no se listan
+    vals = sub.to_numpy(dtype=float)
+    cuerpo = np.where(np.isnan(vals), "", np.char.mod("%.2f", np.nan_to_num(vals)))
+    fechas = np.asarray(sub.index, dtype=str).reshape(-1, 1)
+    cab = np.array([["Fecha"] + encabezados(cols)], dtype=object)
+    return np.vstack([cab, np.hstack([fechas, cuerpo]).astype(object)])
+
+def _matriz(filas):
+    """Filas de get_all_values (posiblemente de distinto largo) → matriz rectangular."""
+    w = max((len(r) for r in filas), default=0)
+    return np.array([list(r) + [""] * (w - len(r)) for r in filas] or np.empty((0, 0)), dtype=object)
+
+def _pad(m, h, w):
+    out = np.full((h, w), "", dtype=object)
+    out[:m.shape[0], :m.shape[1]] = m
+    return out
+
+def rangos(hoja, nueva, vieja):
+    """Celdas distintas entre dos matrices → [{'range': "'HOJA'!B5:D5", 'values': [[…]]}, …]."""
+    h, w = max(nueva.shape[0], vieja.shape[0]), max(nueva.shape[1], vieja.shape[1])
+    a, b = _pad(nueva, h, w), _pad(vieja, h, w)
+    dif = a != b
+    titulo = sheets_client.SHEETS.get(hoja, hoja)
+    data = []
+    for i in np.flatnonzero(dif.any(axis=1)):
+        js = np.flatnonzero(dif[i])
+        for run in np.split(js, np.flatnonzero(np.diff(js) > 1) + 1):
+            j0, j1 = run[0], run[-1]
+            data.append({"range": f"'{titulo}'!{_col(j0)}{i + 1}:{_col(j1)}{i + 1}",
+                         "values": [[str(v) for v in a[i, j0:j1 + 1]]]})
+    return data
+
+# ----------------------------------------------------------------------
+# 3) Estado publicado
+# ----------------------------------------------------------------------
+def cargar_estado(cache_dir=ESTADO_DIR):
+    est, pkl = Path(cache_dir) / 'estado.json', Path(cache_dir) / 'ancha.pkl'
+    if not (est.exists() and pkl.exists()):
+        return 0, None
+    return json.loads(est.read_text(encoding='utf-8'))['cambio'], pd.read_pickle(pkl)
+
+def guardar_estado(cambio, tabla, cache_dir=ESTADO_DIR):
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    tabla.to_pickle(Path(cache_dir) / 'ancha.pkl')
+    (Path(cache_dir) / 'estado.json').write_text(json.dumps({'cambio': cambio}), encoding='utf-8')
+
+# ----------------------------------------------------------------------
+# 4) Actualización
+# ----------------------------------------------------------------------
+def actualizar(store=None, completo=False, cache_dir=ESTADO_DIR):
+    """Publica los cambios del store en PIVOT_IA/PIVOT_SEC; devuelve celdas escritas."""
+    store = store or MetricStore()
+    marca, anterior = (0, None) if completo else cargar_estado(cache_dir)
+    tope = store.ultimo_cambio
+    if anterior is not None and tope <= marca:
+        print("✅ Pivotes al día")
+        return 0
+
+    if anterior is None:
+        tabla = ancha(store.tabla())
+        viejas = {h: _matriz(sheets_client.worksheet(h).get_all_values()) for h in HOJAS}
+        n_fechas = len(tabla)
+    else:
+        sub = store.tabla(tocadas_desde=marca)        # sólo las fechas con cambios
+        tabla = construir(anterior, ancha(sub))
+        viejas = {h: celdas(anterior, h) for h in HOJAS}
+        n_fechas = sub['fecha'].nunique()
+
+    data = [r for h in HOJAS for r in rangos(h, celdas(tabla, h), viejas[h])]
+    n = sum(len(d['values'][0]) for d in data)
+    if data:
+        sheets_client.spreadsheet().values_batch_update(
+            {"valueInputOption": "USER_ENTERED", "data": data})
+    guardar_estado(tope, tabla, cache_dir)
+    print(f"📊 Pivotes: {n_fechas} fechas recalculadas, {n} celdas en {len(data)} rangos")
+    return n
+
+# ----------------------------------------------------------------------
+# 5) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Genera PIVOT_IA / PIVOT_SEC desde el store local")
+    ap.add_argument('--completo', action='store_true', help="reconstruir y comparar contra las hojas")
+    args = ap.parse_args(argv)
+    return actualizar(completo=args.completo)
+
+if __name__ == "__main__":
+    main()
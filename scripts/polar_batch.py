@@ -0,0 +1,165 @@
+# === scripts/polar_batch.py ===
+"""
+Modo lote para Polar H10: muchas noches en paralelo con caché por noche.
+
+Agrupa los archivos RR/HR/ACC por YYYYMMDD_HHMM (igual que
+carpetas.clasificar), calcula cada noche en un proceso aparte y
+guarda sus métricas en un .npz cuyo nombre depende del método espectral y
+del hash de los archivos y de la versión del analizador. Sólo se recalculan
+las noches cuyos datos o código cambiaron; las cachés de otros métodos de la
+misma noche se conservan.
+
+Uso:
+    python polar_batch.py <carpeta> [<carpeta> …] [--out noches.csv] [--upload] [--serie]
+"""
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+import polar_hrv_analyzer as analyzer
+import instrumentacion
+from carpetas import polar_base
+
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+CACHE_DIR = BASE_DIR.parent / 'cache' / 'polar_noches'
+
+# Versión efectiva = versión declarada + hash del código del analizador
+CODE_VERSION = analyzer.ANALYZER_VERSION + "+" + hashlib.sha1(
+    Path(analyzer.__file__).read_bytes()
+).hexdigest()[:8]
+
+# ----------------------------------------------------------------------
+# 1) Agrupado de noches
+# ----------------------------------------------------------------------
+def agrupar_noches(carpetas):
+    """{'YYYYMMDD_HHMM': {'RR': Path, 'ACC': Path, 'HR': Path}} (RR obligatorio)."""
+    groups = {}
+    for carpeta in carpetas:
+        for f in Path(carpeta).rglob('*.txt'):
+            base = polar_base(f.name)
+            if not base:
+                continue
+            g = groups.setdefault(base, {})
+            for tipo in ('RR', 'ACC', 'HR'):
+                if f'_{tipo}.txt' in f.name:
+                    g[tipo] = f
+    return {b: g for b, g in sorted(groups.items()) if 'RR' in g}
+
+def clave_noche(files, metodo=None, serie=False):
+    h = hashlib.sha256(f"{CODE_VERSION}:{analyzer.metodo_espectral(metodo)}:{serie:d}".encode())
+    for tipo in ('RR', 'ACC', 'HR'):
+        h.update(tipo.encode())
+        if tipo in files:
+            with open(files[tipo], 'rb') as fh:
+                for b in iter(lambda: fh.read(1 << 20), b''):
+                    h.update(b)
+    return h.hexdigest()[:20]
+
+# ----------------------------------------------------------------------
+# 2) Caché .npz por noche
+# ----------------------------------------------------------------------
+def _variante(metodo=None, serie=False):
+    return analyzer.metodo_espectral(metodo) + ("+serie" if serie else "")
+
+def _cache_file(base, clave, cache_dir=CACHE_DIR, metodo=None, serie=False):
+    return Path(cache_dir) / f"{base}_{_variante(metodo, serie)}-{clave}.npz"
+
+def leer_cache(base, clave, cache_dir=CACHE_DIR, metodo=None, serie=False):
+    p = _cache_file(base, clave, cache_dir, metodo, serie)
+    if not p.exists():
+        return None
+    with np.load(p, allow_pickle=False) as z:
+        fecha = str(z['fecha'])
+        return [(fecha, str(m), float(v)) for m, v in zip(z['metricas'], z['valores'])]
+
+def guardar_cache(base, clave, data, cache_dir=CACHE_DIR, metodo=None, serie=False):
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    for viejo in Path(cache_dir).glob(f"{base}_{_variante(metodo, serie)}-*.npz"):
+        viejo.unlink()          # versiones anteriores de la misma noche y método
+    np.savez_compressed(
+        _cache_file(base, clave, cache_dir, metodo, serie),
+        fecha=np.array(data[0][0] if data else ''),
+        metricas=np.array([m for _, m, _ in data], dtype=str),
+        valores=np.array([v for _, _, v in data], dtype=np.float64),
+    )
+
+def _calcular(base, files, metodo, serie=False):
+    return base, analyzer.analizar_noche(files['RR'], files.get('ACC'), files.get('HR'), metodo, serie)
+
+# ----------------------------------------------------------------------
+# 3) Motor por lotes
+# ----------------------------------------------------------------------
+def procesar_noches(noches, workers=None, cache_dir=CACHE_DIR, metodo=None, serie=False):
+    """
+    noches: salida de agrupar_noches. Devuelve {base: [(fecha, métrica, valor), ...]}
+    usando la caché cuando la clave (archivos + código + método espectral + serie)
+    no cambió. serie=True agrega la serie nocturna (analizar_noche).
+    """
+    metodo = analyzer.metodo_espectral(metodo)
+    resultados, pendientes, claves = {}, {}, {}
+    for base, files in noches.items():
+        claves[base] = clave_noche(files, metodo, serie)
+        data = leer_cache(base, claves[base], cache_dir, metodo, serie)
+        instrumentacion.acierto("polar", data is not None)
+        if data is not None:
+            resultados[base] = data
+        else:
+            pendientes[base] = files
+
+    print(f"🌙 {len(noches)} noches: {len(resultados)} en caché, {len(pendientes)} a calcular")
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futs = {ex.submit(_calcular, b, f, metodo, serie): b for b, f in pendientes.items()}
+            for fut, base in futs.items():
+                try:
+                    _, data = fut.result()
+                except Exception as e:
+                    print(f"❌ Error en noche {base}: {e}")
+                    continue
+                guardar_cache(base, claves[base], data, cache_dir, metodo, serie)
+                resultados[base] = data
+    return dict(sorted(resultados.items()))
+
+def a_dataframe(resultados):
+    filas = [(base, f, m, v) for base, data in resultados.items() for f, m, v in data]
+    return pd.DataFrame(filas, columns=["noche", "fecha", "metrica", "valor"])
+
+# ----------------------------------------------------------------------
+# 4) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HRV Polar por lotes")
+    ap.add_argument('carpetas', nargs='+')
+    ap.add_argument('--out', default=None, help="CSV combinado (por defecto no se escribe)")
+    ap.add_argument('--workers', type=int, default=cfg.get('OCR_WORKERS'))
+    ap.add_argument('--upload', action='store_true', help="encolar cada noche en CAPTURAS")
+    ap.add_argument('--espectro', choices=analyzer.METODOS, default=None,
+                    help="método LF/HF (por defecto HRV_ESPECTRO de config.json o 'welch')")
+    ap.add_argument('--serie', action='store_true',
+                    help="agregar la serie RMSSD/SDNN/LF/HF por bloques de HRV_SERIE_CADA_S")
+    args = ap.parse_args(argv)
+
+    noches = agrupar_noches(args.carpetas)
+    resultados = procesar_noches(noches, workers=args.workers, metodo=args.espectro, serie=args.serie)
+
+    if args.out:
+        a_dataframe(resultados).to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(f"✅ Archivo generado: {args.out}")
+
+    if args.upload:
+        import uploader
+        for base, data in resultados.items():
+            uploader.upload_data(noches[base]['RR'], [(m, v) for _, m, v in data])
+        uploader.vaciar()
+    return resultados
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,199 @@
 # === polar_hrv_analyzer.py ===
 import os
+import sys
+import json
+import logging
 import numpy as np
 import pandas as pd
 from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
 from scipy.signal import welch
-from scipy.interpolate import interp1d
+from scipy.interpolate import interp1d, PchipInterpolator
+from functools import lru_cache
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import instrumentacion
+
+# analizar_noche también corre en workers de polar_batch/ocr_pool: los avisos van al logger
+logger = logging.getLogger('polar_hrv_analyzer')
+
+cfg = json.loads((Path(__file__).resolve().parent.parent / 'config.json').read_text(encoding='utf-8'))
+
+# numpy >= 2 renombró trapz → trapezoid
+_trapz = getattr(np, "trapezoid", None) or np.trapz
+
+# Subir al cambiar cómo se calculan las métricas (invalida la caché de polar_batch)
+ANALYZER_VERSION = "2"
 
 INPUT_FOLDER = r"G:\My Drive\SALUD_JCP\incoming\POLAR"
 OUTPUT_CSV = os.path.join(INPUT_FOLDER, "polar_hrv_output.csv")
 
+ACC_CHUNK = 500_000      # filas por bloque al leer ACC (acota la memoria)
+ACC_VENTANA_S = 1.0      # resolución de las estadísticas de movimiento
+
+class AccVentanas(NamedTuple):
+    """Estadísticas de la magnitud de ACC por ventana fija de tiempo."""
+    t: np.ndarray        # inicio de cada ventana, segundos desde la 1ª muestra
+    media: np.ndarray
+    std: np.ndarray
+    n: np.ndarray
+
+def _columnas(filepath):
+    return pd.read_csv(filepath, sep=";", nrows=0).columns
+
 def leer_rr(filepath):
-    df = pd.read_csv(filepath, sep=";")
-    return df.iloc[:, 1].values.astype(float)
+    col = _columnas(filepath)[1]
+    return pd.read_csv(filepath, sep=";", usecols=[col])[col].to_numpy(dtype=float)
 
 def leer_hr(filepath):
-    df = pd.read_csv(filepath, sep=";")
-    return df.iloc[:, 1].values.astype(float)
+    col = _columnas(filepath)[1]
+    return pd.read_csv(filepath, sep=";", usecols=[col])[col].to_numpy(dtype=float)
+
+def _bloques_acc(filepath, chunksize=ACC_CHUNK):
+    """(timestamp_ns, magnitud float32) por bloque; sólo lee las 4 columnas útiles."""
+    cols = _columnas(filepath)
+    ts, x, y, z = cols[1], cols[2], cols[3], cols[4]
+    dtype = {ts: "int64", x: "float32", y: "float32", z: "float32"}
+    for df in pd.read_csv(filepath, sep=";", usecols=[ts, x, y, z], dtype=dtype,
+                          chunksize=chunksize):
+        xyz = df[[x, y, z]].to_numpy(dtype=np.float32)
+        yield df[ts].to_numpy(), np.sqrt(np.einsum("ij,ij->i", xyz, xyz))
 
 def leer_acc(filepath):
-    df = pd.read_csv(filepath, sep=";")
-    x = df.iloc[:, 2].values.astype(float)
-    y = df.iloc[:, 3].values.astype(float)
-    z = df.iloc[:, 4].values.astype(float)
-    mov = np.sqrt(x**2 + y**2 + z**2)
-    return mov
-
-def detectar_reposo(rr, acc, umbral=20):
-    acc = acc[:len(rr)] if len(acc) >= len(rr) else np.pad(acc, (0, len(rr) - len(acc)), constant_values=0)
-    reposo = acc < (np.median(acc) + umbral)
-    return rr[reposo]
+    return np.concatenate([mag for _, mag in _bloques_acc(filepath)])
+
+def leer_acc_ventanas(filepath, ventana_s=ACC_VENTANA_S, chunksize=ACC_CHUNK):
+    """
+    Lectura en streaming: agrega la magnitud por ventanas de `ventana_s`
+    segundos sin materializar la noche completa. La memoria pico queda
+    acotada por `chunksize` + el número de ventanas.
+    """
+    t0, ancho = None, int(ventana_s * 1e9)
+    partes = []
+    for ts, mag in _bloques_acc(filepath, chunksize):
+        if t0 is None:
+            t0 = ts[0]
+        idx = (ts - t0) // ancho
+        lo = idx.min()
+        idx = (idx - lo).astype(np.intp)
+        m64 = mag.astype(np.float64)
+        n = np.bincount(idx)
+        partes.append((lo + np.nonzero(n)[0],
+                       np.bincount(idx, m64)[n > 0],
+                       np.bincount(idx, m64 * m64)[n > 0],
+                       n[n > 0]))
+    if not partes:
+        vacio = np.empty(0, dtype=np.float32)
+        return AccVentanas(vacio, vacio, vacio, np.empty(0, dtype=np.int64))
+
+    # una ventana puede quedar partida entre dos bloques: se vuelve a sumar
+    idx, s1, s2, n = (np.concatenate(c) for c in zip(*partes))
+    ventanas, inv = np.unique(idx, return_inverse=True)
+    n = np.bincount(inv, n).astype(np.int64)
+    s1 = np.bincount(inv, s1)
+    s2 = np.bincount(inv, s2)
+    media = s1 / n
+    std = np.sqrt(np.maximum(s2 / n - media * media, 0))
+    return AccVentanas((ventanas * ventana_s).astype(np.float32),
+                       media.astype(np.float32), std.astype(np.float32), n)
+
+def ventanas_de_muestras(mag, acc_hz, ventana_s=ACC_VENTANA_S):
+    """Magnitudes ACC crudas muestreadas a `acc_hz` → AccVentanas de `ventana_s`."""
+    mag = np.asarray(mag, dtype=np.float64)
+    if len(mag) == 0:
+        vacio = np.empty(0, dtype=np.float32)
+        return AccVentanas(vacio, vacio, vacio, np.empty(0, dtype=np.int64))
+    idx = (np.arange(len(mag)) / (acc_hz * ventana_s)).astype(np.intp)
+    n = np.bincount(idx)
+    media = np.bincount(idx, mag) / n
+    std = np.sqrt(np.maximum(np.bincount(idx, mag * mag) / n - media * media, 0))
+    return AccVentanas((np.arange(len(n)) * ventana_s).astype(np.float32),
+                       media.astype(np.float32), std.astype(np.float32), n.astype(np.int64))
+
+RR_MIN_MS, RR_MAX_MS = 300, 2000    # fuera de rango fisiológico = artefacto
+ECTOPICO_TOL = 0.20                 # desvío máx. respecto a la mediana local
+ECTOPICO_VECINOS = 11
+SUAVIZADO_S = 30.0                  # ventana móvil de movimiento
+SEGMENTO_MIN_S = 120.0              # reposo más corto que esto se descarta
+
+class Reposo(NamedTuple):
+    mask: np.ndarray          # latidos en reposo y sin artefacto
+    artefacto: np.ndarray     # latidos descartados por rango/ectópicos
+    segmentos: np.ndarray     # (k, 2) índices [inicio, fin) de cada tramo de reposo
+    t: np.ndarray             # tiempo de cada latido en la escala de ACC (s)
+
+def desfase_s(rr_path, acc_path):
+    """Segundos entre el 1er registro ACC y el 1er latido RR (columna Phone timestamp)."""
+    try:
+        t_rr = pd.to_datetime(pd.read_csv(rr_path, sep=";", usecols=[0], nrows=1).iloc[0, 0])
+        t_acc = pd.to_datetime(pd.read_csv(acc_path, sep=";", usecols=[0], nrows=1).iloc[0, 0])
+        return (t_rr - t_acc).total_seconds()
+    except (ValueError, TypeError, IndexError):
+        return 0.0
+
+def _media_movil(x, k):
+    """Media móvil centrada de ancho k por suma acumulada, O(n)."""
+    if k <= 1 or len(x) == 0:
+        return x.astype(np.float64)
+    c = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    i = np.arange(len(x))
+    lo = np.clip(i - k // 2, 0, len(x))
+    hi = np.clip(i + k - k // 2, 0, len(x))
+    return (c[hi] - c[lo]) / (hi - lo)
+
+def filtrar_artefactos(rr):
+    """True donde el RR es artefacto o latido ectópico."""
+    med = pd.Series(rr).rolling(ECTOPICO_VECINOS, center=True, min_periods=1).median().to_numpy()
+    return (rr < RR_MIN_MS) | (rr > RR_MAX_MS) | (np.abs(rr - med) > ECTOPICO_TOL * med)
+
+def segmentar_reposo(rr, acc, umbral=20, offset_s=0.0, ventana_s=ACC_VENTANA_S,
+                     suavizado_s=SUAVIZADO_S, segmento_min_s=SEGMENTO_MIN_S, acc_hz=None):
+    """
+    Alinea cada RR con la ventana ACC que cubre su instante (tiempo RR
+    acumulado + searchsorted) y marca reposo cuando el movimiento suavizado
+    (std + desvío de la magnitud respecto a la mediana) está bajo `umbral` mg.
+    O(n log m) en latidos n y ventanas m.
+
+    `acc` es un AccVentanas (leer_acc_ventanas) o las magnitudes crudas de
+    leer_acc junto con su frecuencia de muestreo `acc_hz`.
+    """
+    rr = np.asarray(rr, dtype=float)
+    if not isinstance(acc, AccVentanas):
+        if not acc_hz:
+            raise ValueError("ACC crudo sin acc_hz: pasar la frecuencia de muestreo o un AccVentanas")
+        acc = ventanas_de_muestras(acc, acc_hz, ventana_s)
+
+    # instante de cada latido (fin del intervalo) en la escala de ACC
+    t = offset_s + (np.cumsum(rr) - rr[:1]) / 1000.0
+    artefacto = filtrar_artefactos(rr)
+    if len(acc.t) == 0:
+        return Reposo(np.zeros(len(rr), bool), artefacto, np.empty((0, 2), np.intp), t)
+
+    mov = acc.std + np.abs(acc.media - np.median(acc.media))
+    mov = _media_movil(mov, max(int(round(suavizado_s / ventana_s)), 1))
+    quieto = mov < umbral
+
+    # ventana ACC que cubre cada latido; latidos fuera de la grabación ACC no cuentan
+    idx = np.searchsorted(acc.t, t, side="right") - 1
+    ok = idx >= 0
+    idx = np.clip(idx, 0, None)
+    en_reposo = ok & (t < acc.t[idx] + ventana_s) & quieto[idx]
+
+    # tramos contiguos de reposo con duración mínima (los artefactos no cortan el tramo)
+    borde = np.diff(np.concatenate(([0], en_reposo.astype(np.int8), [0])))
+    ini, fin = np.flatnonzero(borde == 1), np.flatnonzero(borde == -1)
+    dur = t[fin - 1] - t[ini] + rr[ini] / 1000.0
+    segmentos = np.column_stack((ini, fin))[dur >= segmento_min_s]
+
+    marca = np.zeros(len(rr) + 1, dtype=np.int32)
+    np.add.at(marca, segmentos[:, 0], 1)
+    np.add.at(marca, segmentos[:, 1], -1)
+    mask = (np.cumsum(marca[:-1]) > 0) & ~artefacto
+    return Reposo(mask, artefacto, segmentos, t)
+
+def detectar_reposo(rr, acc, umbral=20, offset_s=0.0, acc_hz=None):
+    return np.asarray(rr, dtype=float)[segmentar_reposo(rr, acc, umbral, offset_s, acc_hz=acc_hz).mask]
 
 def calcular_hrv(rr_ms):
     rr_s = rr_ms / 1000.0
@@ -38,30 +203,265 @@ def calcular_hrv(rr_ms):
     avnn = np.mean(rr_ms)
     return rmssd, sdnn, avnn
 
-def calcular_frecuencia(rr_ms):
-    t = np.cumsum(rr_ms) / 1000.0
-    rr_s = rr_ms / 1000.0
-    fs_interp = 4.0
-    ti = np.arange(t[0], t[-1], 1/fs_interp)
-    f = interp1d(t, rr_s, kind='cubic')
-    rr_interp = f(ti)
-    freqs, psd = welch(rr_interp, fs=fs_interp, nperseg=256)
-
-    lf_band = (0.04, 0.15)
-    hf_band = (0.15, 0.4)
-
-    lf = np.trapz(psd[(freqs >= lf_band[0]) & (freqs <= lf_band[1])],
-                  freqs[(freqs >= lf_band[0]) & (freqs <= lf_band[1])])
-    hf = np.trapz(psd[(freqs >= hf_band[0]) & (freqs <= hf_band[1])],
-                  freqs[(freqs >= hf_band[0]) & (freqs <= hf_band[1])])
-    ratio = lf / hf if hf > 0 else np.nan
+# ----------------------------------------------------------------------
+# Motor espectral (LF/HF)
+# ----------------------------------------------------------------------
+BANDAS = {"lf": (0.04, 0.15), "hf": (0.15, 0.4)}
+FS_INTERP = 4.0
+NPERSEG = 256
+LOMB_DF = 1 / 128                   # grilla Lomb-Scargle: 2× la resolución de un tramo de 64 s
+LOMB_BLOQUE = 50_000                # muestras (tramos × latidos) por bloque: cabe en caché
+
+# welch: spline cúbica + Welch (el cálculo histórico); welch_lineal / welch_pchip:
+# otro remuestreo, misma estimación; lomb: Lomb-Scargle directo sobre los RR
+# desparejos, sin interpolar.
+REMUESTREO = {
+    "welch": lambda t, x: interp1d(t, x, kind='cubic'),
+    "welch_lineal": lambda t, x: (lambda ti: np.interp(ti, t, x)),
+    "welch_pchip": lambda t, x: PchipInterpolator(t, x),
+}
+METODOS = (*REMUESTREO, "lomb")
+
+def metodo_espectral(metodo=None):
+    """Método pedido, o el de JCPSALUD_HRV_ESPECTRO / cfg HRV_ESPECTRO ('welch')."""
+    metodo = metodo or os.environ.get('JCPSALUD_HRV_ESPECTRO') or cfg.get('HRV_ESPECTRO', 'welch')
+    if metodo not in METODOS:
+        raise ValueError(f"Método espectral desconocido: {metodo} (opciones: {', '.join(METODOS)})")
+    return metodo
+
+@lru_cache(maxsize=None)
+def _plan(freqs):
+    """{banda: slice} sobre una grilla creciente (mismos puntos que la máscara a <= f <= b)."""
+    f = np.frombuffer(freqs)
+    return {k: slice(int(np.searchsorted(f, a, "left")), int(np.searchsorted(f, b, "right")))
+            for k, (a, b) in BANDAS.items()}
+
+@lru_cache(maxsize=None)
+def _grilla_welch(fs, nperseg):
+    return np.fft.rfftfreq(nperseg, 1 / fs).tobytes()
+
+@lru_cache(maxsize=None)
+def _grilla_lomb(df=LOMB_DF):
+    lo, hi = min(a for a, _ in BANDAS.values()), max(b for _, b in BANDAS.values())
+    return np.linspace(lo, hi, int(round((hi - lo) / df)) + 1).tobytes()
+
+def _integrar(psd, grilla):
+    """{banda: potencia} integrando `psd` (..., F) con los índices precalculados."""
+    f = np.frombuffer(grilla)
+    return {k: _trapz(psd[..., sl], f[sl], axis=-1) for k, sl in _plan(grilla).items()}
+
+def bandas_welch(frames, fs=FS_INTERP, nperseg=NPERSEG):
+    """LF/HF de una matriz de series ya remuestreadas (..., n) con un solo Welch."""
+    nperseg = min(nperseg, frames.shape[-1])
+    _, psd = welch(frames, fs=fs, nperseg=nperseg, axis=-1)
+    b = _integrar(psd, _grilla_welch(float(fs), nperseg))
+    return b["lf"], b["hf"]
+
+def _lomb(t, x, w, h, grilla):
+    """
+    Periodograma Lomb-Scargle (densidad unilateral, unidades²/Hz) de B series
+    desparejas a la vez: t, x, w, h con forma (B, N); w = 1 en muestras
+    válidas (0 en relleno) y h es la ventana (Hann) evaluada en cada t.
+    exp(iωt) avanza por recurrencia entre frecuencias, así cada frecuencia
+    cuesta productos en vez de senos/cosenos.
+    """
+    f = np.frombuffer(grilla)
+    nw = w.sum(-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = (x - ((x * w).sum(-1) / nw)[:, None]) * h * w
+        escala = 2 * (t * w).max(-1) / (h * h * w).sum(-1)
+    z = np.exp(2j * np.pi * f[0] * t) * w            # 0 en el relleno: no suma
+    dz = np.exp(2j * np.pi * (f[1] - f[0]) * t) if len(f) > 1 else z
+    p = np.empty((len(t), len(f)))
+    for k in range(len(f)):
+        if k:
+            z *= dz
+        r2 = (z * z).sum(-1)
+        xz = (x * z).sum(-1) * np.exp(-0.5j * np.angle(r2))   # rota por e^{-iωτ}
+        r = np.abs(r2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            p[:, k] = xz.real ** 2 / (nw + r) + np.nan_to_num(xz.imag ** 2 / (nw - r))
+    return p * escala[:, None]
+
+def _segmentos(t, largo_s, paso_s):
+    """Inicio e índices [lo, hi) de los tramos de `largo_s` cada `paso_s` de un vector de tiempos."""
+    inicios = t[0] + np.arange(0.0, max(t[-1] - t[0] - largo_s, 0.0) + 1e-9, paso_s)
+    return inicios, np.searchsorted(t, inicios, "left"), np.searchsorted(t, inicios + largo_s, "left")
+
+def bandas_lomb(series_t, series_x, df=LOMB_DF, largo_s=NPERSEG / FS_INTERP):
+    """
+    LF/HF Lomb-Scargle promediado al estilo Welch: cada serie se corta en
+    tramos de `largo_s` con 50 % de solape y ventana Hann; los tramos de
+    todas las series van a la misma matriz y se promedian por serie.
+    """
+    grilla = _grilla_lomb(df)
+    dueño, tramos = [], []
+    for i, (t, x) in enumerate(zip(series_t, series_x)):
+        inicios, lo, hi = _segmentos(t, largo_s, largo_s / 2)
+        idx = lo[:, None] + np.arange(max(int((hi - lo).max()), 1))
+        w = idx < hi[:, None]
+        idx = np.minimum(idx, len(t) - 1)
+        ts = t[idx] - inicios[:, None]
+        tramos.append((ts, x[idx], w, 0.5 - 0.5 * np.cos(2 * np.pi * ts / largo_s)))
+        dueño.append(np.full(len(lo), i))
+    n = max(m[0].shape[1] for m in tramos)
+    tt, xx, ww, hh = (np.concatenate([np.pad(m[j], ((0, 0), (0, n - m[j].shape[1]))) for m in tramos])
+                      for j in range(4))
+    dueño = np.concatenate(dueño)
+    paso = max(1, LOMB_BLOQUE // n)
+    psd = np.concatenate([_lomb(tt[i:i + paso], xx[i:i + paso], ww[i:i + paso].astype(float),
+                                hh[i:i + paso], grilla) for i in range(0, len(tt), paso)])
+    ok = np.isfinite(psd).all(-1)
+    suma = np.zeros((len(series_t), psd.shape[1]))
+    np.add.at(suma, dueño[ok], psd[ok])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        psd = suma / np.bincount(dueño[ok], minlength=len(series_t))[:, None]
+    b = _integrar(psd, grilla)
+    return b["lf"], b["hf"]
+
+def calcular_bandas(series_rr, metodo=None):
+    """
+    LF, HF y LF/HF de muchas series RR (noches o ventanas, en ms) en una sola
+    llamada → tres arrays (B,). Con 'lomb' todas van juntas en la misma
+    matriz; con Welch se remuestrean por separado y se agrupan por largo.
+    """
+    metodo = metodo_espectral(metodo)
+    series = [np.asarray(rr, dtype=float) for rr in series_rr]
+    lf, hf = np.full(len(series), np.nan), np.full(len(series), np.nan)
+    if not series:
+        return lf, hf, lf.copy()
+    ts = [np.cumsum(rr) / 1000.0 for rr in series]
+    if metodo == "lomb":
+        ok = [i for i, rr in enumerate(series) if len(rr) > 2]
+        if ok:
+            lf[ok], hf[ok] = bandas_lomb([ts[i] for i in ok], [series[i] / 1000.0 for i in ok])
+    else:
+        grupos = {}
+        for i, (t, rr) in enumerate(zip(ts, series)):
+            if len(rr) < 4:
+                continue
+            ti = np.arange(t[0], t[-1], 1 / FS_INTERP)
+            grupos.setdefault(len(ti), []).append((i, REMUESTREO[metodo](t, rr / 1000.0)(ti)))
+        for idx, frames in (zip(*g) for g in grupos.values()):
+            lf[list(idx)], hf[list(idx)] = bandas_welch(np.stack(frames))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(hf > 0, lf / hf, np.nan)
     return lf, hf, ratio
 
+def calcular_frecuencia(rr_ms, metodo=None):
+    lf, hf, ratio = calcular_bandas([rr_ms], metodo)
+    return lf[0], hf[0], ratio[0]
+
 def calcular_triangular_index(rr_ms):
+    if len(rr_ms) == 0:
+        return np.nan
     bins = np.arange(min(rr_ms), max(rr_ms) + 8, 7)
     hist, _ = np.histogram(rr_ms, bins)
     return len(rr_ms) / np.max(hist) if np.max(hist) > 0 else np.nan
 
+# ----------------------------------------------------------------------
+# Serie nocturna por ventanas deslizantes
+# ----------------------------------------------------------------------
+SERIE_VENTANA_S = 300.0
+SERIE_PASO_S = 60.0
+SERIE_MIN_LATIDOS = 30
+SERIE_CADA_S = cfg.get('HRV_SERIE_CADA_S', 1800.0)   # resolución de lo que se sube
+
+class SerieHRV(NamedTuple):
+    t: np.ndarray        # inicio de cada ventana (s desde el 1er latido)
+    rmssd: np.ndarray
+    sdnn: np.ndarray
+    lf: np.ndarray
+    hf: np.ndarray
+    lf_hf: np.ndarray
+    n: np.ndarray        # latidos válidos en la ventana
+
+def calcular_serie(rr_ms, ventana_s=SERIE_VENTANA_S, paso_s=SERIE_PASO_S, mask=None,
+                   fs_interp=FS_INTERP, min_latidos=SERIE_MIN_LATIDOS, metodo="welch_lineal"):
+    """
+    RMSSD, SDNN, LF, HF y LF/HF por ventanas de `ventana_s` cada `paso_s`.
+    Dominio temporal con sumas acumuladas + searchsorted; espectral con una
+    sola interpolación de la noche y Welch sobre la matriz de ventanas
+    (sliding_window_view), sin bucles Python por ventana. Con metodo='lomb'
+    todas las ventanas van en una sola llamada a bandas_lomb, sin interpolar.
+    `mask` excluye latidos (p.ej. artefactos) sin alterar la escala de tiempo.
+    Sin latidos devuelve una serie vacía.
+    """
+    rr = np.asarray(rr_ms, dtype=float)
+    if len(rr) == 0:
+        vacio = np.empty(0, np.float32)
+        return SerieHRV(vacio, vacio, vacio, vacio, vacio, vacio, np.empty(0, np.int32))
+    metodo = metodo_espectral(metodo)
+    w = np.ones(len(rr), bool) if mask is None else np.asarray(mask, bool)
+    t = (np.cumsum(rr) - rr[0]) / 1000.0
+    inicios = np.arange(0.0, max(t[-1] - ventana_s, 0.0) + 1e-9, paso_s)
+    lo = np.searchsorted(t, inicios, side="left")
+    hi = np.searchsorted(t, inicios + ventana_s, side="left")
+
+    def _acum(x):
+        return np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+
+    wf = w.astype(float)
+    c_n, c_1, c_2 = _acum(wf), _acum(rr * wf), _acum(rr * rr * wf)
+    dw = (w[1:] & w[:-1]).astype(float)
+    d2 = np.diff(rr) ** 2 * dw
+    c_dn, c_d2 = _acum(dw), _acum(d2)
+
+    n = c_n[hi] - c_n[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = (c_1[hi] - c_1[lo]) / n
+        sdnn = np.sqrt(np.maximum((c_2[hi] - c_2[lo]) / n - media ** 2, 0))
+        hi_d = np.maximum(hi - 1, lo)
+        rmssd = np.sqrt((c_d2[hi_d] - c_d2[lo]) / (c_dn[hi_d] - c_dn[lo]))
+
+    # espectral: una interpolación lineal de toda la noche, ventanas como vista
+    lf = np.full(len(inicios), np.nan)
+    hf = np.full(len(inicios), np.nan)
+    tv, rv = t[w], rr[w] / 1000.0
+    largo = int(round(ventana_s * fs_interp))
+    if metodo == "lomb":
+        lo_v = np.searchsorted(tv, inicios, side="left")
+        hi_v = np.searchsorted(tv, inicios + ventana_s, side="left")
+        ok = np.flatnonzero(hi_v - lo_v > 2)
+        if len(ok):
+            lf[ok], hf[ok] = bandas_lomb([tv[lo_v[i]:hi_v[i]] for i in ok],
+                                         [rv[lo_v[i]:hi_v[i]] for i in ok])
+    elif len(tv) > 3 and len(inicios) and tv[-1] - tv[0] >= ventana_s:
+        ti = np.arange(0.0, tv[-1], 1 / fs_interp)
+        ri = REMUESTREO[metodo](tv, rv)(np.clip(ti, tv[0], None))
+        salto = int(round(paso_s * fs_interp))
+        frames = np.lib.stride_tricks.sliding_window_view(ri, largo)[::salto][:len(inicios)]
+        lf[:len(frames)], hf[:len(frames)] = bandas_welch(frames, fs_interp)
+
+    invalida = n < min_latidos
+    for a in (rmssd, sdnn, lf, hf):
+        a[invalida] = np.nan
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(hf > 0, lf / hf, np.nan)
+    return SerieHRV(inicios.astype(np.float32), rmssd.astype(np.float32), sdnn.astype(np.float32),
+                    lf.astype(np.float32), hf.astype(np.float32), ratio.astype(np.float32),
+                    n.astype(np.int32))
+
+def serie_a_datos(serie, cada_s=1800.0):
+    """
+    Reduce la serie a bloques de `cada_s` (media) → [(métrica, valor)] con el
+    minuto de inicio en el nombre, p.ej. ('POLAR_SERIE_RMSSD@0030min', 48.2).
+    """
+    if len(serie.t) == 0:
+        return []
+    bloque = (serie.t // cada_s).astype(np.intp)
+    cuenta = np.bincount(bloque)
+    datos = []
+    for nombre in ("rmssd", "sdnn", "lf", "hf", "lf_hf"):
+        x = getattr(serie, nombre).astype(np.float64)
+        ok = ~np.isnan(x)
+        suma = np.bincount(bloque[ok], x[ok], minlength=len(cuenta))
+        n = np.bincount(bloque[ok], minlength=len(cuenta))
+        for b in np.flatnonzero(n):
+            minuto = int(b * cada_s // 60)
+            datos.append((f"POLAR_SERIE_{nombre.upper()}@{minuto:04d}min", round(float(suma[b] / n[b]), 2)))
+    return datos
+
 def detectar_fecha_desde_nombre(nombre_archivo):
     partes = nombre_archivo.split("_")
     for parte in partes:
@@ -69,27 +469,40 @@ def detectar_fecha_desde_nombre(nombre_archivo):
             return datetime.strptime(parte, "%Y%m%d").date().isoformat()
     return datetime.today().date().isoformat()
 
-def main():
-    archivos = os.listdir(INPUT_FOLDER)
-    rr_file = next((f for f in archivos if "RR" in f.upper()), None)
-    hr_file = next((f for f in archivos if "HR" in f.upper()), None)
-    acc_file = next((f for f in archivos if "ACC" in f.upper()), None)
-
-    if not rr_file:
-        print("❌ No se encontró archivo RR.")
-        return
+def analizar_noche(rr_path, acc_path=None, hr_path=None, metodo=None, serie=False):
+    """
+    Calcula las métricas HRV de una noche → lista de (fecha, métrica, valor).
+    Con serie=True agrega la serie por ventanas de toda la noche (sin
+    artefactos), reducida a bloques de SERIE_CADA_S (ver serie_a_datos).
+    """
+    with instrumentacion.etapa("parse"):
+        rr = leer_rr(rr_path)
+        acc = leer_acc_ventanas(acc_path) if acc_path else None
+        hr = leer_hr(hr_path) if hr_path else None
+    fecha = detectar_fecha_desde_nombre(os.path.basename(str(rr_path)))
 
-    rr = leer_rr(os.path.join(INPUT_FOLDER, rr_file))
-    fecha = detectar_fecha_desde_nombre(rr_file)
+    rr_noche = rr
+    if acc_path:
+        with instrumentacion.etapa("hrv"):
+            rep = segmentar_reposo(rr, acc, offset_s=desfase_s(rr_path, acc_path))
+        artefacto = rep.artefacto
+        if rep.mask.any():
+            rr = rr[rep.mask]
+            logger.info(f"🟢 RR reducido a {len(rr)} puntos en reposo "
+                        f"({len(rep.segmentos)} tramos, {int(rep.artefacto.sum())} artefactos)")
+        else:
+            rr = rr[~artefacto]
+            logger.warning(f"⚠️ Sin tramos de reposo ≥ {SEGMENTO_MIN_S:.0f}s: se usa la noche completa "
+                           f"({len(rr)} latidos sin artefactos)")
 
-    if acc_file:
-        acc = leer_acc(os.path.join(INPUT_FOLDER, acc_file))
-        rr = detectar_reposo(rr, acc)
-        print(f"🟢 RR reducido a {len(rr)} puntos en reposo")
+    if len(rr) < 3:
+        logger.warning("⚠️ Noche sin latidos válidos suficientes: no se calculan métricas")
+        return []
 
-    rmssd, sdnn, avnn = calcular_hrv(rr)
-    lf, hf, ratio = calcular_frecuencia(rr)
-    tri_index = calcular_triangular_index(rr)
+    with instrumentacion.etapa("hrv"):
+        rmssd, sdnn, avnn = calcular_hrv(rr)
+        lf, hf, ratio = calcular_frecuencia(rr, metodo)
+        tri_index = calcular_triangular_index(rr)
 
     data = [
         (fecha, "POLAR_HRV_RMSSD", round(rmssd, 1)),
@@ -101,14 +514,44 @@ def main():
         (fecha, "POLAR_HRV_TRIANGULAR_INDEX", round(tri_index, 1)),
     ]
 
-    if hr_file:
-        hr = leer_hr(os.path.join(INPUT_FOLDER, hr_file))
+    if hr_path:
         data += [
             (fecha, "POLAR_HR_MIN", round(np.min(hr), 1)),
             (fecha, "POLAR_HR_PROMEDIO", round(np.mean(hr), 1)),
             (fecha, "POLAR_HR_MAX", round(np.max(hr), 1)),
         ]
 
+    if serie:
+        with instrumentacion.etapa("hrv"):
+            if not acc_path:
+                artefacto = filtrar_artefactos(rr_noche)
+            s = calcular_serie(rr_noche, mask=~artefacto, metodo=metodo)
+        data += [(fecha, m, v) for m, v in serie_a_datos(s, SERIE_CADA_S)]
+    return data
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    argv = sys.argv[1:] if argv is None else list(argv)
+    serie = '--serie' in argv
+    argv = [a for a in argv if a != '--serie']
+    if len(argv) >= 3:
+        # Invocado por ocr_watcher: <RR> <ACC> <HR>
+        rr_path, acc_path, hr_path = argv[:3]
+    else:
+        archivos = os.listdir(INPUT_FOLDER)
+        rr_file = next((f for f in archivos if "RR" in f.upper()), None)
+        hr_file = next((f for f in archivos if "HR" in f.upper()), None)
+        acc_file = next((f for f in archivos if "ACC" in f.upper()), None)
+
+        if not rr_file:
+            print("❌ No se encontró archivo RR.")
+            return
+        rr_path = os.path.join(INPUT_FOLDER, rr_file)
+        acc_path = os.path.join(INPUT_FOLDER, acc_file) if acc_file else None
+        hr_path = os.path.join(INPUT_FOLDER, hr_file) if hr_file else None
+
+    data = analizar_noche(rr_path, acc_path, hr_path, serie=serie)
+
     df = pd.DataFrame(data, columns=["fecha", "metrica", "valor"])
     df.to_csv(OUTPUT_CSV, index=False, encoding="utf-8-sig")
     print(f"✅ Archivo generado: {OUTPUT_CSV}")
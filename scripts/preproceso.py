@@ -0,0 +1,129 @@
+# === scripts/preproceso.py ===
+"""
+Preprocesado de capturas por lotes, en hilos (cv2 libera el GIL).
+
+Cada app tiene un perfil (escala, ancho máximo, filtro de ruido y pasos
+finales) que se puede ajustar en config.json → OCR_PREPROCESO, p. ej.:
+    "OCR_PREPROCESO": {"starfit": {"filtro": "gauss"}}
+
+Orden de operaciones: decodificar directo a gris → reducir si la captura es
+más grande de lo necesario → ampliar → filtrar → Otsu → pasos finales (el
+orden histórico). Con "filtrar_antes": true el filtro va antes de ampliar y
+el bilateral (el paso caro) trabaja sobre un cuarto de los píxeles; es más
+rápido pero cambia la binarización, así que es opcional:
+    "OCR_PREPROCESO": {"starfit": {"filtrar_antes": true}}
+
+preprocesar_lote() va preparando las siguientes imágenes del grupo mientras
+el consumidor hace OCR de la actual.
+"""
+import os
+import sys
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+import instrumentacion
+
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+
+HILOS = int(cfg.get('OCR_PRE_HILOS', min(4, os.cpu_count() or 1)))
+
+# ----------------------------------------------------------------------
+# 1) Filtros de ruido y pasos finales
+# ----------------------------------------------------------------------
+_K3 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+FILTROS = {
+    "bilateral":        lambda g: cv2.bilateralFilter(g, 9, 75, 75),
+    "bilateral_rapido": lambda g: cv2.bilateralFilter(g, 5, 50, 50),
+    "gauss":            lambda g: cv2.GaussianBlur(g, (3, 3), 0),
+    "mediana":          lambda g: cv2.medianBlur(g, 3),
+    "ninguno":          lambda g: g,
+}
+
+POST = {
+    "cierre":  lambda th: cv2.morphologyEx(th, cv2.MORPH_CLOSE, _K3),
+    "mediana": lambda th: cv2.medianBlur(th, 3),
+    "dilatar": lambda th: cv2.dilate(th, None, iterations=1),
+}
+
+PERFILES = {
+    # escala: factor deseado; ancho_max: tope del ancho de trabajo (0 = sin tope)
+    # filtrar_antes (opcional, False): filtrar antes de ampliar
+    "starfit": {"escala": 2.0, "ancho_max": 2160, "filtro": "bilateral", "post": ["cierre"]},
+    "amazfit": {"escala": 1.0, "ancho_max": 0, "filtro": "bilateral", "post": ["mediana", "dilatar"]},
+    # informes de laboratorio: páginas rasterizadas a LAB_DPI, texto chico y limpio
+    "laboratorio": {"escala": 1.0, "ancho_max": 0, "filtro": "mediana", "post": []},
+}
+
+def perfil(app):
+    p = dict(PERFILES.get(app, {"escala": 1.0, "ancho_max": 0, "filtro": "bilateral", "post": []}))
+    p.update(cfg.get('OCR_PREPROCESO', {}).get(app, {}))
+    return p
+
+# ----------------------------------------------------------------------
+# 2) Una imagen
+# ----------------------------------------------------------------------
+def leer_gris(p):
+    g = cv2.imread(str(p), cv2.IMREAD_GRAYSCALE)
+    if g is None:
+        raise ValueError(f"No se pudo leer la imagen: {p}")
+    return g
+
+def escala_efectiva(ancho, pf):
+    f = float(pf.get('escala', 1.0))
+    if pf.get('ancho_max'):
+        f = min(f, pf['ancho_max'] / ancho)
+    return f
+
+def preprocesar(p, app):
+    """Ruta → imagen binaria lista para Tesseract según el perfil de `app`."""
+    return preprocesar_gris(leer_gris(p), app)
+
+@instrumentacion.etapa("preprocess")
+def preprocesar_gris(g, app):
+    """Imagen en gris ya decodificada (p. ej. una página de PDF) → binaria."""
+    pf = perfil(app)
+    f = escala_efectiva(g.shape[1], pf)
+    filtro, antes = FILTROS[pf['filtro']], pf.get('filtrar_antes', False)
+    if f < 1:
+        g = cv2.resize(g, None, fx=f, fy=f, interpolation=cv2.INTER_AREA)
+    if antes:
+        g = filtro(g)
+    if f > 1:
+        g = cv2.resize(g, None, fx=f, fy=f, interpolation=cv2.INTER_CUBIC)
+    if not antes:
+        g = filtro(g)
+    _, th = cv2.threshold(g, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    for paso in pf.get('post', []):
+        th = POST[paso](th)
+    return th
+
+# ----------------------------------------------------------------------
+# 3) Lote con adelanto
+# ----------------------------------------------------------------------
+def preprocesar_lote(rutas, fn, hilos=HILOS, adelanto=None):
+    """
+    Generador (ruta, fn(ruta)) en el mismo orden que `rutas`, con hasta
+    `adelanto` imágenes preparándose en hilos por delante del consumidor.
+    Los errores de una imagen se relanzan al llegar a ella.
+    """
+    adelanto = adelanto or hilos + 1
+    it = iter(rutas)
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as ex:
+        cola = deque()
+        for r in it:
+            cola.append((r, ex.submit(fn, r)))
+            if len(cola) >= adelanto:
+                break
+        while cola:
+            r, fut = cola.popleft()
+            siguiente = next(it, None)
+            if siguiente is not None:
+                cola.append((siguiente, ex.submit(fn, siguiente)))
+            yield r, fut.result()
@@ -0,0 +1,212 @@
+# === scripts/recomendacion.py ===
+"""
+Recomendación diaria → ULTIMA_RECO!B2 + una fila en RECO_HISTORICO.
+
+El estado (cache/reco/estado.json) guarda, por métrica, los valores diarios
+de los últimos DIAS_ESTADO días, la fecha a la que corresponden y el número
+de cambio del store hasta el que llega. Cada mañana sólo se leen del store las filas nuevas o corregidas
+desde esa marca (O(filas nuevas)), se actualizan las ventanas y se calculan:
+  - media 7 y 28 días y tendencia (pendiente por semana en 28 días),
+  - línea base de HRV (ln RMSSD, media y desvío de DIAS_ESTADO días sin
+    contar el día que se evalúa),
+  - foco del día: las primeras métricas del Pareto de desvío (pareto.py).
+
+La recomendación y su fila de histórico se escriben con un único
+values_batch_update. Con --fecha anterior a la del estado las ventanas se
+arman desde el store y no se guardan; --sin-escribir no toca el estado.
+
+Uso:
+    python recomendacion.py [--fecha YYYY-MM-DD] [--sin-escribir]
+"""
+import sys
+import copy
+import json
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+import sheets_client
+import pareto
+from metricas_store import MetricStore
+
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+CACHE_DIR = BASE_DIR.parent / 'cache' / 'reco'
+
+DIAS_ESTADO = 60
+HRV = "POLAR_HRV_RMSSD"
+PESO = "Peso (kg)"
+KCAL_COMIDO, KCAL_META = "AMAZFIT_KCAL_COMIDO", "AMAZFIT_KCAL_META"
+N_FOCO = cfg.get('RECO_FOCO', 3)
+
+# ----------------------------------------------------------------------
+# 1) Estado incremental
+# ----------------------------------------------------------------------
+def _estado_vacio():
+    return {"cambio": None, "fecha": None, "ventanas": {}, "fila_hist": None, "fecha_hist": None}
+
+def cargar_estado(cache_dir=CACHE_DIR):
+    p = Path(cache_dir) / 'estado.json'
+    if p.exists():
+        return {**_estado_vacio(), **json.loads(p.read_text(encoding='utf-8'))}
+    return _estado_vacio()
+
+def guardar_estado(estado, cache_dir=CACHE_DIR):
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    (Path(cache_dir) / 'estado.json').write_text(json.dumps(estado, ensure_ascii=False), encoding='utf-8')
+
+def actualizar_ventanas(estado, store, hoy):
+    """Incorpora al estado las filas del store posteriores a la marca; devuelve cuántas."""
+    desde = (hoy - timedelta(days=DIAS_ESTADO - 1)).isoformat()
+    tope = store.ultimo_cambio
+    if estado["cambio"] is None:
+        nuevos = store.tabla(desde=desde, hasta=hoy.isoformat())  # arranque: sólo la ventana
+    else:
+        nuevos = store.tabla(desde=desde, desde_cambio=estado["cambio"])
+    ventanas = estado["ventanas"]
+    # gana la última corrección de cada (fecha, métrica)
+    for f, m, v in nuevos.sort_values('cambio')[['fecha', 'metrica', 'valor']].itertuples(index=False):
+        ventanas.setdefault(m, {})[f] = float(v)
+    for m in list(ventanas):
+        ventanas[m] = {f: v for f, v in ventanas[m].items() if desde <= f <= hoy.isoformat()}
+        if not ventanas[m]:
+            del ventanas[m]
+    estado["cambio"] = tope
+    return len(nuevos)
+
+# ----------------------------------------------------------------------
+# 2) Features
+# ----------------------------------------------------------------------
+def _dias(fechas, hoy):
+    return np.array([(hoy - date.fromisoformat(f)).days for f in fechas])
+
+def features(ventanas, hoy):
+    """{métrica: {'ultimo', 'media7', 'media28', 'tendencia', ...}} desde las ventanas."""
+    out = {}
+    for m, serie in ventanas.items():
+        dias = _dias(serie.keys(), hoy)
+        vals = np.fromiter(serie.values(), dtype=float, count=len(serie))
+        w7, w28 = dias < 7, dias < 28
+        f = {"ultimo": vals[np.argmin(dias)], "dias_ultimo": int(dias.min())}
+        f["media7"] = float(vals[w7].mean()) if w7.any() else None
+        f["media28"] = float(vals[w28].mean()) if w28.any() else None
+        # pendiente por semana (mínimos cuadrados sobre 28 días)
+        f["tendencia"] = float(np.polyfit(-dias[w28], vals[w28], 1)[0] * 7) if w28.sum() >= 4 else None
+        # la línea base no incluye el día evaluado (si no, se compara consigo mismo)
+        base = vals[(dias != dias.min()) & (vals > 0)]
+        if m == HRV and len(base) >= 6:
+            ln = np.log(base)
+            f["base_ln"], f["base_sd"] = float(ln.mean()), float(ln.std(ddof=1) or np.nan)
+            hoy_ok = f["dias_ultimo"] <= 1 and f["ultimo"] > 0
+            f["z_hrv"] = (float(np.log(f["ultimo"])) - f["base_ln"]) / f["base_sd"] if hoy_ok else None
+        out[m] = f
+    return out
+
+# ----------------------------------------------------------------------
+# 3) Texto
+# ----------------------------------------------------------------------
+def redactar(feats, foco, hoy):
+    partes = []
+    hrv = feats.get(HRV, {})
+    z = hrv.get("z_hrv")
+    if z is not None and np.isfinite(z):
+        if z < -0.5:
+            partes.append(f"HRV {hrv['ultimo']:.0f} ms, por debajo de tu línea base: "
+                          "día de recuperación (actividad suave, prioriza el sueño).")
+        elif z > 0.5:
+            partes.append(f"HRV {hrv['ultimo']:.0f} ms, por encima de tu línea base: buen día para entrenar intenso.")
+        else:
+            partes.append(f"HRV {hrv['ultimo']:.0f} ms, en tu rango habitual: entrenamiento normal.")
+
+    peso = feats.get(PESO, {})
+    if peso.get("tendencia") is not None and peso.get("media7") is not None:
+        t = peso["tendencia"]
+        ritmo = t / peso["media7"] * 100
+        if t > 0.05:
+            partes.append(f"Peso 7d {peso['media7']:.1f} kg subiendo {t:+.2f} kg/sem: reduce ~300 kcal diarias.")
+        elif ritmo < -1.0:
+            partes.append(f"Peso 7d {peso['media7']:.1f} kg bajando {t:+.2f} kg/sem (>1 %/sem): "
+                          "sube un poco la ingesta para proteger masa muscular.")
+        else:
+            partes.append(f"Peso 7d {peso['media7']:.1f} kg ({t:+.2f} kg/sem): mantén el plan.")
+
+    comido, meta = feats.get(KCAL_COMIDO, {}), feats.get(KCAL_META, {})
+    if comido.get("media7") is not None and meta.get("media7"):
+        dif = comido["media7"] - meta["media7"]
+        if abs(dif) > 150:
+            partes.append(f"Ingesta 7d {comido['media7']:.0f} kcal, {dif:+.0f} respecto a la meta.")
+
+    if foco:
+        partes.append("Foco: " + ", ".join(foco) + ".")
+    if not partes:
+        partes.append("Sin datos recientes suficientes: registra peso, HRV y comidas.")
+    return f"{hoy.isoformat()}: " + " ".join(partes)
+
+# ----------------------------------------------------------------------
+# 4) Pipeline
+# ----------------------------------------------------------------------
+def _fila_historico(estado, hoy):
+    """Fila de RECO_HISTORICO para `hoy` (la misma si se re-ejecuta en el día)."""
+    if estado["fecha_hist"] == hoy.isoformat():
+        return estado["fila_hist"]
+    if estado["fila_hist"] is None:
+        # sólo la primera vez: cuántas filas ya tiene el histórico
+        estado["fila_hist"] = len(sheets_client.worksheet("RECO_HISTORICO").get("A1:A"))
+    estado["fila_hist"] += 1
+    estado["fecha_hist"] = hoy.isoformat()
+    return estado["fila_hist"]
+
+def ejecutar(store=None, hoy=None, escribir=True, cache_dir=CACHE_DIR, pareto_dir=pareto.CACHE_DIR):
+    store = store or MetricStore()
+    hoy = hoy or date.today()
+    estado = cargar_estado(cache_dir)
+    # un día pasado recorta las ventanas y un ensayo no debe avanzar la marca:
+    # en esos casos se trabaja sobre una copia que no se guarda
+    atras = estado["fecha"] is not None and hoy.isoformat() < estado["fecha"]
+    if atras:
+        trabajo = _estado_vacio()               # ventanas rearmadas desde el store
+    elif not escribir:
+        trabajo = copy.deepcopy(estado)
+    else:
+        trabajo = estado
+        estado["fecha"] = hoy.isoformat()
+    n = actualizar_ventanas(trabajo, store, hoy)
+    feats = features(trabajo["ventanas"], hoy)
+
+    contrib = pareto.actualizar(store, cache_dir=pareto_dir)
+    foco = []
+    if not contrib.empty:
+        foco = list(pareto.pareto(contrib, maximo=N_FOCO).index)
+    texto = redactar(feats, foco, hoy)
+
+    if escribir:
+        fila = _fila_historico(estado, hoy)
+        t = lambda h: sheets_client.SHEETS.get(h, h)
+        sheets_client.spreadsheet().values_batch_update({
+            "valueInputOption": "USER_ENTERED",
+            "data": [
+                {"range": f"'{t('ULTIMA_RECO')}'!B2", "values": [[texto]]},
+                {"range": f"'{t('RECO_HISTORICO')}'!A{fila}:C{fila}",
+                 "values": [[hoy.isoformat(), texto, ", ".join(foco)]]},
+            ],
+        })
+        guardar_estado(estado, cache_dir)
+    print(f"💡 {n} filas nuevas del store → {texto}")
+    return texto
+
+# ----------------------------------------------------------------------
+# 5) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Recomendación diaria")
+    ap.add_argument('--fecha', default=None)
+    ap.add_argument('--sin-escribir', action='store_true', help="sólo mostrar el texto")
+    args = ap.parse_args(argv)
+    hoy = date.fromisoformat(args.fecha) if args.fecha else None
+    return ejecutar(hoy=hoy, escribir=not args.sin_escribir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# === scripts/reimportar.py ===
+"""
+Reimportación masiva del archivo procesado (o de cualquier carpeta).
+
+Recorre processed/{Polar,starfit,amazfit,laboratorio}, extrae en paralelo con
+los mismos extractores del watcher (y sus cachés: OCR por contenido y .npz
+por noche Polar) y escribe el resultado por lotes grandes en el store local
+(y de ahí a CAPTURAS) o en un CSV. Cada grupo ya escrito queda anotado en un
+checkpoint SQLite, así una corrida interrumpida retoma donde quedó.
+Con --dry-run no escribe nada y muestra el diff contra lo ya subido.
+
+Uso:
+    python reimportar.py [<carpeta> …] [--tipos STARFIT,POLAR] [--dry-run]
+                         [--destino capturas|store|csv] [--out filas.csv]
+                         [--workers N] [--lote 2000] [--desde-cero]
+"""
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import hashlib
+import argparse
+from pathlib import Path
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+import polar_batch
+import carpetas
+
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+PROCESSED = Path(cfg['ROOT']) / cfg['PROCESSED']
+DATA_DIR = Path(os.environ.get('JCPSALUD_DATA_DIR') or cfg.get('DATA_DIR') or BASE_DIR.parent / 'data')
+CHECKPOINT_FILE = DATA_DIR / 'reimportar.sqlite'
+
+# ----------------------------------------------------------------------
+# 1) Descubrimiento de grupos
+# ----------------------------------------------------------------------
+class Trabajo(NamedTuple):
+    kind: str
+    key: str
+    args: tuple        # argumentos para extraer()
+    ref: str           # archivo del que sale la fecha/Archivo de las filas
+    id: str            # clave de checkpoint (tipo + grupo + nombres/tamaños)
+
+def _firma(kind, key, files):
+    h = hashlib.sha1(f"{kind}:{key}".encode())
+    for f in sorted(files):
+        h.update(f"{f.name}:{f.stat().st_size}".encode())
+    return f"{kind}:{key}:{h.hexdigest()[:12]}"
+
+def _grupo(f):
+    """Archivo → (tipo, clave de grupo) con el mismo carpetas.clasificar del watcher."""
+    g = carpetas.clasificar(f)
+    if g and g[0] in ('AMAZFIT', 'LABORATORIO'):
+        return (g[0], str(f))       # un trabajo por archivo aunque el nombre se repita entre carpetas
+    return g
+
+def descubrir(rutas, tipos=None):
+    """Lista de Trabajos ordenada por (tipo, grupo); los grupos incompletos se saltean como en el watcher."""
+    grupos = {}
+    for carpeta in rutas:
+        for f in Path(carpeta).rglob('*'):
+            g = _grupo(f) if f.is_file() else None
+            if g and (not tipos or g[0] in tipos):
+                grupos.setdefault(g, []).append(f)
+
+    trabajos, incompletos = [], 0
+    for (kind, key), fs in sorted(grupos.items()):
+        fs.sort()
+        if not carpetas.completo(kind, key, fs):
+            incompletos += 1
+            continue
+        if kind == 'POLAR':
+            g = carpetas.polar_files(fs)
+            args = tuple(str(g[t]) for t in ('RR', 'ACC', 'HR'))
+            ref = g['RR']
+        elif kind == 'STARFIT':
+            args, ref = ([str(f) for f in fs],), fs[0]
+        else:
+            args, ref = (str(fs[0]),), fs[0]
+        trabajos.append(Trabajo(kind, key, args, str(ref), _firma(kind, key, fs)))
+    if incompletos:
+        print(f"⏭ {incompletos} grupos incompletos (Polar sin RR/ACC/HR o StarFit de una captura)")
+    return trabajos
+
+# ----------------------------------------------------------------------
+# 2) Extracción (se ejecuta en los workers)
+# ----------------------------------------------------------------------
+def _extraer_polar(rr, acc, hr):
+    files = {t: Path(p) for t, p in zip(('RR', 'ACC', 'HR'), (rr, acc, hr)) if p}
+    base = carpetas.polar_base(files['RR'].name)
+    clave = polar_batch.clave_noche(files)
+    data = polar_batch.leer_cache(base, clave)
+    if data is None:
+        data = polar_batch.analyzer.analizar_noche(rr, acc, hr)
+        polar_batch.guardar_cache(base, clave, data)
+    return [(m, v) for _, m, v in data]
+
+def extraer(kind, *args):
+    """Métricas [(métrica, valor), …] de un grupo, sin subir nada."""
+    if kind == 'POLAR':
+        return _extraer_polar(*args)
+    if kind == 'STARFIT':
+        import starfit_ocr
+        return starfit_ocr.procesar_grupo([Path(p) for p in args[0]])
+    if kind == 'AMAZFIT':
+        import amazfit_ocr
+        return amazfit_ocr.extraer_amazfit(Path(args[0]))
+    if kind == 'LABORATORIO':
+        import laboratorio_ocr
+        return [(m, v) for m, v, *_ in laboratorio_ocr.extraer(Path(args[0]))]
+    raise ValueError(f"Tipo desconocido: {kind}")
+
+def _extraer_en_worker(kind, *args):
+    # algunas excepciones (p.ej. TesseractNotFoundError) no se pueden
+    # des-serializar y romperían el pool entero: viajan como RuntimeError
+    try:
+        return extraer(kind, *args)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
+def _init_worker():
+    import ocr_pool
+    ocr_pool._init_worker()
+
+# ----------------------------------------------------------------------
+# 3) Checkpoint
+# ----------------------------------------------------------------------
+class Checkpoint:
+    def __init__(self, path=CHECKPOINT_FILE):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("CREATE TABLE IF NOT EXISTS hechos (id TEXT PRIMARY KEY, filas INTEGER, t REAL)")
+        self._conn.commit()
+
+    def hechos(self):
+        return {i for (i,) in self._conn.execute("SELECT id FROM hechos")}
+
+    def marcar(self, items):
+        self._conn.executemany("INSERT OR REPLACE INTO hechos VALUES (?, ?, ?)",
+                               [(i, n, time.time()) for i, n in items])
+        self._conn.commit()
+
+    def borrar(self):
+        self._conn.execute("DELETE FROM hechos")
+        self._conn.commit()
+
+# ----------------------------------------------------------------------
+# 4) Motor
+# ----------------------------------------------------------------------
+def _resultados(trabajos, workers):
+    """(Trabajo, datos | excepción) a medida que terminan. workers=0 → en serie."""
+    if workers == 0:
+        for t in trabajos:
+            try:
+                yield t, extraer(t.kind, *t.args)
+            except Exception as e:
+                yield t, e
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as ex:
+        futs = {ex.submit(_extraer_en_worker, t.kind, *t.args): t for t in trabajos}
+        for fut in as_completed(futs):
+            try:
+                yield futs[fut], fut.result()
+            except Exception as e:
+                yield futs[fut], e
+
+def reimportar(trabajos, escribir, checkpoint=None, workers=None, lote=2000):
+    """
+    Extrae los trabajos no hechos y llama `escribir(medidas)` cada ~`lote`
+    filas, con medidas (fecha, métrica, valor, archivo, conf, origen) como
+    las guarda el store; el checkpoint se marca sólo después de cada escritura.
+    Devuelve (grupos procesados, filas escritas, errores).
+    """
+    from uploader import medidas
+
+    hechos = checkpoint.hechos() if checkpoint else set()
+    pendientes = [t for t in trabajos if t.id not in hechos]
+    print(f"♻️ {len(trabajos)} grupos: {len(trabajos) - len(pendientes)} ya importados, "
+          f"{len(pendientes)} a procesar")
+
+    buffer, items = [], []
+    n_grupos = n_filas = errores = 0
+    t0 = time.perf_counter()
+
+    def volcar():
+        nonlocal buffer, items, n_filas
+        if buffer:
+            escribir(buffer)
+        if checkpoint and items:
+            checkpoint.marcar(items)
+        n_filas += len(buffer)
+        buffer, items = [], []
+
+    for t, datos in _resultados(pendientes, workers):
+        if isinstance(datos, Exception):
+            errores += 1
+            print(f"❌ {t.kind} {t.key}: {datos}")
+            continue
+        rows = medidas(t.ref, datos, t.kind)
+        buffer += rows
+        items.append((t.id, len(rows)))
+        n_grupos += 1
+        if len(buffer) >= lote:
+            volcar()
+            print(f"   … {n_grupos}/{len(pendientes)} grupos, {n_filas} filas "
+                  f"({time.perf_counter() - t0:.0f}s)")
+    volcar()
+    return n_grupos, n_filas, errores
+
+# ----------------------------------------------------------------------
+# 5) Destinos y diff
+# ----------------------------------------------------------------------
+def escritor_csv(path):
+    path = Path(path)
+
+    def escribir(medidas):
+        nuevo = not path.exists()
+        with open(path, 'a', newline='', encoding='utf-8-sig' if nuevo else 'utf-8') as f:
+            w = csv.writer(f)
+            if nuevo:
+                w.writerow(["Fecha", "Métrica", "Valor", "Archivo", "Confianza", "Origen"])
+            w.writerows([f, m, f"{v:.2f}", a, c, o] for f, m, v, a, c, o in medidas)
+    return escribir
+
+def indice_temporal(dir_):
+    """
+    Copia del índice de CAPTURAS en `dir_` (para --dry-run): sincronizarla
+    con la hoja no modifica el índice real.
+    """
+    import uploader
+    from capturas_index import CapturasIndex
+    copia = Path(dir_) / 'capturas_index.sqlite'
+    if uploader.INDEX_FILE.exists():
+        origen = sqlite3.connect(f"file:{uploader.INDEX_FILE}?mode=ro", uri=True)
+        destino = sqlite3.connect(str(copia))
+        origen.backup(destino)
+        destino.close()
+        origen.close()
+    return CapturasIndex(copia)
+
+def diff(rows, indice):
+    """Clasifica filas contra el índice de CAPTURAS: (nuevas, [(fila, valores_previos)], iguales)."""
+    from capturas_index import clave
+    previos = indice.valores(rows)
+    nuevas, cambian, iguales = [], [], 0
+    for r in rows:
+        f, m, v, a = clave(r)
+        vs = previos.get((f, m, a), set())
+        if v in vs:
+            iguales += 1
+        elif vs:
+            cambian.append((r, sorted(vs)))
+        else:
+            nuevas.append(r)
+    return nuevas, cambian, iguales
+
+# ----------------------------------------------------------------------
+# 6) Bloque principal
+# ----------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reimportación masiva de capturas procesadas")
+    ap.add_argument('carpetas', nargs='*', help=f"por defecto {PROCESSED}")
+    ap.add_argument('--tipos', default=None, help="p.ej. STARFIT,AMAZFIT (por defecto todos)")
+    ap.add_argument('--destino', choices=('capturas', 'store', 'csv'), default='capturas',
+                    help="capturas = store local + sincronizar; store = sólo local")
+    ap.add_argument('--out', default='reimportar.csv', help="archivo para --destino csv")
+    ap.add_argument('--dry-run', action='store_true', help="sólo mostrar el diff contra CAPTURAS")
+    ap.add_argument('--detalle', action='store_true', help="con --dry-run, listar filas que cambian")
+    ap.add_argument('--workers', type=int, default=cfg.get('OCR_WORKERS'), help="0 = en serie")
+    ap.add_argument('--lote', type=int, default=2000, help="filas por escritura")
+    ap.add_argument('--desde-cero', action='store_true', help="ignorar el checkpoint")
+    args = ap.parse_args(argv)
+
+    tipos = {t.strip().upper() for t in args.tipos.split(',')} if args.tipos else None
+    trabajos = descubrir(args.carpetas or [PROCESSED], tipos)
+
+    if args.dry_run:
+        # sin escrituras: ni store, ni journal, ni checkpoint, ni el índice real de CAPTURAS
+        import uploader
+        todas = []
+        _, n, err = reimportar(trabajos, todas.extend, None, args.workers, args.lote)
+        with tempfile.TemporaryDirectory(prefix="reimportar_") as tmp:
+            indice = indice_temporal(tmp)
+            indice.sync(uploader.capturas_ws())
+            nuevas, cambian, iguales = diff([[f, m, f"{v:.2f}", a] for f, m, v, a, *_ in todas],
+                                            indice)
+        print(f"🔎 {n} filas: ➕ {len(nuevas)} nuevas, ✏️ {len(cambian)} cambian, = {iguales} iguales"
+              + (f", ❌ {err} grupos con error" if err else ""))
+        if args.detalle:
+            for r, previos in cambian:
+                print(f"   ✏️ {r[0]} {r[1]} [{r[3]}]: {', '.join(previos)} → {r[2]}")
+        return nuevas, cambian, iguales
+
+    checkpoint = Checkpoint()
+    if args.desde_cero:
+        checkpoint.borrar()
+
+    if args.destino == 'csv':
+        escribir = escritor_csv(args.out)
+    else:
+        import uploader
+        escribir = uploader.store.guardar       # durable: el checkpoint puede avanzar
+
+    g, n, err = reimportar(trabajos, escribir, checkpoint, args.workers, args.lote)
+    print(f"✅ {g} grupos, {n} filas" + (f", ❌ {err} con error" if err else ""))
+
+    if args.destino == 'capturas' and n:
+        import uploader
+        print(f"📤 Sincronizando {uploader.store.pendientes_sync()} cambios con CAPTURAS por lotes…")
+        if not uploader.vaciar(None):
+            print("⚠️ Quedaron filas en el journal; se subirán en la próxima ejecución.")
+    return g, n, err
+
+if __name__ == "__main__":
+    main()
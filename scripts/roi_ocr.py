@@ -0,0 +1,231 @@
+# === scripts/roi_ocr.py ===
+"""
+OCR por regiones de interés (ROI) para capturas StarFit / Amazfit.
+
+En lugar de escalar y filtrar la página completa y pasarla entera por
+Tesseract, se localizan sólo las zonas con texto y se procesan esas:
+
+  1) Plantillas por app/pantalla (ocr_plantillas.json): cajas relativas de
+     número y etiqueta, validadas con un texto ancla.
+  2) Si ninguna plantilla coincide, detección de renglones por contornos
+     (cierre morfológico horizontal) descartando íconos, gráficos y espacio vacío.
+
+Los recortes se binarizan por separado y se apilan en un mosaico, de modo que
+cada grupo (números / etiquetas / renglones) cuesta una sola llamada a
+Tesseract (vía ocr_backend: tesserocr persistente o pytesseract). El
+resultado son Renglones (texto, confianza, caja) en orden de lectura, igual
+que la salida de página completa con renglones_pagina().
+
+Formato de ocr_plantillas.json:
+    {"starfit": [{"pantalla": "composicion",
+                  "ancla": {"texto": "composicion", "caja": [x0, y0, x1, y1]},
+                  "cajas": [{"metrica": "Peso (kg)", "caja": [x0, y0, x1, y1]}, …]}]}
+con coordenadas como fracción (0–1) del ancho/alto de la captura.
+"""
+import sys
+import json
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+from unidecode import unidecode
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+import ocr_backend
+import instrumentacion
+cfg = json.loads((BASE_DIR.parent / 'config.json').read_text(encoding='utf-8'))
+
+MODO = cfg.get('OCR_MODO', 'pagina')     # "pagina" (histórico) | "roi"
+PLANTILLAS_FILE = BASE_DIR / 'ocr_plantillas.json'
+try:
+    PLANTILLAS = json.loads(PLANTILLAS_FILE.read_text(encoding='utf-8'))
+except Exception:
+    PLANTILLAS = {}
+
+ALTO_TEXTO = 40          # alto (px) al que se normaliza cada recorte
+MARGEN = 12
+CFG_LINEAS = "--oem 3 --psm 6"
+CFG_NUMEROS = "--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789.,%kgcal"
+CFG_ANCLA = "--oem 3 --psm 7"
+LANG = "spa+eng"
+CONF_MIN = cfg.get('OCR_CONF_MIN', 60)   # lecturas con menos confianza se descartan
+
+
+class Renglon(NamedTuple):
+    texto: str
+    conf: float                 # confianza media de Tesseract (0–100)
+    caja: tuple                 # (x0, y0, x1, y1)
+    metrica: Optional[str] = None   # sólo en cajas de plantilla
+
+
+class Medida(tuple):
+    """
+    (métrica, valor) con la confianza OCR (0–100) como atributo `conf`.
+    Sigue siendo un par: se compara, desempaqueta y sube igual que antes.
+    """
+
+    def __new__(cls, metrica, valor, conf=None):
+        self = super().__new__(cls, (metrica, valor))
+        self.conf = conf
+        return self
+
+    def __getnewargs__(self):
+        return (self[0], self[1], self.conf)
+
+    def __repr__(self):
+        return f"Medida({self[0]!r}, {self[1]!r}, conf={self.conf!r})"
+
+# ----------------------------------------------------------------------
+# 1) Localización de regiones
+# ----------------------------------------------------------------------
+def _gris(img):
+    if isinstance(img, (str, Path)):
+        img = cv2.imread(str(img))
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def detectar_renglones(gray, ancho_trabajo=720):
+    """Cajas (x0, y0, x1, y1) de renglones de texto, en orden de lectura."""
+    h, w = gray.shape
+    esc = min(1.0, ancho_trabajo / w)
+    small = cv2.resize(gray, None, fx=esc, fy=esc, interpolation=cv2.INTER_AREA) if esc < 1 else gray
+    # gradiente morfológico: resalta bordes de caracteres sin importar la polaridad
+    grad = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)))
+    _, bw = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    bw = cv2.morphologyEx(bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+    cnts, _ = cv2.findContours(bw, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    sh = small.shape[0]
+    cajas = []
+    for c in cnts:
+        x, y, cw, ch = cv2.boundingRect(c)
+        # texto: alto razonable, más ancho que alto, y no un bloque macizo (ícono/gráfico)
+        if not (0.008 * sh <= ch <= 0.08 * sh) or cw < 1.2 * ch:
+            continue
+        if cv2.countNonZero(bw[y:y + ch, x:x + cw]) / float(cw * ch) > 0.95:
+            continue
+        cajas.append((int(x / esc), int(y / esc), int((x + cw) / esc), int((y + ch) / esc)))
+    return orden_lectura(cajas)
+
+def orden_lectura(cajas):
+    """Agrupa cajas en renglones (centros a menos de medio alto) y ordena por x."""
+    filas = []
+    for b in sorted(cajas, key=lambda b: (b[1] + b[3]) / 2):
+        cy, h = (b[1] + b[3]) / 2, b[3] - b[1]
+        if filas and abs(cy - filas[-1][0]) < h / 2:
+            filas[-1][1].append(b)
+        else:
+            filas.append([cy, [b]])
+    return [b for _, fila in filas for b in sorted(fila)]
+
+def _abs(caja, shape):
+    h, w = shape[:2]
+    x0, y0, x1, y1 = caja
+    return int(x0 * w), int(y0 * h), int(x1 * w), int(y1 * h)
+
+def elegir_plantilla(gray, app):
+    """Primera plantilla de `app` cuyo texto ancla aparece en su caja."""
+    for p in PLANTILLAS.get(app, []):
+        ancla = p.get('ancla')
+        if not ancla:
+            return p
+        x0, y0, x1, y1 = _abs(ancla['caja'], gray.shape)
+        with instrumentacion.etapa("ocr"):
+            txt = ocr_backend.get().image_to_string(_binarizar(gray[y0:y1, x0:x1]), LANG, CFG_ANCLA)
+        if unidecode(ancla['texto']).lower() in unidecode(txt).lower():
+            return p
+    return None
+
+# ----------------------------------------------------------------------
+# 2) Recortes → mosaico → una llamada a Tesseract
+# ----------------------------------------------------------------------
+def _binarizar(crop):
+    h = crop.shape[0]
+    if h and h != ALTO_TEXTO:
+        f = ALTO_TEXTO / h
+        crop = cv2.resize(crop, None, fx=f, fy=f,
+                          interpolation=cv2.INTER_CUBIC if f > 1 else cv2.INTER_AREA)
+    _, th = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # siempre texto oscuro sobre fondo claro
+    if np.mean(th) < 127:
+        th = 255 - th
+    return th
+
+def mosaico(gray, cajas):
+    """Apila los recortes; devuelve (imagen, [(y0, y1) por caja])."""
+    crops = [_binarizar(gray[y0:y1, x0:x1]) for x0, y0, x1, y1 in cajas]
+    ancho = max(c.shape[1] for c in crops) + 2 * MARGEN
+    alto = sum(c.shape[0] + MARGEN for c in crops) + MARGEN
+    lienzo = np.full((alto, ancho), 255, dtype=np.uint8)
+    filas, y = [], MARGEN
+    for c in crops:
+        lienzo[y:y + c.shape[0], MARGEN:MARGEN + c.shape[1]] = c
+        filas.append((y, y + c.shape[0]))
+        y += c.shape[0] + MARGEN
+    return lienzo, filas
+
+def ocr_cajas(gray, cajas, config=CFG_LINEAS):
+    """Un Renglon por caja (mismo orden) con una sola llamada a image_to_data."""
+    if not cajas:
+        return []
+    lienzo, filas = mosaico(gray, cajas)
+    with instrumentacion.etapa("ocr"):
+        d = ocr_backend.get().image_to_data(lienzo, LANG, config)
+    centros = np.array([(a + b) / 2 for a, b in filas])
+    palabras = [[] for _ in cajas]
+    for i, txt in enumerate(d['text']):
+        if not str(txt).strip():
+            continue
+        k = int(np.argmin(np.abs(centros - (d['top'][i] + d['height'][i] / 2))))
+        palabras[k].append((d['left'][i], str(txt).strip(), float(d['conf'][i])))
+    out = []
+    for caja, ws in zip(cajas, palabras):
+        ws.sort()
+        confs = [c for _, _, c in ws if c >= 0]
+        out.append(Renglon(" ".join(t for _, t, _ in ws),
+                           float(np.mean(confs)) if confs else 0.0, tuple(caja)))
+    return out
+
+# ----------------------------------------------------------------------
+# 3) Renglones con caja y confianza (una llamada a image_to_data)
+# ----------------------------------------------------------------------
+def renglones_data(d):
+    """Salida de image_to_data (DICT) → Renglones agrupados por (bloque, párrafo, línea)."""
+    grupos = {}
+    for i, txt in enumerate(d['text']):
+        if not str(txt).strip():
+            continue
+        k = (d['block_num'][i], d['par_num'][i], d['line_num'][i])
+        grupos.setdefault(k, []).append(i)
+    out = []
+    for idx in grupos.values():
+        idx.sort(key=lambda i: d['left'][i])
+        confs = [float(d['conf'][i]) for i in idx if float(d['conf'][i]) >= 0]
+        caja = (min(d['left'][i] for i in idx), min(d['top'][i] for i in idx),
+                max(d['left'][i] + d['width'][i] for i in idx),
+                max(d['top'][i] + d['height'][i] for i in idx))
+        out.append(Renglon(" ".join(str(d['text'][i]).strip() for i in idx),
+                           float(np.mean(confs)) if confs else 0.0, caja))
+    orden = {c: i for i, c in enumerate(orden_lectura([r.caja for r in out]))}
+    return sorted(out, key=lambda r: orden[r.caja])
+
+def renglones_pagina(img, config, lang=LANG):
+    """Página completa ya preprocesada → Renglones (una sola llamada a Tesseract)."""
+    with instrumentacion.etapa("ocr"):
+        d = ocr_backend.get().image_to_data(img, lang, config)
+    return renglones_data(d)
+
+def renglones(img, app):
+    """
+    Renglones de las regiones de interés de la captura, en orden de lectura.
+    Con plantilla, cada caja de valor trae ya su `metrica`.
+    """
+    gray = _gris(img)
+    p = elegir_plantilla(gray, app)
+    if p is not None:
+        cajas = [_abs(c['caja'], gray.shape) for c in p['cajas']]
+        valores = ocr_cajas(gray, cajas, config=CFG_NUMEROS)
+        return [r._replace(metrica=c['metrica'])
+                for c, r in zip(p['cajas'], valores) if r.texto]
+    return [r for r in ocr_cajas(gray, detectar_renglones(gray)) if r.texto]
@@ -0,0 +1,199 @@
+# === scripts/sheets_client.py ===
+"""
+Cliente de Google Sheets perezoso y compartido.
+
+Nada se conecta al importar: la autenticación, la apertura del spreadsheet y
+la búsqueda de hojas ocurren en el primer uso y se reutilizan durante toda la
+vida del proceso. Con google-auth la sesión HTTP (requests) mantiene un pool
+de conexiones y renueva el token sola.
+
+Backend "fake" (config SHEETS_BACKEND o env JCPSALUD_SHEETS_BACKEND) = hojas
+en memoria, opcionalmente persistidas en un JSON, para tests y modo offline.
+"""
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+cfg = json.loads((BASE_DIR / 'config.json').read_text(encoding='utf-8'))
+
+SCOPES = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+SHEETS = cfg.get('SHEETS', {"CAPTURAS": "CAPTURAS"})
+DATA_DIR = Path(os.environ.get('JCPSALUD_DATA_DIR') or cfg.get('DATA_DIR') or BASE_DIR / 'data')
+FAKE_FILE = DATA_DIR / 'fake_sheets.json'
+POOL_SIZE = cfg.get('SHEETS_POOL_SIZE', 10)
+
+logger = logging.getLogger('sheets_client')
+
+# ----------------------------------------------------------------------
+# 1) Backend falso (en memoria / JSON)
+# ----------------------------------------------------------------------
+def _a1(celda):
+    """'B12' → (fila, col) 1-indexadas."""
+    col, fila = 0, ''
+    for ch in celda:
+        if ch.isalpha():
+            col = col * 26 + (ord(ch.upper()) - 64)
+        else:
+            fila += ch
+    return (int(fila) if fila else None), col
+
+
+class FakeWorksheet:
+    def __init__(self, title, filas=None, on_change=None):
+        self.title = title
+        self.filas = filas if filas is not None else []
+        self._on_change = on_change or (lambda: None)
+
+    def get_all_values(self):
+        return [list(r) for r in self.filas]
+
+    def get(self, rango):
+        ini, _, fin = rango.partition(':')
+        f0, c0 = _a1(ini)
+        f1, c1 = _a1(fin) if fin else (f0, c0)
+        f0 = f0 or 1
+        filas = self.filas[f0 - 1:f1] if f1 else self.filas[f0 - 1:]
+        return [list(r[c0 - 1:c1]) for r in filas]
+
+    def append_rows(self, rows, **kw):
+        ini = len(self.filas) + 1
+        self.filas.extend([list(map(str, r)) for r in rows])
+        self._on_change()
+        return {"updates": {"updatedRange": f"{self.title}!A{ini}:Z{len(self.filas)}"}}
+
+    def append_row(self, row, **kw):
+        return self.append_rows([row], **kw)
+
+    def update(self, rango, values=None, **kw):
+        f0, c0 = _a1(rango.split(':')[0])
+        for i, r in enumerate(values or []):
+            self._set_row(f0 + i, c0, r)
+        self._on_change()
+
+    def update_acell(self, celda, valor):
+        self.update(celda, [[valor]])
+
+    def batch_update(self, datos, **kw):
+        for d in datos:
+            f0, c0 = _a1(d['range'].split('!')[-1].split(':')[0])
+            for i, r in enumerate(d['values']):
+                self._set_row(f0 + i, c0, r)
+        self._on_change()
+
+    def _set_row(self, fila, col, valores):
+        while len(self.filas) < fila:
+            self.filas.append([])
+        r = self.filas[fila - 1]
+        while len(r) < col - 1 + len(valores):
+            r.append('')
+        r[col - 1:col - 1 + len(valores)] = [str(v) for v in valores]
+
+
+class FakeSpreadsheet:
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._hojas = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            for t, filas in json.loads(self.path.read_text(encoding='utf-8')).items():
+                self._hojas[t] = FakeWorksheet(t, filas, self._guardar)
+
+    def worksheet(self, title):
+        with self._lock:
+            if title not in self._hojas:
+                self._hojas[title] = FakeWorksheet(title, [], self._guardar)
+            return self._hojas[title]
+
+    def values_batch_update(self, body):
+        """Como Spreadsheet.values_batch_update: rangos 'HOJA!A1' de varias hojas a la vez."""
+        por_hoja = {}
+        for d in body.get('data', []):
+            por_hoja.setdefault(d['range'].split('!')[0].strip("'"), []).append(d)
+        for title, datos in por_hoja.items():
+            self.worksheet(title).batch_update(datos)
+        return {"totalUpdatedCells": sum(len(r) for d in body.get('data', []) for r in d['values'])}
+
+    def _guardar(self):
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            data = {t: ws.filas for t, ws in self._hojas.items()}
+            self.path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+# ----------------------------------------------------------------------
+# 2) Backend Google (perezoso)
+# ----------------------------------------------------------------------
+def _abrir_google():
+    import gspread
+    creds_file = str(BASE_DIR / cfg.get('CREDS_FILE', 'creds.json'))
+    if not os.path.exists(creds_file):
+        creds_file = cfg.get('CREDS_FILE', 'creds.json')
+    try:
+        # google-auth: AuthorizedSession renueva el token de forma transparente
+        from google.oauth2.service_account import Credentials
+        creds = Credentials.from_service_account_file(creds_file, scopes=SCOPES)
+    except ImportError:
+        from oauth2client.service_account import ServiceAccountCredentials
+        creds = ServiceAccountCredentials.from_json_keyfile_name(creds_file, SCOPES)
+    gc = gspread.authorize(creds)
+    _ampliar_pool(gc)
+    logger.info("🔑 Conectado a Google Sheets")
+    return gc.open_by_key(cfg['SHEET_ID'])
+
+
+def _ampliar_pool(gc):
+    """Agranda el pool de conexiones de la sesión requests (varios hilos)."""
+    session = getattr(getattr(gc, 'http_client', None), 'session', None) or getattr(gc, 'session', None)
+    if session is None or not hasattr(session, 'mount'):
+        return
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount('https://', adapter)
+
+# ----------------------------------------------------------------------
+# 3) API pública
+# ----------------------------------------------------------------------
+_lock = threading.Lock()
+_spreadsheet = None
+_handles = {}
+
+def backend_name():
+    return os.environ.get('JCPSALUD_SHEETS_BACKEND') or cfg.get('SHEETS_BACKEND', 'google')
+
+def spreadsheet():
+    global _spreadsheet
+    with _lock:
+        if _spreadsheet is None:
+            if backend_name() == 'fake':
+                _spreadsheet = FakeSpreadsheet(FAKE_FILE)
+                logger.info(f"🧪 Backend Sheets falso: {FAKE_FILE}")
+            else:
+                _spreadsheet = _abrir_google()
+        return _spreadsheet
+
+def worksheet(nombre):
+    """Handle reutilizable de la hoja lógica `nombre` (clave de config SHEETS)."""
+    ss = spreadsheet()
+    with _lock:
+        if nombre not in _handles:
+            _handles[nombre] = ss.worksheet(SHEETS.get(nombre, nombre))
+        return _handles[nombre]
+
+def worksheets():
+    """Handles de todas las hojas de config SHEETS (abiertas una sola vez)."""
+    return {nombre: worksheet(nombre) for nombre in SHEETS}
+
+def set_backend(ss):
+    """Reemplaza el spreadsheet (p.ej. FakeSpreadsheet() en tests)."""
+    global _spreadsheet
+    with _lock:
+        _spreadsheet = ss
+        _handles.clear()
+
+def reset():
+    set_backend(None)
@@ -16,12 +16,24 @@ except ModuleNotFoundError:
 # ----------------------------------------------------------------------
 # 2) Imports OCR
 # ----------------------------------------------------------------------
-import cv2
-import pytesseract
+import numpy as np
 import re
+import os
 import json
+import logging
+import hashlib
 from unidecode import unidecode
-from rapidfuzz import fuzz
+import ocr_cache
+import roi_ocr
+import preproceso
+import instrumentacion
+from label_matcher import LabelMatcher
+
+# Depuración del mapeo de etiquetas: STARFIT_DEBUG=1
+logger = logging.getLogger('starfit_ocr')
+if os.environ.get('STARFIT_DEBUG') == '1':
+    logging.basicConfig(level=logging.DEBUG)
+    logger.setLevel(logging.DEBUG)
 
 # ----------------------------------------------------------------------
 # 3) Cargar CANON (métricas “oficiales”)
@@ -36,84 +48,141 @@ except Exception:
 # Prepara lista de claves
 VALID_KEYS = set(CANON.keys())
 
+# Versión del extractor para la caché OCR: cambia si cambia el código, el diccionario,
+# el preprocesado, las plantillas de roi_ocr o el umbral de confianza (se filtra dentro)
+EXTRACTOR_VERSION = f"3+{roi_ocr.MODO}+" + hashlib.sha1(
+    json.dumps([CANON, preproceso.perfil("starfit"), roi_ocr.PLANTILLAS.get("starfit", []),
+                roi_ocr.CONF_MIN], sort_keys=True).encode("utf-8")
+).hexdigest()[:8]
+
 STOP_S = {"medida","perfil","grafico","gráfico","x","t","&","ba","o","a","h","=",":",";"}
 
 # ----------------------------------------------------------------------
 # 4) Preprocesado y mapeo
 # ----------------------------------------------------------------------
 def preprocess_starfit(p: Path):
-    img = cv2.imread(str(p))
-    img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    blur = cv2.bilateralFilter(gray, 9,75,75)
-    _, th = cv2.threshold(blur,0,255,cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-    ker = cv2.getStructuringElement(cv2.MORPH_RECT,(3,3))
-    return cv2.morphologyEx(th, cv2.MORPH_CLOSE, ker)
+    return preproceso.preprocesar(p, "starfit")
+
+def preparar_starfit(p: Path):
+    """Imagen lista para _renglones_starfit (gris en modo roi, binaria en modo página)."""
+    return preproceso.leer_gris(p) if roi_ocr.MODO == "roi" else preprocess_starfit(p)
 
 def clean_starfit(lbl: str) -> str:
     txt = re.sub(r"[^A-Za-zÁÉÍÓÚÜáéíóúüÑñ\s]","", lbl)
     return " ".join(t for t in txt.split() if len(t)>2 and t.lower() not in STOP_S)
 
+def _norm_starfit(raw: str) -> str:
+    return unidecode(clean_starfit(raw)).strip().lower()
+
+_matcher_cache = {}
+
+def _matcher():
+    """Matcher compilado para el CANON actual (se recompila si CANON se reemplaza)."""
+    m = _matcher_cache.get(id(CANON))
+    if m is None:
+        _matcher_cache.clear()
+        m = _matcher_cache[id(CANON)] = LabelMatcher(CANON, normalizar=_norm_starfit)
+    return m
+
+@instrumentacion.etapa("map")
 def map_lbl_starfit(raw: str):
-    t = unidecode(clean_starfit(raw)).strip().lower()
-    if not t:
-        return None
-    # DEBUG
-    print(f"🔍 map_lbl: '{raw}' → '{t}'")
-    # 1) busc. directa (umbral 80)
-    for canon in VALID_KEYS:
-        base = unidecode(canon.split(" (")[0]).lower()
-        if t.startswith(base) or fuzz.ratio(t, base) >= 80:
-            print(f"    → matched DIRECTO '{canon}'")
-            return canon
-    # 2) aliases
-    for canon, aliases in CANON.items():
-        for alias in aliases:
-            if fuzz.ratio(t, unidecode(alias).lower()) >= 80:
-                print(f"    → matched ALIAS '{canon}' (alias='{alias}')")
-                return canon
+    canon = _matcher()(raw)
+    if canon:
+        logger.debug(f"map_lbl: '{raw}' → '{canon}'")
+        return canon
     # fallback
     fallback = clean_starfit(raw)
-    print(f"    → sin match, usando FALLBACK '{fallback}'")
+    logger.debug(f"map_lbl: '{raw}' sin match, usando FALLBACK '{fallback}'")
     return fallback or None
 
 # ----------------------------------------------------------------------
 # 5) Extracción de métricas
 # ----------------------------------------------------------------------
-def extraer_starfit(img: Path):
-    texto = pytesseract.image_to_string(
-        preprocess_starfit(img),
-        lang="spa+eng", config="--oem 3 --psm 3"
-    )
-    lines = [unidecode(l).strip() for l in texto.splitlines() if l.strip()]
-    datos, i = [], 0
-
-    while i < len(lines):
-        m = re.match(r"([\d]+(?:[\.,]\d+)?)(?:\s*(kg|%|kcal))?", lines[i], re.I)
-        if not m:
-            i += 1
-            continue
+NUM_RE = re.compile(r"([\d]+(?:[\.,]\d+)?)(?:\s*(kg|%|kcal))?", re.I)
+CONF_MIN = roi_ocr.CONF_MIN
 
-        num, uni = m.groups()
-        uni = (uni or "").lower()
-        # descartar ruido
-        if len(num.replace(",", "").replace(".", "")) == 1:
-            i += 1
-            continue
+def _renglones_starfit(img: Path, pre=None):
+    """Una sola llamada a Tesseract por captura → renglones con caja y confianza."""
+    if roi_ocr.MODO == "roi":
+        # sólo las regiones con texto (plantilla o contornos), sin página completa
+        return roi_ocr.renglones(img if pre is None else pre, "starfit")
+    if pre is None:
+        pre = preprocess_starfit(img)
+    return roi_ocr.renglones_pagina(pre, config="--oem 3 --psm 3")
+
+def _centro(caja):
+    return (caja[0] + caja[2]) / 2, (caja[1] + caja[3]) / 2
 
-        # capturar etiqueta
-        lbl_parts, j = [], i+1
-        while j < len(lines) and not re.search(r"\d", lines[j]):
-            if len(lines[j]) > 2:
-                lbl_parts.append(lines[j])
-            if len(lbl_parts) == 2:
+def _unir_etiquetas(etqs):
+    """Une etiquetas partidas en dos renglones (uno justo debajo del otro)."""
+    out = []
+    for r in sorted(etqs, key=lambda r: r.caja[1]):
+        for k, a in enumerate(out):
+            h = a.caja[3] - a.caja[1]
+            solapa = min(a.caja[2], r.caja[2]) > max(a.caja[0], r.caja[0])
+            if solapa and 0 <= r.caja[1] - a.caja[3] < 0.5 * h and a.texto.count(" ") < 3:
+                out[k] = a._replace(texto=f"{a.texto} {r.texto}", conf=min(a.conf, r.conf),
+                                    caja=(min(a.caja[0], r.caja[0]), a.caja[1],
+                                          max(a.caja[2], r.caja[2]), r.caja[3]))
                 break
-            j += 1
+        else:
+            out.append(r)
+    return out
+
+@instrumentacion.etapa("parse")
+def emparejar(renglones):
+    """
+    Empareja cada número con la etiqueta más cercana (preferencia: debajo o
+    al lado; arriba penaliza 1.5×), asignación greedy global sin repetir.
+    Devuelve [(num, unidad, etiqueta, confianza), ...] en orden de lectura.
+    """
+    valores, etqs, pares = [], [], []
+    for r in renglones:
+        t = unidecode(r.texto).strip()
+        m = NUM_RE.match(t)
+        if m:
+            num, uni = m.groups()
+            if len(num.replace(",", "").replace(".", "")) == 1:
+                continue    # descartar ruido
+            if r.metrica:   # caja de plantilla: la etiqueta ya se conoce
+                pares.append((r.caja, num, (uni or "").lower(), r.metrica, r.conf))
+            else:
+                valores.append((r, num, (uni or "").lower()))
+        elif not re.search(r"\d", t) and len(t) > 2:
+            etqs.append(r._replace(texto=t))
+    etqs = _unir_etiquetas(etqs)
+
+    costos = []
+    for i, (v, _, _) in enumerate(valores):
+        vx, vy = _centro(v.caja)
+        h = max(v.caja[3] - v.caja[1], 1)
+        for j, e in enumerate(etqs):
+            ex, ey = _centro(e.caja)
+            dy = ey - vy
+            d = np.hypot(ex - vx, dy if dy >= 0 else 1.5 * dy)
+            if d <= 15 * h:
+                costos.append((d, i, j))
+    usados_v, usados_e = set(), set()
+    for _, i, j in sorted(costos):
+        if i in usados_v or j in usados_e:
+            continue
+        usados_v.add(i); usados_e.add(j)
+        v, num, uni = valores[i]
+        e = etqs[j]
+        pares.append((v.caja, num, uni, e.texto, min(v.conf, e.conf)))
+    pares.sort(key=lambda p: (p[0][1], p[0][0]))
+    return [p[1:] for p in pares]
 
-        raw_lbl = " ".join(lbl_parts).strip()
+@ocr_cache.cacheado("starfit", EXTRACTOR_VERSION)
+def extraer_starfit(img: Path, pre=None):
+    """`pre`: imagen ya preparada con preparar_starfit (opcional)."""
+    datos = []
+    for num, uni, raw_lbl, conf in emparejar(_renglones_starfit(img, pre)):
+        if conf < CONF_MIN:
+            logger.debug(f"descartado '{num}' / '{raw_lbl}' (confianza {conf:.0f})")
+            continue
         canon = map_lbl_starfit(raw_lbl)
         if not canon:
-            i = j
             continue
 
         try:
@@ -130,20 +199,40 @@ def extraer_starfit(img: Path):
 
             # filtros mínimos (por ejemplo IMC 5–60)
             if canon == "IMC" and not (5 <= val <= 60):
-                i = j; continue
+                continue
 
             # añadir unidad si falta
             if uni and uni not in canon.lower():
                 canon = f"{canon} ({uni})"
 
-            datos.append((canon, val))
+            datos.append(roi_ocr.Medida(canon, val, round(conf, 1)))
         except ValueError:
             pass
 
-        i = j
-
     return datos
 
+def procesar_grupo(rutas):
+    """
+    Extrae todas las capturas de un grupo y desduplica por métrica (gana la
+    primera). Las capturas sin resultado en caché se preparan en hilos,
+    solapando el preprocesado de las siguientes con el OCR de la actual.
+    """
+    rutas = [Path(p) for p in rutas]
+    pendientes = [p for p in rutas if not extraer_starfit.en_cache(p)]
+    lote = preproceso.preprocesar_lote(pendientes, preparar_starfit)
+    todas = []
+    for img in rutas:
+        if img in pendientes:
+            _, pre = next(lote)
+            todas += extraer_starfit(img, pre)
+        else:
+            todas += extraer_starfit(img)
+
+    seen = {}
+    for d in todas:
+        seen.setdefault(d[0], d)
+    return list(seen.values())
+
 # ----------------------------------------------------------------------
 # 6) Bloque principal
 # ----------------------------------------------------------------------
@@ -159,16 +248,7 @@ if __name__ == "__main__":
             sys.exit(1)
 
     print(f"📷 Analizando {len(rutas)} capturas…")
-    todas = []
-    for img in rutas:
-        todas += extraer_starfit(img)
-
-    # desduplicar
-    seen = {}
-    for k, v in todas:
-        if k not in seen:
-            seen[k] = v
-    datos = list(seen.items())
+    datos = procesar_grupo(rutas)
 
     if not datos:
         print("⚠️ No se detectaron métricas válidas.")
@@ -179,4 +259,6 @@ if __name__ == "__main__":
         print(f" • {m}: {v}")
 
     upload_data(rutas[0], datos)
-    print("✅ Subida a CAPTURAS completada.")
+    import uploader
+    if uploader.vaciar():
+        print("✅ Subida a CAPTURAS completada.")
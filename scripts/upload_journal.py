@@ -0,0 +1,217 @@
+# === scripts/upload_journal.py ===
+"""
+Journal local (write-ahead) para las subidas a CAPTURAS.
+
+upload_data() sólo agrega filas a un SQLite local; un hilo "flusher" las
+junta en lotes y hace un único append_rows por lote, con backoff exponencial
+y control de cuota. Las llamadas se anotan en el mismo SQLite, así la cuota
+por minuto es una sola aunque haya varios procesos subiendo. Si la API no
+responde las filas se quedan en el journal hasta el próximo intento: nunca
+se descartan.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger('uploader')
+
+# ----------------------------------------------------------------------
+# 1) Journal en SQLite (compartido entre procesos)
+# ----------------------------------------------------------------------
+class UploadJournal:
+    def __init__(self, path, lease_s=300):
+        self.path = Path(path)
+        self.lease_s = lease_s
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _db(self):
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=30,
+                                         isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pendientes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, fila TEXT NOT NULL,"
+                " creado REAL NOT NULL, lote TEXT, lease_hasta REAL)"
+            )
+            # append_rows hechos (de cualquier proceso): la cuota por minuto es una sola
+            self._conn.execute("CREATE TABLE IF NOT EXISTS llamadas (t REAL NOT NULL)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def append(self, rows):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "INSERT INTO pendientes (fila, creado) VALUES (?, ?)",
+                [(json.dumps(r, ensure_ascii=False), now) for r in rows]
+            )
+            db.execute("COMMIT")
+
+    def reservar(self, n):
+        """Marca hasta `n` filas libres (o con lease vencido) como un lote propio."""
+        lote = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "UPDATE pendientes SET lote = ?, lease_hasta = ? WHERE id IN ("
+                " SELECT id FROM pendientes WHERE lote IS NULL OR lease_hasta < ?"
+                " ORDER BY id LIMIT ?)",
+                (lote, now + self.lease_s, now, n)
+            )
+            rows = db.execute(
+                "SELECT fila FROM pendientes WHERE lote = ? ORDER BY id", (lote,)
+            ).fetchall()
+            db.execute("COMMIT")
+        return lote, [json.loads(r[0]) for r in rows]
+
+    def confirmar(self, lote):
+        with self._lock:
+            self._db().execute("DELETE FROM pendientes WHERE lote = ?", (lote,))
+
+    def liberar(self, lote):
+        with self._lock:
+            self._db().execute(
+                "UPDATE pendientes SET lote = NULL, lease_hasta = NULL WHERE lote = ?", (lote,)
+            )
+
+    def pendientes(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM pendientes").fetchone()[0]
+
+    def anotar_llamada(self, t=None):
+        t = time.time() if t is None else t
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM llamadas WHERE t < ?", (t - 60,))
+            db.execute("INSERT INTO llamadas (t) VALUES (?)", (t,))
+
+    def llamadas_recientes(self, ventana=60):
+        """Timestamps (ascendentes) de los append_rows del último minuto."""
+        with self._lock:
+            return [t for (t,) in self._db().execute(
+                "SELECT t FROM llamadas WHERE t >= ? ORDER BY t", (time.time() - ventana,))]
+
+# ----------------------------------------------------------------------
+# 2) Flusher en segundo plano
+# ----------------------------------------------------------------------
+def _es_cuota(e):
+    resp = getattr(e, 'response', None)
+    return getattr(resp, 'status_code', None) == 429 or '429' in str(e) or 'Quota' in str(e)
+
+
+class Flusher:
+    """
+    enviar(rows) hace la escritura real (un append_rows). Si lanza excepción el
+    lote se libera y se reintenta con backoff: base*2^k, hasta `max_backoff`;
+    un error de cuota (HTTP 429) espera al menos `cuota_backoff`.
+    """
+
+    def __init__(self, journal, enviar, batch=500, intervalo=5.0,
+                 base_backoff=2.0, max_backoff=300.0, cuota_backoff=60.0,
+                 max_por_minuto=50):
+        self.journal = journal
+        self.enviar = enviar
+        self.batch = batch
+        self.intervalo = intervalo
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.cuota_backoff = cuota_backoff
+        self.max_por_minuto = max_por_minuto
+        self._fallos = 0
+        self._no_antes_de = 0.0
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    def _esperar_cuota(self):
+        now = time.time()
+        llamadas = self.journal.llamadas_recientes()
+        if len(llamadas) >= self.max_por_minuto:
+            return 60 - (now - llamadas[-self.max_por_minuto])
+        return max(0.0, self._no_antes_de - now)
+
+    def flush(self):
+        """
+        Envía lotes hasta vaciar el journal o hasta el primer error.
+        Devuelve el número de filas confirmadas.
+        """
+        enviadas = 0
+        with self._flush_lock:
+            while True:
+                espera = self._esperar_cuota()
+                if espera > 0:
+                    break
+                lote, rows = self.journal.reservar(self.batch)
+                if not rows:
+                    break
+                try:
+                    self.journal.anotar_llamada()
+                    self.enviar(rows)
+                except Exception as e:
+                    self.journal.liberar(lote)
+                    self._fallos += 1
+                    espera = min(self.base_backoff * 2 ** (self._fallos - 1), self.max_backoff)
+                    if _es_cuota(e):
+                        espera = max(espera, self.cuota_backoff)
+                    self._no_antes_de = time.time() + espera
+                    logger.error(f"❌ Error subiendo lote de {len(rows)} filas "
+                                 f"(reintento en {espera:.0f}s): {e}")
+                    break
+                self.journal.confirmar(lote)
+                self._fallos = 0
+                enviadas += len(rows)
+        return enviadas
+
+    def drain(self, timeout=None):
+        """Reintenta (respetando el backoff) hasta vaciar el journal o agotar `timeout`."""
+        limite = None if timeout is None else time.time() + timeout
+        while self.journal.pendientes():
+            self.flush()
+            if not self.journal.pendientes():
+                break
+            espera = max(self._esperar_cuota(), 0.5)
+            if limite is not None:
+                if time.time() + espera > limite:
+                    return False
+            time.sleep(espera)
+        return True
+
+    # ------------------------------------------------------------------
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='upload_flusher', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.intervalo)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Flusher: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
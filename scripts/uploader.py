@@ -1,11 +1,18 @@
 # === scripts/uploader.py ===
+import os
+import sys
 import json
 import logging
 import re
 from pathlib import Path
 from datetime import datetime
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+
+sys.path.append(str(Path(__file__).resolve().parent))
+import sheets_client
+from upload_journal import UploadJournal, Flusher
+from capturas_index import CapturasIndex
+from metricas_store import MetricStore
+import instrumentacion
 
 # ----------------------------------------------------------------------
 # 1) Config y logger
@@ -13,7 +20,9 @@ from oauth2client.service_account import ServiceAccountCredentials
 BASE_DIR = Path(__file__).resolve().parent.parent
 cfg = json.loads((BASE_DIR / 'config.json').read_text(encoding='utf-8'))
 
-LOG_DIR = BASE_DIR / 'logs'
+# env > config > carpeta del proyecto (los tests y benchmarks usan carpetas temporales)
+DATA_DIR = Path(os.environ.get('JCPSALUD_DATA_DIR') or cfg.get('DATA_DIR') or BASE_DIR / 'data')
+LOG_DIR = Path(os.environ.get('JCPSALUD_LOG_DIR') or cfg.get('LOG_DIR') or BASE_DIR / 'logs')
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 logging.basicConfig(
     filename=str(LOG_DIR / f"{datetime.now():%Y-%m-%d}.log"),
@@ -23,27 +32,107 @@ logging.basicConfig(
 logger = logging.getLogger('uploader')
 
 # ----------------------------------------------------------------------
-# 2) Conexión a Google Sheets
+# 2) Conexión a Google Sheets (perezosa, ver sheets_client)
 # ----------------------------------------------------------------------
-scope = [
-    "https://spreadsheets.google.com/feeds",
-    "https://www.googleapis.com/auth/drive"
-]
-creds = ServiceAccountCredentials.from_json_keyfile_name(
-    cfg.get('CREDS_FILE', 'creds.json'), scope
-)
-gc = gspread.authorize(creds)
-sheet = gc.open_by_key(cfg['SHEET_ID'])
-capturas_ws = sheet.worksheet("CAPTURAS")
+def capturas_ws():
+    return sheets_client.worksheet("CAPTURAS")
 
 # ----------------------------------------------------------------------
-# 3) Función principal
+# 3) Store local (fuente de verdad) + journal + flusher por lotes
 # ----------------------------------------------------------------------
-def upload_data(img_path, datos):
+FLUSH_TIMEOUT = cfg.get('UPLOAD_FLUSH_TIMEOUT_S', 60)
+
+def _enviar(rows):
+    """
+    Un append_rows por lote con las medidas nuevas; las corregidas se
+    reescriben en su fila (un batch_update) para que CAPTURAS tenga un solo
+    valor por (fecha, métrica, archivo). Filtra duplicados exactos ya presentes.
+    """
+    ws = capturas_ws()
+    with instrumentacion.etapa("dedup"):
+        indice.sync(ws)               # sólo lee filas posteriores a la última conocida
+        nuevos = indice.filtrar_nuevos(rows)
+        # vienen en orden de cambio: de cada medida queda la última corrección
+        ultimas = {(r[0], r[1], r[3]): r for r in nuevos}
+        filas_hoja = indice.posiciones(ultimas.values())
+    instrumentacion.contar("filas_duplicadas", len(rows) - len(nuevos))
+    if not ultimas:
+        logger.info("⚠️ No hay métricas nuevas para CAPTURAS.")
+        return
+    corregidas = [(filas_hoja[k], r) for k, r in ultimas.items() if k in filas_hoja]
+    altas = [r for k, r in ultimas.items() if k not in filas_hoja]
+    with instrumentacion.etapa("upload"):
+        if corregidas:
+            ws.batch_update([{"range": f"C{fila}", "values": [[r[2]]]} for fila, r in corregidas],
+                            value_input_option="USER_ENTERED")
+            indice.corregir(corregidas)
+        if altas:
+            if corregidas:
+                journal.anotar_llamada()      # segunda escritura del lote: cuenta para la cuota
+            resp = ws.append_rows(altas, value_input_option="USER_ENTERED")
+            indice.registrar(altas, resp)
+    instrumentacion.contar("filas_subidas", len(altas))
+    instrumentacion.contar("filas_corregidas", len(corregidas))
+    logger.info(f"✅ CAPTURAS: {len(altas)} registros nuevos, {len(corregidas)} corregidos.")
+
+flusher = None
+
+def configurar(data_dir=DATA_DIR):
+    """(Re)abre store, journal e índice en `data_dir`; nada se conecta hasta el primer uso."""
+    global STORE_FILE, JOURNAL_FILE, INDEX_FILE, store, journal, indice, flusher
+    if flusher is not None:
+        flusher.stop()
+    data_dir = Path(data_dir)
+    STORE_FILE = data_dir / 'metricas.sqlite'
+    JOURNAL_FILE = data_dir / 'upload_journal.sqlite'
+    INDEX_FILE = data_dir / 'capturas_index.sqlite'
+    store = MetricStore(STORE_FILE)
+    journal = UploadJournal(JOURNAL_FILE)
+    indice = CapturasIndex(INDEX_FILE)
+    flusher = Flusher(
+        journal, _enviar,
+        batch=cfg.get('UPLOAD_BATCH', 500),
+        intervalo=cfg.get('UPLOAD_FLUSH_INTERVAL_S', 5.0),
+        max_por_minuto=cfg.get('SHEETS_WRITES_PER_MIN', 50),
+    )
+
+configurar()
+
+def sincronizar():
+    """Pasa al journal lo que el store tiene y CAPTURAS todavía no."""
+    return store.sincronizar(journal.append)
+
+def flush():
+    """Envía ya todo lo pendiente (un intento); devuelve filas subidas."""
+    sincronizar()
+    return flusher.flush()
+
+def drain(timeout=None):
+    """Reintenta hasta vaciar el journal; False si se agotó `timeout`."""
+    sincronizar()
+    return flusher.drain(timeout)
+
+def vaciar(timeout=FLUSH_TIMEOUT):
+    """
+    Cierre explícito del proceso principal (watcher, ingesta, CLIs): sube lo
+    pendiente hasta `timeout` y detiene el flusher. Los workers sólo extraen
+    y nunca llaman esto.
+    """
+    ok = drain(timeout)
+    if not ok:
+        logger.warning(f"⚠️ Quedan {journal.pendientes()} filas en el journal; "
+                       "se subirán en la próxima ejecución.")
+    flusher.stop()
+    return ok
+
+# ----------------------------------------------------------------------
+# 4) Función principal
+# ----------------------------------------------------------------------
+def filas(img_path, datos):
     """
     img_path: Path de la primera captura procesada (todas comparten la misma fecha interna).
-    datos: lista de tuplas (métrica, valor).
-    Se sube: [fecha_extraída, métrica, valor, archivo].
+    datos: lista de tuplas (métrica, valor) o (métrica, valor, unidad, …).
+    Devuelve las filas [fecha_extraída, métrica, valor, archivo] tal como van a CAPTURAS.
     """
     archivo = Path(img_path).name
 
@@ -58,37 +147,45 @@ def upload_data(img_path, datos):
     else:
         fecha = datetime.now().date().isoformat()
 
-    # Construir filas a subir
-    rows = [
+    return [
         [fecha, metrica, f"{valor:.2f}", archivo]
-        for metrica, valor in datos
+        for metrica, valor, *_ in datos
     ]
 
-    # Leer existentes (sin cabecera)
-    try:
-        existing = capturas_ws.get_all_values()[1:]
-    except Exception as e:
-        logger.error(f"No pude leer CAPTURAS: {e}")
-        return
+ORIGENES = {'polar': 'POLAR', 'starfit': 'STARFIT', 'amazfit': 'AMAZFIT', 'laboratorio': 'LABORATORIO'}
 
-    existentes = set(tuple(r) for r in existing)
+def medidas(img_path, datos, origen=None):
+    """Filas de filas() + confianza (Medida.conf) y origen → tuplas del store."""
+    if origen is None:
+        origen = ORIGENES.get(Path(img_path).parent.name.lower())
+    return [
+        (fecha, metrica, float(d[1]), archivo, getattr(d, 'conf', None), origen)
+        for (fecha, metrica, _, archivo), d in zip(filas(img_path, datos), datos)
+    ]
 
-    # Filtrar duplicados exactos
-    nuevos = [r for r in rows if tuple(r) not in existentes]
-    if not nuevos:
-        logger.info("⚠️ No hay métricas nuevas para CAPTURAS.")
+def upload_data(img_path, datos, origen=None):
+    """
+    Guarda `datos` en el store local (fuente de verdad) y encola para
+    CAPTURAS sólo lo nuevo o corregido; el flusher lo sube por lotes.
+    """
+    with instrumentacion.etapa("dedup"):
+        n = store.guardar(medidas(img_path, datos, origen))
+    instrumentacion.contar("medidas_nuevas", n)
+    instrumentacion.contar("medidas_repetidas", len(datos) - n)
+    if not n:
         return
-
-    try:
-        capturas_ws.append_rows(nuevos, value_input_option="USER_ENTERED")
-        logger.info(f"✅ Subidos {len(nuevos)} registros a CAPTURAS.")
-    except Exception as e:
-        logger.error(f"❌ Error subiendo a CAPTURAS: {e}")
+    sincronizar()
+    logger.info(f"📝 {n} registros de {Path(img_path).name} en store/journal")
+    flusher.start()
+    flusher.wake()
 
 # ----------------------------------------------------------------------
-# 4) Módulo ejecutado directamente
+# 5) Módulo ejecutado directamente
 # ----------------------------------------------------------------------
 if __name__ == "__main__":
-    print("⚠️ Este módulo sólo exporta upload_data()")
-
-
+    # Sin argumentos: sube lo que haya quedado pendiente en el store/journal
+    sincronizar()
+    n = journal.pendientes()
+    print(f"📝 {n} filas pendientes en el journal")
+    if n and drain(FLUSH_TIMEOUT):
+        print("✅ Journal vaciado")
@@ -0,0 +1,24 @@
+import benchmarks.bench as bench
+import benchmarks.fixtures as fixtures
+import scripts.roi_ocr as roi
+import scripts.polar_hrv_analyzer as polar
+import scripts.starfit_ocr as starfit_ocr
+
+
+def test_noche_sintetica_la_lee_el_analizador(tmp_path):
+    f = fixtures.noche_polar(tmp_path, horas=0.5, acc_hz=25)
+    assert fixtures.noche_polar(tmp_path, horas=0.5, acc_hz=25) == f      # reutiliza
+    res = polar.analizar_noche(f['RR'], f['ACC'], f['HR'])
+    assert res is not None
+
+def test_captura_con_ocr_simulado(tmp_path, monkeypatch):
+    monkeypatch.setenv("JCPSALUD_OCR_CACHE", "0")
+    img = tmp_path / "IMG_20240105_0800.jpg"
+    monkeypatch.setattr(roi.ocr_backend, "_backend", fixtures.OCRSimulado(fixtures.captura(img, "starfit")))
+    datos = dict(starfit_ocr.extraer_starfit(img))
+    assert datos and 81.9 in datos.values()
+
+def test_comparar_marca_regresiones():
+    base = {"a": {"mediana_s": 1.0}, "b": {"mediana_s": 2.0}, "c": {"mediana_s": 1.0}}
+    nuevos = {"a": {"mediana_s": 1.1}, "b": {"mediana_s": 3.0}, "d": {"mediana_s": 9.0}}
+    assert bench.comparar(nuevos, base, tolerancia=0.2) == {"a": (1.1, False), "b": (1.5, True)}
@@ -0,0 +1,56 @@
+from scripts.capturas_index import CapturasIndex
+
+
+class HojaFalsa:
+    """Worksheet mínimo: guarda filas y cuenta cuántas se leen."""
+    def __init__(self, filas):
+        self.filas = [["Fecha", "Métrica", "Valor", "Archivo"]] + filas
+        self.leidas = 0
+
+    def get(self, rango):
+        desde = int(rango.split(":")[0][1:])
+        out = self.filas[desde - 1:]
+        self.leidas += len(out)
+        return out
+
+    def append_rows(self, rows, **kw):
+        self.filas += rows
+        return {"updates": {"updatedRange": f"CAPTURAS!A{len(self.filas) - len(rows) + 1}:D{len(self.filas)}"}}
+
+
+def test_sync_incremental_y_filtrado(tmp_path):
+    hoja = HojaFalsa([["2024-01-01", "Peso (kg)", "81.9", "a.jpg"]] +
+                     [["2024-01-0%d" % i, "IMC", "26.10", "b.jpg"] for i in range(2, 9)])
+    idx = CapturasIndex(tmp_path / "i.sqlite")
+    assert idx.sync(hoja) == 8
+
+    rows = [["2024-01-01", "Peso (kg)", "81.90", "a.jpg"],   # duplicado (81.9 == 81.90)
+            ["2024-01-09", "IMC", "26.00", "c.jpg"]]
+    nuevos = idx.filtrar_nuevos(rows)
+    assert nuevos == [rows[1]]
+    idx.registrar(nuevos, hoja.append_rows(nuevos))
+
+    hoja.leidas = 0
+    hoja.filas.append(["2024-01-10", "IMC", "25.90", "d.jpg"])   # escrita por otro
+    assert idx.sync(hoja) == 1
+    assert hoja.leidas == 2            # fila marca + la nueva, no toda la hoja
+    assert idx.filtrar_nuevos([["2024-01-10", "IMC", "25.9", "d.jpg"]]) == []
+
+def test_hoja_editada_reconstruye(tmp_path):
+    hoja = HojaFalsa([["2024-01-01", "IMC", "26.10", "a.jpg"], ["2024-01-02", "IMC", "26.20", "b.jpg"]])
+    idx = CapturasIndex(tmp_path / "i.sqlite")
+    idx.sync(hoja)
+    del hoja.filas[2]                   # alguien borró la última fila
+    idx.sync(hoja)
+    assert idx.filtrar_nuevos([["2024-01-02", "IMC", "26.20", "b.jpg"]]) != []
+    assert idx.ultima_fila == 2
+
+def test_posiciones_con_filas_repetidas_y_correccion(tmp_path):
+    hoja = HojaFalsa([["2024-01-01", "IMC", "26.10", "a.jpg"], ["2024-01-02", "IMC", "26.20", "b.jpg"],
+                      ["2024-01-01", "IMC", "26.00", "a.jpg"]])      # corrección vieja, agregada al final
+    idx = CapturasIndex(tmp_path / "i.sqlite")
+    idx.sync(hoja)
+    fila = ["2024-01-01", "IMC", "25.90", "a.jpg"]
+    assert idx.posiciones([fila]) == {("2024-01-01", "IMC", "a.jpg"): 4}
+    idx.corregir([(4, fila)])
+    assert idx.valores([fila]) == {("2024-01-01", "IMC", "a.jpg"): {"25.90"}}
@@ -0,0 +1,87 @@
+import os
+from pathlib import Path
+from scripts.event_queue import CoalescingQueue
+
+
+class Reloj:
+    def __init__(self): self.t = 0.0
+    def __call__(self): return self.t
+
+
+def _cola(despachados, reloj, completo=None):
+    return CoalescingQueue(
+        clasificar=lambda p: ('X', p.stem.split('_')[0]),
+        despachar=lambda k, key, paths: despachados.append((key, [p.name for p in paths])),
+        completo=completo,
+        quiet=2.0, clock=reloj,
+    )
+
+def test_rafaga_de_eventos_se_despacha_una_vez(tmp_path):
+    reloj, desp = Reloj(), []
+    q = _cola(desp, reloj)
+    f = tmp_path / "20240101_a.jpg"
+    f.write_bytes(b"abc")
+    for _ in range(10):          # CREATED + varios MODIFIED
+        q.notify(f)
+    q.tick()
+    assert desp == []            # aún no estable
+    reloj.t = 3.0
+    q.tick()
+    assert desp == [("20240101", ["20240101_a.jpg"])]
+    q.notify(f)                  # evento tardío del mismo archivo sin cambios
+    reloj.t = 6.0; q.tick(); reloj.t = 9.0; q.tick()
+    assert len(desp) == 1
+
+def test_espera_a_que_el_archivo_deje_de_crecer(tmp_path):
+    reloj, desp = Reloj(), []
+    q = _cola(desp, reloj)
+    f = tmp_path / "20240101_a.jpg"
+    f.write_bytes(b"a")
+    q.notify(f); q.tick()
+    reloj.t = 1.5
+    f.write_bytes(b"abcd")       # sigue copiándose
+    q.tick()
+    reloj.t = 3.0; q.tick()
+    assert desp == []
+    reloj.t = 4.0; q.tick()
+    assert len(desp) == 1
+
+def test_grupo_incompleto_espera_y_archivo_borrado_se_olvida(tmp_path):
+    reloj, desp = Reloj(), []
+    q = _cola(desp, reloj, completo=lambda k, key, paths: len(paths) >= 2)
+    a, b, c = (tmp_path / n for n in ("d1_a.png", "d1_b.png", "d2_a.png"))
+    for f in (a, c):
+        f.write_bytes(b"x")
+        q.notify(f)
+    q.tick(); reloj.t = 5.0; q.tick()
+    assert desp == []
+    os.remove(c)
+    b.write_bytes(b"y"); q.notify(b)
+    q.tick(); reloj.t = 10.0; q.tick()
+    assert desp == [("d1", ["d1_a.png", "d1_b.png"])]
+    assert len(q) == 0
+
+def test_grupo_fallido_se_reintenta_tras_olvidar(tmp_path):
+    reloj, desp = Reloj(), []
+    q = _cola(desp, reloj)
+    f = tmp_path / "20240101_a.jpg"
+    f.write_bytes(b"abc")
+    q.notify(f); q.tick(); reloj.t = 3.0; q.tick()
+    assert len(desp) == 1
+    q.notify(f); reloj.t = 6.0; q.tick(); reloj.t = 9.0; q.tick()
+    assert len(desp) == 1        # sin cambios y ya despachado
+    q.olvidar('X', "20240101")   # el trabajo falló: los archivos siguen ahí, sin cambios
+    q.notify(f); reloj.t = 12.0; q.tick(); reloj.t = 15.0; q.tick()
+    assert len(desp) == 2
+
+def test_reintentar_vuelve_a_despachar_sin_nuevos_eventos(tmp_path):
+    reloj, desp = Reloj(), []
+    q = _cola(desp, reloj)
+    f = tmp_path / "20240101_a.jpg"
+    f.write_bytes(b"abc")
+    q.notify(f); q.tick(); reloj.t = 3.0; q.tick()
+    q.reintentar('X', "20240101", [f, tmp_path / "20240101_borrado.jpg"], espera=10.0)
+    reloj.t = 12.0; q.tick()
+    assert len(desp) == 1        # todavía dentro de espera + quiet
+    reloj.t = 15.5; q.tick()
+    assert desp[-1] == ("20240101", ["20240101_a.jpg"]) and len(desp) == 2
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import scripts.ingesta as ingesta
+
+
+def _servicio(ex, extraer, registro, **kw):
+    return ingesta.ServicioIngesta(
+        ex, extraer=extraer,
+        subir=lambda ref, datos: registro.append(("subir", ref.split("/")[-1])),
+        mover=lambda kind, paths: registro.append(("mover", kind, len(paths))),
+        vaciar=lambda: registro.append(("vaciar",)) or True,
+        quiet=0.0, poll=0.01, drenaje=10, **kw)
+
+async def _esperar(cond, timeout=5.0):
+    async def bucle():
+        while not cond():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(bucle(), timeout)
+
+def _archivos(tmp_path, carpeta, nombres):
+    d = tmp_path / carpeta
+    d.mkdir()
+    for n in nombres:
+        (d / n).write_bytes(b"x")
+    return d
+
+def test_un_equipo_lento_no_frena_a_los_demas_y_se_drena_al_salir(tmp_path):
+    amazfit = _archivos(tmp_path, "amazfit", [f"IMG_2024010{i}_0800.jpg" for i in range(1, 6)])
+    starfit = _archivos(tmp_path, "starfit", ["IMG_20240105_0800.jpg", "IMG_20240105_0801.jpg"])
+    liberar, registro, corriendo = threading.Event(), [], []
+
+    def extraer(kind, *args):
+        if kind == "AMAZFIT":
+            corriendo.append(args[0])
+            liberar.wait(5)
+        return [("Peso (kg)", 80.0)], 0.0, {}
+
+    async def escenario():
+        with ThreadPoolExecutor(4) as ex:
+            srv = _servicio(ex, extraer, registro, cola_por_equipo=1, por_equipo=1)
+            tarea = asyncio.create_task(srv.run([amazfit, starfit], observar=False))
+            # StarFit se procesa aunque Amazfit está trabado con su cola llena
+            await _esperar(lambda: ("mover", "STARFIT", 2) in registro
+                           and srv.colas["AMAZFIT"].qsize() == 1)
+            await asyncio.sleep(0.05)                   # varios tick más sin lugar en la cola
+            assert len(corriendo) == 1 and srv.colas["AMAZFIT"].qsize() == 1
+            assert len(srv.coalescer) == 3              # el resto espera sin despacharse
+            srv.detener()
+            await asyncio.sleep(0.05)
+            liberar.set()
+            await tarea
+            return srv
+
+    srv = asyncio.run(escenario())
+    # al salir se terminaron el trabajo en curso y el encolado, no los sin despachar
+    assert srv.procesados == 3
+    assert registro.count(("mover", "AMAZFIT", 1)) == 2
+    assert registro[-1] == ("vaciar",)
+
+def test_error_de_extraccion_no_mueve_ni_corta_el_servicio(tmp_path):
+    lab = _archivos(tmp_path, "laboratorio", ["malo.pdf", "bueno.pdf"])
+    registro = []
+
+    def extraer(kind, ruta):
+        if ruta.endswith("malo.pdf"):
+            raise RuntimeError("PDF ilegible")
+        return [("Glucosa (mg/dL)", 90.0)], 0.0, {}
+
+    async def escenario():
+        with ThreadPoolExecutor(2) as ex:
+            srv = _servicio(ex, extraer, registro)
+            tarea = asyncio.create_task(srv.run([lab], observar=False))
+            await _esperar(lambda: ("mover", "LABORATORIO", 1) in registro)
+            srv.detener()
+            await tarea
+
+    asyncio.run(escenario())
+    assert ("subir", "bueno.pdf") in registro and ("subir", "malo.pdf") not in registro
+    assert registro.count(("mover", "LABORATORIO", 1)) == 1
+
+def test_grupo_fallido_se_reintenta(tmp_path):
+    lab = _archivos(tmp_path, "laboratorio", ["informe.pdf"])
+    registro, intentos = [], []
+
+    def extraer(kind, ruta):
+        intentos.append(ruta)
+        if len(intentos) == 1:
+            raise RuntimeError("Tesseract ocupado")
+        return [("Glucosa (mg/dL)", 90.0)], 0.0, {}
+
+    async def escenario():
+        with ThreadPoolExecutor(2) as ex:
+            srv = _servicio(ex, extraer, registro)
+            tarea = asyncio.create_task(srv.run([lab], observar=False))
+            await _esperar(lambda: len(intentos) == 1 and not srv._en_curso)
+            srv.notify_threadsafe(lab / "informe.pdf")   # p.ej. Drive vuelve a tocar el archivo
+            await _esperar(lambda: ("mover", "LABORATORIO", 1) in registro)
+            srv.detener()
+            await tarea
+
+    asyncio.run(escenario())
+    assert len(intentos) == 2
+
+def test_observa_incoming_con_watchdog(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingesta.carpetas, "INCOMING", tmp_path)
+    lab = _archivos(tmp_path, "laboratorio", [])
+    registro = []
+
+    async def escenario():
+        with ThreadPoolExecutor(2) as ex:
+            srv = _servicio(ex, lambda kind, ruta: ([("Glucosa (mg/dL)", 90.0)], 0.0, {}), registro)
+            tarea = asyncio.create_task(srv.run([lab]))
+            await _esperar(lambda: srv._loop is not None)
+            await asyncio.sleep(0.2)                    # que el Observer quede armado
+            (lab / "nuevo.pdf").write_bytes(b"x")
+            await _esperar(lambda: ("mover", "LABORATORIO", 1) in registro)
+            srv.detener()
+            await tarea
+
+    asyncio.run(escenario())
+    assert ("subir", "nuevo.pdf") in registro
@@ -0,0 +1,71 @@
+import json
+import time
+import scripts.instrumentacion as ins
+import scripts.ocr_pool as ocr_pool
+
+
+def test_etapas_contadores_y_fusion_entre_procesos():
+    worker, principal = ins.Registro(), ins.Registro()
+
+    @worker.etapa("hrv")
+    def calcular():
+        time.sleep(0.01)
+
+    calcular()
+    with worker.etapa("ocr"):
+        pass
+    worker.contar("cache_ocr_aciertos", 3)
+    worker.contar("cache_ocr_fallos")
+
+    principal.fusionar(worker.tomar())
+    principal.fusionar(worker.tomar())              # el worker quedó en cero
+    s = principal.snapshot()
+    assert s["etapas"]["hrv"]["n"] == 1 and s["etapas"]["hrv"]["segundos"] >= 0.01
+    assert s["contadores"] == {"cache_ocr_aciertos": 3, "cache_ocr_fallos": 1}
+
+    texto = principal.prometheus()
+    assert 'jcpsalud_etapa_segundos_count{etapa="hrv"} 1' in texto
+    assert 'jcpsalud_etapa_segundos_bucket{etapa="ocr",le="+Inf"} 1' in texto
+    assert "jcpsalud_cache_ocr_aciertos_total 3" in texto
+
+def test_stats_json_con_ventana_movil(tmp_path):
+    reg = ins.Registro()
+    esc = ins.EscritorStats(tmp_path / "stats.json", ventana=60, reg=reg,
+                            antes=lambda: reg.nivel("cola_eventos", 2))
+    reg.registrar("upload", 1.0)
+    esc.escribir(ahora=1000)
+    reg.registrar("upload", 3.0)
+    reg.contar("cache_polar_aciertos")
+    esc.escribir(ahora=1030)
+    reg.registrar("upload", 5.0)
+    doc = esc.escribir(ahora=1100)                  # la foto de t=1000 salió de la ventana
+    assert doc == json.loads((tmp_path / "stats.json").read_text(encoding="utf-8"))
+    assert doc["total"]["etapas"]["upload"] == {"n": 3, "segundos": 9.0, "medio_ms": 3000.0, "max_ms": 5000.0}
+    assert doc["ventana_s"] == 70
+    assert doc["ventana"]["etapas"]["upload"] == {"n": 1, "segundos": 5.0, "medio_ms": 5000.0}
+    assert doc["total"]["caches"]["polar"] == {"aciertos": 1, "fallos": 0, "tasa": 1.0}
+    assert doc["niveles"] == {"cola_eventos": 2}
+
+def test_run_job_devuelve_instrumentacion_y_perfila(tmp_path, monkeypatch):
+    reg = ocr_pool.instrumentacion
+    monkeypatch.setattr(reg, "PERFILES_DIR", tmp_path)
+
+    def job(x):
+        with reg.etapa("parse"):
+            return [x]
+
+    monkeypatch.setitem(ocr_pool.JOBS, "PRUEBA", job)
+    reg.tomar()
+    res, secs, delta = ocr_pool._run_job("PRUEBA", 7, perfilar=True)
+    assert res == [7] and secs >= 0
+    assert delta["etapas"]["parse"]["n"] == 1
+    assert len(list(tmp_path.glob("PRUEBA_*.prof"))) == 1
+
+def test_perfilar_lista_o_texto_separado_por_comas(monkeypatch):
+    monkeypatch.delenv("JCPSALUD_PERFILAR", raising=False)
+    monkeypatch.setitem(ins.cfg, "PERFILAR", "STARFIT, polar")
+    assert ins.perfilar("starfit") and ins.perfilar("POLAR") and not ins.perfilar("AMAZFIT")
+    monkeypatch.setitem(ins.cfg, "PERFILAR", ["AMAZFIT"])
+    assert ins.perfilar("amazfit") and not ins.perfilar("S")
+    monkeypatch.setenv("JCPSALUD_PERFILAR", "*")
+    assert ins.perfilar("LABORATORIO")
@@ -0,0 +1,52 @@
+import pytest
+import scripts.laboratorio_ocr as lab
+
+
+def test_analitos_canon_y_unidades():
+    renglones = [
+        ("Protocolo 48213  Fecha 12/03/2024", None),
+        ("Glucosa ......... 5,2 mmol/L 3,9 - 6,1", None),
+        ("Colesterol HDL 52 mg/dL > 40", None),
+        ("25 OH Vitamina D 32 ng/mL 30 - 100", None),
+        ("Plaquetas 250.000 /mm3", None),
+        ("Hemoglobina corpuscular media 29 pg", None),
+        ("Creatinina 0.9 mmol/L", None),
+        ("Glucosa 99 mg/dL", None),                  # repetida: gana la primera
+        ("Trigliceridos 150 mg/dl", 30.0),           # OCR con poca confianza
+    ]
+    assert [tuple(a[:3]) for a in lab.analitos(renglones)] == [
+        ("Glucosa (mg/dL)", 93.68, "mg/dL"),
+        ("HDL (mg/dL)", 52.0, "mg/dL"),
+        ("Vitamina D (ng/mL)", 32.0, "ng/mL"),
+        ("Plaquetas (10^3/uL)", 250.0, "10^3/uL"),
+        ("HCM (pg)", 29.0, "pg"),
+        ("Creatinina (mmol/L)", 0.9, "mmol/L"),      # sin factor conocido: serie aparte
+    ]
+
+def test_pdf_capa_de_texto_y_ocr_solo_en_escaneadas(tmp_path, monkeypatch):
+    pymupdf = pytest.importorskip("pymupdf")
+    doc = pymupdf.open()
+    p = doc.new_page()
+    p.insert_text((50, 60), "Laboratorio Central - Informe de resultados")
+    for y, (lbl, val, uni) in enumerate([("Colesterol total", "195", "mg/dL"), ("HbA1c", "5.4", "%")]):
+        # columnas escritas por separado, como en muchos PDFs de laboratorio
+        p.insert_text((320, 100 + 20 * y), uni)
+        p.insert_text((50, 100 + 20 * y), lbl)
+        p.insert_text((250, 100 + 20 * y), val)
+    doc.new_page()                                   # página escaneada (sin texto)
+    ruta = tmp_path / "informe.pdf"
+    doc.save(str(ruta))
+
+    llamadas = []
+    def ocr(g):
+        llamadas.append(g.shape)
+        return [("Ferritina 80 ng/mL", 92.0)]
+    monkeypatch.setattr(lab, "_ocr_gris", ocr)
+
+    datos = lab.extraer(ruta, workers=1)
+    assert [tuple(a[:3]) for a in datos] == [
+        ("Colesterol Total (mg/dL)", 195.0, "mg/dL"),
+        ("Hemoglobina Glicosilada (%)", 5.4, "%"),
+        ("Ferritina (ng/mL)", 80.0, "ng/mL"),
+    ]
+    assert len(llamadas) == 1                        # sólo la página sin capa de texto
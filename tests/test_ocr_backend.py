@@ -0,0 +1,40 @@
+import scripts.ocr_backend as ob
+
+
+def test_parse_config():
+    oem, psm, variables = ob.parse_config("--oem 1 --psm 7 -c tessedit_char_whitelist=0123456789.,%kgcal")
+    assert (oem, psm) == (1, 7)
+    assert variables == {"tessedit_char_whitelist": "0123456789.,%kgcal"}
+    assert ob.parse_config("") == (3, 3, {})
+
+def test_parse_tsv_formato_pytesseract():
+    tsv = ("1\t1\t0\t0\t0\t0\t0\t0\t100\t50\t-1\t\n"
+           "5\t1\t1\t1\t1\t1\t10\t20\t30\t12\t91.5\t81.9\n"
+           "5\t1\t1\t1\t1\t2\t45\t20\t20\t12\t88\tkg\n")
+    d = ob.parse_tsv(tsv)
+    assert d["text"] == ["", "81.9", "kg"]
+    assert d["conf"] == [-1.0, 91.5, 88.0]
+    assert d["left"][1:] == [10, 45] and d["line_num"][1:] == [1, 1]
+
+def test_fallback_a_pytesseract_sin_tesserocr(monkeypatch):
+    import builtins
+    real_import = builtins.__import__
+
+    def sin_tesserocr(name, *a, **k):
+        if name == "tesserocr":
+            raise ImportError(name)
+        return real_import(name, *a, **k)
+
+    monkeypatch.setattr(builtins, "__import__", sin_tesserocr)
+    assert ob.crear("tesserocr").nombre == "pytesseract"
+    assert ob.crear("auto").nombre == "pytesseract"
+
+def test_precarga_fallida_cae_a_pytesseract(monkeypatch):
+    class Roto:
+        nombre = "tesserocr"
+        def precargar(self, lang, oem=3):
+            raise RuntimeError("Failed to init API, possibly an invalid tessdata path")
+
+    ob.set_backend(Roto())
+    ob.precargar("spa+eng")
+    assert ob.get().nombre == "pytesseract"
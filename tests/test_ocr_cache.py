@@ -0,0 +1,52 @@
+from scripts.ocr_cache import OCRCache, cacheado
+
+
+def test_misma_imagen_con_otro_nombre_no_repite_ocr(tmp_path):
+    llamadas = []
+
+    @cacheado("prueba", "1")
+    def extraer(img):
+        llamadas.append(img)
+        return [("Peso (kg)", 81.9)]
+
+    a = tmp_path / "20240101_a.jpg"
+    b = tmp_path / "copia (1).jpg"
+    a.write_bytes(b"misma captura")
+    b.write_bytes(b"misma captura")
+    assert extraer(a) == [("Peso (kg)", 81.9)]
+    assert extraer(b) == [("Peso (kg)", 81.9)]
+    assert len(llamadas) == 1
+
+def test_lru_expulsa_lo_menos_usado(tmp_path):
+    c = OCRCache(tmp_path / "c.sqlite", max_bytes=40)
+    c.put("a", [("M", 1.0)])
+    c.put("b", [("M", 2.0)])
+    c.get("a")                       # "a" pasa a ser la más reciente
+    c.put("c", [("M", 3.0)])
+    assert c.get("b") is None
+    assert c.get("a") == [("M", 1.0)]
+    assert c.get("c") == [("M", 3.0)]
+
+def test_clave_incluye_el_backend_ocr(tmp_path):
+    import ocr_backend
+    llamadas = []
+
+    @cacheado("prueba", "1")
+    def extraer(img):
+        llamadas.append(ocr_backend.get().nombre)
+        return [("Peso (kg)", 81.9)]
+
+    class Tesserocr:
+        nombre = "tesserocr"
+
+    a = tmp_path / "20240101_a.jpg"
+    a.write_bytes(b"captura")
+    ocr_backend.set_backend(None)    # el del entorno de tests: pytesseract
+    extraer(a)
+    ocr_backend.set_backend(Tesserocr())
+    try:
+        extraer(a)
+        extraer(a)
+    finally:
+        ocr_backend.set_backend(None)
+    assert llamadas == ["pytesseract", "tesserocr"]
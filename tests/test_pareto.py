@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scripts.pareto as pareto
+from scripts.metricas_store import MetricStore
+
+
+def _llenar(store, dias, inicio="2024-01-01", semilla=0):
+    rng = np.random.default_rng(semilla)
+    filas = []
+    for i, f in enumerate(pd.date_range(inicio, periods=dias).strftime("%Y-%m-%d")):
+        peso = 85 - 0.02 * i + rng.normal(0, 0.2)
+        filas += [(f, "Peso (kg)", peso, f"{f}.jpg", None, None),
+                  (f, "Grasa Corporal (%)", 16 + rng.normal(0, 0.2), f"{f}.jpg", None, None),
+                  (f, "AMAZFIT_KCAL_COMIDO", 2600 + 100 * (peso - 84) + rng.normal(0, 20), f"{f}.png", None, None),
+                  (f, "Agua Corporal (%)", 55 + rng.normal(0, 0.5), f"{f}.jpg", None, None)]
+    store.guardar(filas)
+
+def test_brechas_con_objetivo():
+    m = pd.DataFrame({"Peso (kg)": [80.0, 74.0], "POLAR_HRV_RMSSD": [30.0, 50.0]},
+                     index=pd.date_range("2024-01-01", periods=2))
+    g = pareto.brechas(m)
+    assert g["Peso (kg)"].tolist() == [1.0, 0.0]          # (80-75)/5; debajo del objetivo no cuenta
+    assert g["POLAR_HRV_RMSSD"].tolist() == [1.0, 0.0]    # "subir"
+
+def test_pareto_prioriza_peso_e_incremental_igual_a_completo(tmp_path):
+    store = MetricStore(tmp_path / "m.sqlite")
+    _llenar(store, 200)
+    contrib = pareto.actualizar(store, cache_dir=tmp_path / "p")
+    sel = pareto.pareto(contrib)
+    assert sel.index[0] == "Peso (kg)"
+    assert sel["acumulado"].iloc[-1] >= 0.8
+    assert "Agua Corporal (%)" not in sel.index        # ruido sin relación con el desvío
+
+    # un día nuevo + una corrección vieja: recalcula sólo desde la primera fecha tocada
+    store.guardar([("2024-07-19", "Peso (kg)", 82.0, "x.jpg", None, None),
+                   ("2024-05-01", "Peso (kg)", 90.0, "2024-05-01.jpg", None, None)])
+    inc = pareto.actualizar(store, cache_dir=tmp_path / "p")
+    full = pareto.actualizar(store, completo=True, cache_dir=tmp_path / "q")
+    pd.testing.assert_frame_equal(inc, full, check_freq=False)
+
+def test_fecha_fuera_del_indice(monkeypatch, capsys):
+    contrib = pd.DataFrame({"Peso (kg)": [1.0, 2.0]}, index=pd.date_range("2024-01-01", periods=2))
+    assert list(pareto.pareto(contrib, "2024-01-01").index) == ["Peso (kg)"]
+    with pytest.raises(ValueError, match="2024-01-01 al 2024-01-02"):
+        pareto.pareto(contrib, "2023-12-31")
+    monkeypatch.setattr(pareto, "actualizar", lambda completo=False: contrib)
+    with pytest.raises(SystemExit):
+        pareto.main(["--fecha", "2024-13-40"])
+    assert "fecha inválida" in capsys.readouterr().err
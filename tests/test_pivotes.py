@@ -0,0 +1,57 @@
+import pytest
+import scripts.pivotes as pv
+from scripts.metricas_store import MetricStore
+
+
+@pytest.fixture
+def ss(monkeypatch):
+    ss = pv.sheets_client.FakeSpreadsheet()
+    pv.sheets_client.set_backend(ss)
+    llamadas = []
+    original = ss.values_batch_update
+    monkeypatch.setattr(ss, "values_batch_update", lambda body: (llamadas.append(body), original(body))[1])
+    ss.llamadas = llamadas
+    yield ss
+    pv.sheets_client.reset()
+
+def test_abreviar():
+    assert pv.abreviar("Grasa Corporal (%)") == "Grasa Corp. (%)"
+    assert pv.abreviar("POLAR_HRV_RMSSD") == "RMSSD"
+    assert pv._col(0) == "A" and pv._col(27) == "AB"
+
+def test_encabezados_sin_colisiones():
+    assert pv.encabezados(["AMAZFIT_HR_MAX", "POLAR_HR_MAX", "Peso (kg)", "POLAR_HR MAX"]) == [
+        "HR MAX", "HR MAX #2", "Peso (kg)", "HR MAX #3"]
+
+def test_incremental_escribe_solo_celdas_cambiadas(ss, tmp_path):
+    store = MetricStore(tmp_path / "m.sqlite")
+    store.guardar([("2024-01-01", "Peso (kg)", 82.0, "a.jpg", None, None),
+                   ("2024-01-01", "Proteina (%)", 17.0, "a.jpg", None, None),
+                   ("2024-01-02", "Peso (kg)", 81.8, "b.jpg", None, None)])
+    pv.actualizar(store, cache_dir=tmp_path / "piv")
+    assert ss.worksheet("PIVOT_IA").get_all_values() == [
+        ["Fecha", "Peso (kg)"], ["2024-01-01", "82.00"], ["2024-01-02", "81.80"]]
+    assert ss.worksheet("PIVOT_SEC").get_all_values()[1] == ["2024-01-01", "17.00"]
+
+    # corrección de un valor + un día nuevo: un solo batch, sólo esas celdas
+    store.guardar([("2024-01-02", "Peso (kg)", 81.6, "b.jpg", None, None),
+                   ("2024-01-03", "Peso (kg)", 81.5, "c.jpg", None, None)])
+    ss.llamadas.clear()
+    assert pv.actualizar(store, cache_dir=tmp_path / "piv") == 3
+    assert len(ss.llamadas) == 1
+    assert [d["range"] for d in ss.llamadas[0]["data"]] == ["'PIVOT_IA'!B3:B3", "'PIVOT_IA'!A4:B4"]
+
+    # sin cambios en el store: no se escribe nada
+    ss.llamadas.clear()
+    assert pv.actualizar(store, cache_dir=tmp_path / "piv") == 0
+    assert ss.llamadas == []
+
+    # la reconstrucción completa coincide con lo publicado incrementalmente
+    assert pv.actualizar(store, completo=True, cache_dir=tmp_path / "piv2") == 0
+
+def test_ancha_desempata_por_archivo_sin_depender_del_orden():
+    largo = pv.pd.DataFrame([("2024-01-01", "Peso (kg)", 82.0, "a.jpg", 0),
+                             ("2024-01-01", "Peso (kg)", 81.0, "b.jpg", 0)],
+                            columns=["fecha", "metrica", "valor", "archivo", "cambio"])
+    assert pv.ancha(largo).loc["2024-01-01", "Peso (kg)"] == 81.0
+    assert pv.ancha(largo.iloc[::-1]).loc["2024-01-01", "Peso (kg)"] == 81.0
@@ -0,0 +1,49 @@
+import pytest
+import scripts.polar_batch as pb
+from benchmarks import fixtures
+
+
+@pytest.fixture
+def noche(tmp_path):
+    fixtures.noche_polar(tmp_path / "noches", horas=0.5, acc_hz=10)
+    return pb.agrupar_noches([tmp_path / "noches"])
+
+def test_clave_depende_de_archivos_y_metodo(noche):
+    (base, files), = noche.items()
+    clave = pb.clave_noche(files, "welch")
+    assert pb.clave_noche(files, "welch") == clave
+    assert pb.clave_noche(files, "lomb") != clave
+    assert pb.clave_noche(files, "welch", serie=True) != clave
+    with open(files['HR'], "a") as fh:
+        fh.write("\n")
+    assert pb.clave_noche(files, "welch") != clave
+
+def test_cache_aciertos_y_recalculo(noche, tmp_path, monkeypatch):
+    cache = tmp_path / "cache"
+    (base, files), = noche.items()
+    primera = pb.procesar_noches(noche, workers=1, cache_dir=cache, metodo="welch")
+    lomb = pb.procesar_noches(noche, workers=1, cache_dir=cache, metodo="lomb")
+    assert len(list(cache.glob("*.npz"))) == 2
+
+    # con la caché al día no se abre el pool
+    class SinPool:
+        def __init__(self, *a, **kw):
+            raise AssertionError("no debería recalcular")
+    monkeypatch.setattr(pb, "ProcessPoolExecutor", SinPool)
+    assert pb.procesar_noches(noche, cache_dir=cache, metodo="welch") == primera
+    assert pb.procesar_noches(noche, cache_dir=cache, metodo="lomb") == lomb
+    monkeypatch.undo()
+
+    # cambian los datos: se recalcula sólo ese método y su entrada vieja se borra
+    with open(files['HR'], "a") as fh:
+        fh.write("\n")
+    assert pb.procesar_noches(noche, workers=1, cache_dir=cache, metodo="welch") == primera
+    nombres = sorted(p.name for p in cache.glob("*.npz"))
+    assert len(nombres) == 2
+    assert [n.split("-")[0] for n in nombres] == [f"{base}_lomb", f"{base}_welch"]
+
+def test_error_informa_la_noche(noche, tmp_path, capsys):
+    (base, files), = noche.items()
+    files['RR'].write_text("basura\n")
+    assert pb.procesar_noches(noche, workers=1, cache_dir=tmp_path / "cache") == {}
+    assert f"❌ Error en noche {base}:" in capsys.readouterr().out
@@ -0,0 +1,122 @@
+import pytest
+import numpy as np
+import scripts.polar_hrv_analyzer as polar
+
+
+def _acc(n, movimiento=()):
+    std = np.full(n, 5.0, dtype=np.float32)
+    for a, b in movimiento:
+        std[a:b] = 200.0
+    return polar.AccVentanas(np.arange(n, dtype=np.float32),
+                             np.full(n, 1000.0, dtype=np.float32), std,
+                             np.full(n, 50, dtype=np.int64))
+
+def test_reposo_alineado_por_tiempo_y_no_por_indice():
+    # 1 h a 60 lpm con movimiento entre los segundos 1000 y 1300
+    rr = np.full(3600, 1000.0)
+    rep = polar.segmentar_reposo(rr, _acc(3700, [(1000, 1300)]))
+    assert not rep.mask[1000:1300].any()
+    assert rep.mask[:900].all() and rep.mask[1400:].all()
+    assert len(rep.segmentos) == 2
+
+def test_desfase_entre_archivos():
+    # ACC empezó 600 s antes que RR: el movimiento en ACC 1000-1300 cae en latidos 400-700
+    rr = np.full(1800, 1000.0)
+    rep = polar.segmentar_reposo(rr, _acc(2500, [(1000, 1300)]), offset_s=600)
+    assert not rep.mask[400:700].any()
+    assert rep.mask[:300].all()
+
+def test_artefactos_y_ectopicos_se_descartan():
+    rr = np.full(600, 900.0)
+    rr[[50, 51, 300]] = [250.0, 1500.0, 2500.0]
+    rep = polar.segmentar_reposo(rr, _acc(700))
+    assert set(np.flatnonzero(rep.artefacto)) == {50, 51, 300}
+    assert rep.mask.sum() == 597
+
+def test_serie_coincide_con_calculo_escalar_por_ventana():
+    rng = np.random.default_rng(0)
+    rr = 1000 + 50 * np.sin(np.arange(6000) / 5) + rng.normal(0, 20, 6000)
+    serie = polar.calcular_serie(rr, ventana_s=300, paso_s=60)
+    t = (np.cumsum(rr) - rr[0]) / 1000.0
+    for i in (0, 7, len(serie.t) - 1):
+        sel = (t >= serie.t[i]) & (t < serie.t[i] + 300)
+        rmssd, sdnn, _ = polar.calcular_hrv(rr[sel])
+        assert np.isclose(serie.rmssd[i], rmssd, rtol=1e-4)
+        assert np.isclose(serie.sdnn[i], sdnn, rtol=1e-4)
+    assert np.all(serie.hf > 0) and np.all(np.isfinite(serie.lf_hf))
+    assert polar.serie_a_datos(serie, cada_s=1800)[0][0] == "POLAR_SERIE_RMSSD@0000min"
+
+def _rr_sintetico(segundos, semilla=0):
+    """RR con potencia conocida: 30 ms a 0.1 Hz (LF) y 40 ms a 0.25 Hz (HF) en el tiempo."""
+    rng = np.random.default_rng(semilla)
+    rr, t = [], 0.0
+    while t < segundos:
+        r = 1000 + 30 * np.sin(2 * np.pi * 0.1 * t) + 40 * np.sin(2 * np.pi * 0.25 * t) + rng.normal(0, 5)
+        rr.append(r)
+        t += r / 1000.0
+    return np.array(rr)
+
+def test_metodos_espectrales_contra_welch_cubico():
+    rr = _rr_sintetico(1800)
+    lf0, hf0, ratio0 = polar.calcular_frecuencia(rr, "welch")
+    assert np.isclose(lf0, 0.03 ** 2 / 2, rtol=0.3) and np.isclose(hf0, 0.04 ** 2 / 2, rtol=0.3)
+    lf, hf, ratio = polar.calcular_frecuencia(rr, "lomb")
+    assert np.isclose(lf, lf0, rtol=0.1) and np.isclose(hf, hf0, rtol=0.1)
+    # los remuestreos lineal / PCHIP suavizan y subestiman HF, pero quedan en el orden
+    for metodo in ("welch_lineal", "welch_pchip"):
+        lf, hf, _ = polar.calcular_frecuencia(rr, metodo)
+        assert np.isclose(lf, lf0, rtol=0.1) and 0.5 * hf0 < hf < hf0, metodo
+
+def test_bandas_por_lote_igual_que_de_a_una(monkeypatch):
+    noches = [_rr_sintetico(s, semilla=s) for s in (900, 1500, 1500)]
+    for metodo in ("welch", "lomb"):
+        lote = np.column_stack(polar.calcular_bandas(noches, metodo))
+        solas = np.array([polar.calcular_frecuencia(rr, metodo) for rr in noches])
+        assert np.allclose(lote, solas, rtol=1e-9), metodo
+    monkeypatch.setenv("JCPSALUD_HRV_ESPECTRO", "lomb")
+    assert polar.metodo_espectral() == "lomb"
+    with pytest.raises(ValueError):
+        polar.metodo_espectral("fft")
+
+def test_serie_lomb_sin_interpolar():
+    rr = _rr_sintetico(3600)
+    lineal = polar.calcular_serie(rr, metodo="welch_lineal")
+    lomb = polar.calcular_serie(rr, metodo="lomb")
+    assert np.isfinite(lomb.lf).all() and np.array_equal(lomb.rmssd, lineal.rmssd)
+    assert np.isclose(np.median(lomb.lf / lineal.lf), 1, rtol=0.2)
+
+def test_serie_vacia_o_corta():
+    vacia = polar.calcular_serie([])
+    assert len(vacia.t) == 0 and polar.serie_a_datos(vacia) == []
+    corta = polar.calcular_serie(np.full(5, 1000.0))
+    assert np.isnan(corta.rmssd).all() and polar.serie_a_datos(corta) == []
+
+def test_analizar_noche_con_serie(tmp_path):
+    from benchmarks import fixtures
+    files = fixtures.noche_polar(tmp_path, horas=1.0, acc_hz=10)
+    data = polar.analizar_noche(files['RR'], files['ACC'], files['HR'], serie=True)
+    serie = [(m, v) for _, m, v in data if m.startswith("POLAR_SERIE_")]
+    assert {m for m, _ in serie} >= {"POLAR_SERIE_RMSSD@0000min", "POLAR_SERIE_RMSSD@0030min"}
+    assert all(np.isfinite(v) for _, v in serie)
+    assert len(data) == len(polar.analizar_noche(files['RR'], files['ACC'], files['HR'])) + len(serie)
+
+def test_acc_crudo_usa_su_frecuencia_de_muestreo():
+    # 25 Hz crudo con movimiento entre 1000 y 1300 s: mismo resultado que por ventanas
+    rng = np.random.default_rng(1)
+    mag = (1000 + rng.normal(0, 5, 3700 * 25)).astype(np.float32)
+    mag[1000 * 25:1300 * 25] += rng.normal(0, 200, 300 * 25).astype(np.float32)
+    rr = np.full(3600, 1000.0)
+    rep = polar.segmentar_reposo(rr, mag, acc_hz=25)
+    assert not rep.mask[1000:1300].any()
+    assert rep.mask[:900].all() and rep.mask[1400:].all()
+    with pytest.raises(ValueError):
+        polar.segmentar_reposo(rr, mag)
+
+def test_noche_sin_reposo_usa_la_noche_completa(tmp_path, monkeypatch):
+    from benchmarks import fixtures
+    files = fixtures.noche_polar(tmp_path, horas=0.5, acc_hz=10)
+    segmentar = polar.segmentar_reposo
+    monkeypatch.setattr(polar, "segmentar_reposo",
+                        lambda rr, acc, **kw: segmentar(rr, acc, segmento_min_s=1e9, **kw))
+    data = dict((m, v) for _, m, v in polar.analizar_noche(files['RR'], files['ACC']))
+    assert np.isfinite(data["POLAR_HRV_RMSSD"]) and np.isfinite(data["POLAR_HRV_TRIANGULAR_INDEX"])
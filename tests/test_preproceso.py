@@ -0,0 +1,41 @@
+import time
+import cv2
+import numpy as np
+import scripts.preproceso as pre
+
+
+def _png(tmp_path, nombre, ancho):
+    img = np.full((ancho * 2, ancho, 3), 240, np.uint8)
+    cv2.putText(img, "81.9 kg", (20, ancho // 2), cv2.FONT_HERSHEY_SIMPLEX, ancho / 400, (20, 20, 20), 2)
+    p = tmp_path / nombre
+    cv2.imwrite(str(p), img)
+    return p
+
+def test_preprocesar_escala_con_tope(tmp_path):
+    chica = pre.preprocesar(_png(tmp_path, "a.png", 540), "starfit")
+    grande = pre.preprocesar(_png(tmp_path, "b.png", 1440), "starfit")
+    assert chica.shape[1] == 1080                 # ×2
+    assert grande.shape[1] == 2160                # ×1.5, tope ancho_max
+    assert set(np.unique(grande)) <= {0, 255}
+
+def test_lote_en_orden_y_solapado():
+    def lento(r):
+        time.sleep(0.05)
+        return r * 10
+    t0 = time.perf_counter()
+    salida = []
+    for r, v in pre.preprocesar_lote(range(8), lento, hilos=4):
+        time.sleep(0.05)                          # "OCR" de la actual
+        salida.append((r, v))
+    assert salida == [(r, r * 10) for r in range(8)]
+    assert time.perf_counter() - t0 < 0.05 * 16 * 0.8
+
+def test_orden_historico_por_defecto_y_filtrar_antes_opcional(tmp_path, monkeypatch):
+    g = pre.leer_gris(_png(tmp_path, "a.png", 540))
+    bilateral = lambda x: cv2.bilateralFilter(x, 9, 75, 75)
+    x2 = lambda x: cv2.resize(x, None, fx=2.0, fy=2.0, interpolation=cv2.INTER_CUBIC)
+    otsu = lambda x: pre.POST["cierre"](
+        cv2.threshold(x, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1])
+    assert np.array_equal(pre.preprocesar_gris(g, "starfit"), otsu(bilateral(x2(g))))
+    monkeypatch.setitem(pre.cfg, 'OCR_PREPROCESO', {"starfit": {"filtrar_antes": True}})
+    assert np.array_equal(pre.preprocesar_gris(g, "starfit"), otsu(x2(bilateral(g))))
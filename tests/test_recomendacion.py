@@ -0,0 +1,87 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+import scripts.recomendacion as reco
+from scripts.metricas_store import MetricStore
+
+
+@pytest.fixture
+def ss(monkeypatch):
+    ss = reco.sheets_client.FakeSpreadsheet()
+    ss.worksheet("RECO_HISTORICO").append_row(["Fecha", "Recomendación", "Foco"])
+    reco.sheets_client.set_backend(ss)
+    llamadas = []
+    original = ss.values_batch_update
+    monkeypatch.setattr(ss, "values_batch_update", lambda body: (llamadas.append(body), original(body))[1])
+    ss.llamadas = llamadas
+    yield ss
+    reco.sheets_client.reset()
+
+def _store(tmp_path, dias=40):
+    store = MetricStore(tmp_path / "m.sqlite")
+    rng = np.random.default_rng(1)
+    filas = []
+    for i, f in enumerate(pd.date_range("2024-01-01", periods=dias).strftime("%Y-%m-%d")):
+        filas += [(f, "Peso (kg)", 85 + 0.05 * i, f"{f}.jpg", None, None),
+                  (f, "POLAR_HRV_RMSSD", 45 + rng.normal(0, 3), f"{f}_RR.txt", None, None)]
+    store.guardar(filas)
+    return store
+
+def test_una_llamada_y_estado_incremental(ss, tmp_path):
+    store = _store(tmp_path)
+    hoy = date(2024, 2, 9)
+    texto = reco.ejecutar(store, hoy, cache_dir=tmp_path / "r", pareto_dir=tmp_path / "p")
+    assert "subiendo" in texto and "Foco: Peso (kg)" in texto
+    assert len(ss.llamadas) == 1
+    assert ss.worksheet("ULTIMA_RECO").get("B2") == [[texto]]
+    assert ss.worksheet("RECO_HISTORICO").get_all_values()[1] == ["2024-02-09", texto, "Peso (kg)"]
+
+    # día siguiente: sólo la fila nueva; HRV muy baja → recuperación; histórico en la fila 3
+    store.guardar([("2024-02-10", "POLAR_HRV_RMSSD", 25.0, "x_RR.txt", None, None)])
+    estado = reco.cargar_estado(tmp_path / "r")
+    assert reco.actualizar_ventanas(estado, store, date(2024, 2, 10)) == 1
+    texto = reco.ejecutar(store, date(2024, 2, 10), cache_dir=tmp_path / "r", pareto_dir=tmp_path / "p")
+    assert "recuperación" in texto
+    assert len(ss.worksheet("RECO_HISTORICO").get_all_values()) == 3
+
+    # re-ejecutar el mismo día reescribe la misma fila
+    reco.ejecutar(store, date(2024, 2, 10), cache_dir=tmp_path / "r", pareto_dir=tmp_path / "p")
+    assert len(ss.worksheet("RECO_HISTORICO").get_all_values()) == 3
+
+def test_features_ventanas():
+    v = {"Peso (kg)": {f"2024-01-{d:02d}": 80.0 + d / 7 for d in range(1, 29)}}
+    f = reco.features(v, date(2024, 1, 28))["Peso (kg)"]
+    assert f["tendencia"] == pytest.approx(1.0)
+    assert f["media7"] == pytest.approx(np.mean([80 + d / 7 for d in range(22, 29)]))
+
+def test_linea_base_hrv_sin_el_dia_evaluado_ni_valores_no_positivos():
+    serie = {f"2024-01-{d:02d}": 45.0 + 10 * (d % 2) for d in range(1, 11)}
+    serie["2024-01-05"] = 0.0                     # lectura inválida: no entra al log
+    serie["2024-01-11"] = 25.0                    # el día evaluado no corre la base
+    base = np.log([v for v in serie.values() if 0 < v != 25.0])
+    f = reco.features({reco.HRV: serie}, date(2024, 1, 11))[reco.HRV]
+    assert f["base_ln"] == pytest.approx(base.mean())
+    assert f["z_hrv"] == pytest.approx((np.log(25.0) - base.mean()) / base.std(ddof=1))
+
+    serie["2024-01-11"] = 0.0
+    assert reco.features({reco.HRV: serie}, date(2024, 1, 11))[reco.HRV]["z_hrv"] is None
+
+def test_fecha_pasada_y_ensayo_no_recortan_el_estado(ss, tmp_path):
+    store = _store(tmp_path)
+    kw = dict(cache_dir=tmp_path / "r", pareto_dir=tmp_path / "p")
+    reco.ejecutar(store, date(2024, 2, 9), **kw)
+    dias = lambda: len(reco.cargar_estado(tmp_path / "r")["ventanas"]["Peso (kg)"])
+    assert dias() == 40
+
+    # un día pasado usa sólo lo que había hasta entonces, sin tocar el estado
+    texto = reco.ejecutar(store, date(2024, 1, 5), **kw)
+    assert texto.startswith("2024-01-05") and dias() == 40
+    reco.ejecutar(store, date(2024, 2, 10), escribir=False, **kw)
+    assert reco.cargar_estado(tmp_path / "r")["fecha"] == "2024-02-09"
+
+    store.guardar([("2024-02-10", "Peso (kg)", 87.0, "x.jpg", None, None)])
+    reco.ejecutar(store, date(2024, 2, 10), **kw)
+    estado = reco.cargar_estado(tmp_path / "r")
+    assert dias() == 41 and estado["fecha"] == "2024-02-10"
+    assert estado["cambio"] == store.ultimo_cambio
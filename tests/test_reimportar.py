@@ -0,0 +1,77 @@
+import scripts.reimportar as reimp
+from scripts.capturas_index import CapturasIndex
+
+
+def _archivo(tmp_path):
+    for carpeta, nombres in {
+        "starfit": ["Screenshot_20240105_a.jpg", "Screenshot_20240105_b.jpg", "Screenshot_20240106_a.jpg"],
+        "amazfit": ["Screenshot_20240105_kcal.png"],
+        "Polar": ["Polar_H10_20240105_2300_RR.txt", "Polar_H10_20240105_2300_ACC.txt",
+                  "Polar_H10_20240105_2300_HR.txt", "Polar_H10_20240106_2300_RR.txt"],
+        "otros": ["nota.jpg"],
+    }.items():
+        (tmp_path / carpeta).mkdir()
+        for n in nombres:
+            (tmp_path / carpeta / n).write_bytes(b"x")
+    return tmp_path
+
+def test_descubrir_agrupa_como_el_watcher(tmp_path):
+    # grupos incompletos (noche sin ACC/HR, StarFit de una sola captura) se saltean como en el watcher
+    ts = reimp.descubrir([_archivo(tmp_path)])
+    assert [(t.kind, t.key if t.kind != "AMAZFIT" else "img") for t in ts] == [
+        ("AMAZFIT", "img"), ("POLAR", "20240105_2300"), ("STARFIT", "20240105")]
+    polar = ts[1]
+    assert polar.args[0].endswith("_RR.txt") and polar.args[2].endswith("_HR.txt")
+    assert len(ts[2].args[0]) == 2
+    assert [t.kind for t in reimp.descubrir([tmp_path], {"STARFIT"})] == ["STARFIT"]
+
+def test_lotes_y_checkpoint_reanudable(tmp_path, monkeypatch):
+    ts = reimp.descubrir([_archivo(tmp_path)], {"STARFIT", "AMAZFIT"})
+    llamadas = []
+
+    def falso(kind, *args):
+        llamadas.append(kind)
+        if kind == "AMAZFIT":
+            raise RuntimeError("captura ilegible")
+        return [("Peso (kg)", 81.9), ("IMC", 26.1)]
+
+    monkeypatch.setattr(reimp, "extraer", falso)
+    escritos = []
+    cp = reimp.Checkpoint(tmp_path / "cp.sqlite")
+    assert reimp.reimportar(ts, escritos.append, cp, workers=0, lote=2) == (1, 2, 1)
+    assert [len(b) for b in escritos] == [2]
+    assert escritos[0][0] == ("2024-01-05", "Peso (kg)", 81.9, "Screenshot_20240105_a.jpg", None, "STARFIT")
+
+    # segunda corrida: sólo reintenta el que falló
+    llamadas.clear()
+    reimp.reimportar(ts, escritos.append, cp, workers=0)
+    assert llamadas == ["AMAZFIT"]
+
+def test_diff_contra_capturas(tmp_path):
+    idx = CapturasIndex(tmp_path / "i.sqlite")
+    idx.registrar([["2024-01-05", "Peso (kg)", "81.90", "a.jpg"], ["2024-01-05", "IMC", "26.10", "a.jpg"]])
+    nuevas, cambian, iguales = reimp.diff([["2024-01-05", "Peso (kg)", "81.9", "a.jpg"],
+                                           ["2024-01-05", "IMC", "25.00", "a.jpg"],
+                                           ["2024-01-06", "IMC", "25.00", "b.jpg"]], idx)
+    assert iguales == 1
+    assert cambian == [(["2024-01-05", "IMC", "25.00", "a.jpg"], ["26.10"])]
+    assert nuevas == [["2024-01-06", "IMC", "25.00", "b.jpg"]]
+
+def test_dry_run_sin_escrituras(tmp_path, monkeypatch):
+    import uploader
+    uploader.configurar(tmp_path / "data")
+    ss = uploader.sheets_client.FakeSpreadsheet()
+    ss.worksheet("CAPTURAS").append_row(["Fecha", "Métrica", "Valor", "Archivo"])
+    ss.worksheet("CAPTURAS").append_row(["2024-01-05", "Peso (kg)", "81.90", "Screenshot_20240105_a.jpg"])
+    uploader.sheets_client.set_backend(ss)
+    monkeypatch.setattr(reimp, "extraer", lambda kind, *a: [("Peso (kg)", 81.9), ("IMC", 26.1)])
+    monkeypatch.setattr(reimp, "CHECKPOINT_FILE", tmp_path / "cp.sqlite")
+    (tmp_path / "p").mkdir()
+    try:
+        nuevas, cambian, iguales = reimp.main([str(_archivo(tmp_path / "p")), "--dry-run",
+                                               "--tipos", "STARFIT", "--workers", "0"])
+    finally:
+        uploader.sheets_client.reset()
+    assert (len(nuevas), cambian, iguales) == (1, [], 1)
+    assert not uploader.INDEX_FILE.exists() and not uploader.STORE_FILE.exists()
+    assert not (tmp_path / "cp.sqlite").exists()
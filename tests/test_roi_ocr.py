@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+import scripts.roi_ocr as roi
+
+
+def _captura():
+    img = np.full((2340, 1080), 245, np.uint8)
+    for t, y in [("81.9 kg", 200), ("Peso", 300), ("22.9%", 500), ("Grasa Corporal", 600)]:
+        cv2.putText(img, t, (100, y), cv2.FONT_HERSHEY_SIMPLEX, 2.2, 30, 4)
+    cv2.circle(img, (800, 1500), 150, 90, -1)              # ícono
+    cv2.rectangle(img, (50, 1800), (1000, 2200), 120, -1)  # gráfico
+    return img
+
+def test_detecta_renglones_y_descarta_iconos():
+    cajas = roi.detectar_renglones(_captura())
+    assert len(cajas) == 4
+    assert all(c[3] < 700 for c in cajas)     # nada del ícono ni del gráfico
+    assert cajas == sorted(cajas, key=lambda c: c[1])
+
+def test_mosaico_una_sola_llamada_y_textos_por_caja(monkeypatch):
+    gray = _captura()
+    cajas = roi.detectar_renglones(gray)
+    llamadas = []
+
+    def falso_image_to_data(img, **kw):
+        llamadas.append(img.shape)
+        _, filas = roi.mosaico(gray, cajas)
+        palabras = ["81.9", "Peso", "22.9%", "Grasa"]
+        return {"text": palabras + ["Corporal"],
+                "conf": [90, 80, 70, 60, 100],
+                "top": [a for a, _ in filas] + [filas[3][0]],
+                "height": [b - a for a, b in filas] + [filas[3][1] - filas[3][0]],
+                "left": [12, 12, 12, 12, 200]}
+
+    monkeypatch.setattr(roi.ocr_backend.pytesseract, "image_to_data", falso_image_to_data)
+    rs = roi.renglones(gray, "starfit")
+    assert [r.texto for r in rs] == ["81.9", "Peso", "22.9%", "Grasa Corporal"]
+    assert [r.conf for r in rs] == [90, 80, 70, 80]
+    assert rs[0].caja == cajas[0]
+    assert len(llamadas) == 1
+    assert llamadas[0][0] * llamadas[0][1] < gray.size / 20
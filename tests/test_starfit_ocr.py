@@ -13,6 +13,20 @@ def ensure_canon(tmp_path, monkeypatch):
     }
     yield
 
+def _data(texto, conf=95):
+    """Simula image_to_data: un renglón por línea, uno debajo del otro."""
+    d = {k: [] for k in ("text", "conf", "left", "top", "width", "height",
+                         "block_num", "par_num", "line_num")}
+    for n, linea in enumerate(l for l in texto.splitlines() if l.strip()):
+        x = 100
+        for palabra in linea.split():
+            d["text"].append(palabra); d["conf"].append(conf)
+            d["left"].append(x); d["top"].append(100 + 80 * n)
+            d["width"].append(20 * len(palabra)); d["height"].append(40)
+            d["block_num"].append(1); d["par_num"].append(1); d["line_num"].append(n + 1)
+            x += 20 * len(palabra) + 15
+    return d
+
 def test_map_lbl_starfit_exact():
     assert starfit.map_lbl_starfit("Peso") == "Peso (kg)"
     assert starfit.map_lbl_starfit("Grasa Corporal") == "Grasa Corporal (%)"
@@ -28,7 +42,7 @@ Grasa Corporal
 26.1
 IMC
 """
-    monkeypatch.setattr(starfit.pytesseract, "image_to_string", lambda *args, **kwargs: ocr_text)
+    monkeypatch.setattr(starfit.roi_ocr.ocr_backend.pytesseract, "image_to_data", lambda *args, **kwargs: _data(ocr_text))
     monkeypatch.setattr(starfit, "preprocess_starfit", lambda p: None)
 
     img = tmp_path / "dummy.jpg"
@@ -39,3 +53,22 @@ IMC
     assert ("Grasa Corporal (%)", 22.9) in datos
     assert ("IMC", 26.1) in datos
     assert len(datos) == 3
+
+def test_extraer_starfit_confianza_y_pareo_espacial(monkeypatch, tmp_path):
+    # Etiquetas a la izquierda y valores a la derecha, en el mismo renglón
+    d = _data("Peso\nIMC")
+    d2 = _data("81.9 kg\n26.1", conf=95)
+    for k in d:
+        d[k] += d2[k]
+    n = len(d2["text"])
+    d["left"][-n:] = [600] * n
+    d["line_num"][-n:] = [10 + v for v in d2["line_num"]]
+    d["conf"][-1] = 20                       # "26.1" ilegible → se descarta
+    monkeypatch.setattr(starfit.roi_ocr.ocr_backend.pytesseract, "image_to_data", lambda *a, **k: d)
+    monkeypatch.setattr(starfit, "preprocess_starfit", lambda p: None)
+
+    img = tmp_path / "dummy.jpg"
+    img.write_bytes(b"x")
+    datos = starfit.extraer_starfit(img)
+    assert datos == [("Peso (kg)", 81.9)]
+    assert datos[0].conf == 95
@@ -0,0 +1,33 @@
+from scripts.upload_journal import UploadJournal, Flusher
+
+
+def test_filas_no_se_pierden_si_la_api_falla(tmp_path):
+    enviados, caida = [], {"on": True}
+
+    def enviar(rows):
+        if caida["on"]:
+            raise ConnectionError("sin red")
+        enviados.append(rows)
+
+    j = UploadJournal(tmp_path / "j.sqlite")
+    f = Flusher(j, enviar, batch=10, base_backoff=0.0)
+    j.append([["2024-01-01", "Peso (kg)", "81.90", "a.jpg"]])
+    j.append([["2024-01-01", "IMC", "26.10", "a.jpg"]])
+
+    assert f.flush() == 0
+    assert j.pendientes() == 2
+
+    caida["on"] = False
+    assert f.drain(timeout=5)
+    assert j.pendientes() == 0
+    # las dos subidas se agrupan en un solo append_rows
+    assert len(enviados) == 1 and len(enviados[0]) == 2
+
+def test_lotes_respetan_tamano_y_cuota(tmp_path):
+    enviados = []
+    j = UploadJournal(tmp_path / "j.sqlite")
+    f = Flusher(j, enviados.append, batch=2, max_por_minuto=2)
+    j.append([[str(i), "M", "1.00", "x"] for i in range(5)])
+    assert f.flush() == 4            # 2 lotes y se alcanza la cuota por minuto
+    assert [len(r) for r in enviados] == [2, 2]
+    assert j.pendientes() == 1
@@ -0,0 +1,79 @@
+import pytest
+import scripts.uploader as uploader
+from scripts.upload_journal import UploadJournal, Flusher
+from scripts.capturas_index import CapturasIndex
+from scripts.metricas_store import MetricStore
+from scripts.roi_ocr import Medida
+
+
+@pytest.fixture
+def hoja(tmp_path, monkeypatch):
+    ss = uploader.sheets_client.FakeSpreadsheet()
+    ss.worksheet("CAPTURAS").append_row(["Fecha", "Métrica", "Valor", "Archivo"])
+    uploader.sheets_client.set_backend(ss)
+    journal = UploadJournal(tmp_path / "journal.sqlite")
+    monkeypatch.setattr(uploader, "journal", journal)
+    monkeypatch.setattr(uploader, "indice", CapturasIndex(tmp_path / "index.sqlite"))
+    monkeypatch.setattr(uploader, "store", MetricStore(tmp_path / "metricas.sqlite"))
+    monkeypatch.setattr(uploader, "flusher", Flusher(journal, uploader._enviar))
+    yield ss.worksheet("CAPTURAS")
+    uploader.sheets_client.reset()
+
+def test_upload_data_offline_sin_duplicados(hoja):
+    datos = [("Peso (kg)", 81.9), ("IMC", 26.1)]
+    uploader.upload_data("IMG_20240105_0800.jpg", datos)
+    uploader.upload_data("IMG_20240105_0800.jpg", datos)   # re-sync de Drive
+    assert uploader.drain(timeout=5)
+    assert hoja.get_all_values()[1:] == [
+        ["2024-01-05", "Peso (kg)", "81.90", "IMG_20240105_0800.jpg"],
+        ["2024-01-05", "IMC", "26.10", "IMG_20240105_0800.jpg"],
+    ]
+
+def test_store_fuente_de_verdad_y_correcciones(hoja):
+    uploader.upload_data("starfit/IMG_20240105_0800.jpg", [Medida("Peso (kg)", 81.9, 93.0)])
+    uploader.upload_data("starfit/IMG_20240105_0800.jpg", [Medida("Peso (kg)", 81.7, 96.0)])  # reprocesada
+    assert uploader.drain(timeout=5)
+    assert uploader.store.serie("Peso (kg)") == [("2024-01-05", 81.7)]
+    fila = uploader.store.tabla().iloc[0]
+    assert (fila.conf, fila.origen) == (96.0, "STARFIT")
+    # la corrección reescribe la fila de CAPTURAS en vez de agregar otra
+    assert [r[2] for r in hoja.get_all_values()[1:]] == ["81.70"]
+    assert uploader.store.pendientes_sync() == 0
+
+    uploader.upload_data("starfit/IMG_20240106_0800.jpg", [Medida("Peso (kg)", 81.5, 95.0)])
+    assert uploader.drain(timeout=5)
+    uploader.upload_data("starfit/IMG_20240105_0800.jpg", [Medida("Peso (kg)", 81.8, 95.0)])
+    uploader.upload_data("starfit/IMG_20240106_0800.jpg", [Medida("Peso (kg)", 81.4, 95.0)])
+    uploader.upload_data("starfit/IMG_20240107_0800.jpg", [Medida("Peso (kg)", 81.3, 95.0)])
+    assert uploader.drain(timeout=5)
+    assert [r[:3] for r in hoja.get_all_values()[1:]] == [
+        ["2024-01-05", "Peso (kg)", "81.80"], ["2024-01-06", "Peso (kg)", "81.40"],
+        ["2024-01-07", "Peso (kg)", "81.30"]]
+    # corregir la última fila mueve la marca del índice: el próximo sync no reconstruye
+    uploader.upload_data("starfit/IMG_20240107_0800.jpg", [Medida("Peso (kg)", 81.2, 95.0)])
+    assert uploader.drain(timeout=5)
+    assert hoja.get_all_values()[-1][2] == "81.20"
+    assert uploader.indice.sync(hoja) == 0 and uploader.indice.ultima_fila == 4
+    assert uploader.indice.filtrar_nuevos([["2024-01-06", "Peso (kg)", "81.50", "IMG_20240106_0800.jpg"]])
+
+def test_store_importa_capturas_sin_reenviar(tmp_path):
+    store = MetricStore(tmp_path / "m.sqlite")
+    assert store.importar([["2024-01-01", "IMC", "26,10", "a.jpg"], ["2024-01-02", "IMC", "x", "b.jpg"],
+                           ["2024-01-01", "IMC", "26,00", "a.jpg"]]) == 1
+    assert store.serie("IMC") == [("2024-01-01", 26.0)]      # la última fila de la medida
+    assert store.pendientes_sync() == 0
+    store.guardar([("2024-01-03", "IMC", 26.0, "c.jpg", 90.0, "STARFIT")])
+    enviadas = []
+    assert store.sincronizar(enviadas.extend) == 1
+    assert enviadas == [["2024-01-03", "IMC", "26.00", "c.jpg"]]
+    assert store.serie("IMC", desde="2024-01-02") == [("2024-01-03", 26.0)]
+
+def test_store_cambio_solo_de_confianza_no_reenvia(tmp_path):
+    store = MetricStore(tmp_path / "m.sqlite")
+    assert store.guardar([("2024-01-03", "IMC", 26.0, "c.jpg", 90.0, "STARFIT")]) == 1
+    assert store.sincronizar(lambda filas: None) == 1
+    assert store.guardar([("2024-01-03", "IMC", 26.001, "c.jpg", 95.0, "STARFIT")]) == 0
+    assert store.pendientes_sync() == 0
+    assert store.tabla().iloc[0].conf == 95.0
+    assert store.guardar([("2024-01-03", "IMC", 26.2, "c.jpg", 95.0, "STARFIT")]) == 1
+    assert store.pendientes_sync() == 1